@@ -0,0 +1,70 @@
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from openpyxl import load_workbook
+from manufacturer_catalog import CATALOG_PATH, ManufacturerCatalog, PhraseIndex
+
+DESCRIPTIONS = [
+    "Manual Chain Block : 250kg x 3m Tiger Model TCB14 Hook Suspension with 3m Chain Fall",
+    "Snatch Block : 4t HF : 4.5\" : AJ 601S Single Sheave Snatch Block Ansell Jones Model 601S",
+    "Swivel Hoist Ring : M8 : Green Pin : 0.4t Original E.C. Declaration Cert No: 80265048",
+    "CHAINBLOCK 1T 6M TCB11 TIGER SUBJECT TO LIGHT LOAD TEST @ 5% SWL",
+    "Wire Rope Pulling Machine",
+]
+
+
+def legacy_scan(rows, description_keywords):
+    for keyword, value in rows:
+        if keyword and str(keyword).lower() in description_keywords:
+            return keyword, value
+    return None
+
+
+def legacy_workbook_lookup(description):
+    # what every get_manufacture_model call did before the catalog was shared
+    workbook = load_workbook(CATALOG_PATH)
+    description_keywords = description.lower().split()
+    legacy_scan(workbook['Manufacture'].iter_rows(min_row=2, max_col=2, values_only=True), description_keywords)
+    legacy_scan(workbook['Model'].iter_rows(min_row=2, max_col=2, values_only=True), description_keywords)
+
+
+def synthetic_rows(size):
+    generator = random.Random(size)
+    rows = list()
+    for i in range(size):
+        words = [f"name{i}"] + [f"w{generator.randint(0, 50)}" for _ in range(generator.randint(0, 2))]
+        rows.append((" ".join(words), f"Manufacturer {i}"))
+    return rows
+
+
+def time_per_call(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for description in DESCRIPTIONS:
+            function(description)
+    return (time.perf_counter() - start) / (repeat * len(DESCRIPTIONS))
+
+
+def main():
+    print(f"{'catalog rows':>12} {'linear scan us':>15} {'index us':>10}")
+    for size in (100, 1_000, 10_000, 100_000):
+        rows = synthetic_rows(size)
+        index = PhraseIndex()
+        for keyword, value in rows:
+            index.add(keyword, value)
+        repeat = max(1, 20_000 // size)
+        scan = time_per_call(lambda d: legacy_scan(rows, d.lower().split()), repeat)
+        indexed = time_per_call(lambda d: index.first_match(d.lower().split()), 200)
+        print(f"{size:>12} {scan * 1e6:>15.2f} {indexed * 1e6:>10.2f}")
+
+    catalog = ManufacturerCatalog.from_workbook(CATALOG_PATH)
+    reload = time_per_call(legacy_workbook_lookup, 1)
+    indexed = time_per_call(lambda d: (catalog.find_manufacturer(d), catalog.find_model(d)), 200)
+    print(f"bundled catalog: workbook reload per call {reload * 1e3:.2f} ms, shared index {indexed * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
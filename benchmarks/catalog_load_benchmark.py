@@ -0,0 +1,37 @@
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from manufacturer_catalog import CATALOG_PATH, ManufacturerCatalog, build_artifact, load_catalog
+
+
+def measure(function, repeat):
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+
+def main(repeat=20):
+    with tempfile.TemporaryDirectory() as directory:
+        artifact_path = os.path.join(directory, "catalog.json.gz")
+        build_artifact(CATALOG_PATH, artifact_path)
+        paths = {
+            "workbook (openpyxl)": lambda: ManufacturerCatalog.from_workbook(CATALOG_PATH),
+            "artifact + hash check": lambda: load_catalog(CATALOG_PATH, artifact_path),
+        }
+        print(f"{'load path':<24} {'median ms':>10} {'best ms':>10}")
+        for name, function in paths.items():
+            median, best = measure(function, repeat)
+            print(f"{name:<24} {median * 1e3:>10.2f} {best * 1e3:>10.2f}")
+        print(f"artifact size: {os.path.getsize(artifact_path)} bytes, "
+              f"workbook size: {os.path.getsize(CATALOG_PATH)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from pdf_processing import KEYWORDS, classify_text, first_page_text, pdf_to_text, search_keyword
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources")
+
+
+def median_ms(function, repeat):
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the pdfplumber and pdfium first-page classification paths")
+    parser.add_argument("pdfs", nargs="*", default=sorted(glob.glob(os.path.join(RESOURCES, "*.pdf"))))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'pdf':<22} {'pdfplumber ms':>13} {'pdfium ms':>10} {'speedup':>8} {'vendor':<17} confidence agree")
+    for pdf_path in args.pdfs:
+        plumber_time, plumber_keyword = median_ms(lambda: search_keyword(pdf_to_text(pdf_path), KEYWORDS), args.repeat)
+        pdfium_time, (keyword, confidence) = median_ms(lambda: classify_text(first_page_text(pdf_path), KEYWORDS),
+                                                       args.repeat)
+        print(f"{os.path.basename(pdf_path):<22} {plumber_time:>13.1f} {pdfium_time:>10.1f} "
+              f"{plumber_time / pdfium_time:>7.0f}x {str(keyword):<17} {confidence:>10.2f} {keyword == plumber_keyword}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import pdfplumber
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from centurion_extraction import process_centurion_page
+from page_content import PageContent
+from page_templates import TEMPLATES
+from pdf_processing import first_page_text, search_keyword
+from sparrow_extraction import process_sparrow_page
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources")
+PAGE_PROCESSORS = {
+    "Sparrows": process_sparrow_page,
+    "Centurion": process_centurion_page,
+}
+
+
+def timed_tables(page, page_processor, template):
+    page_content = PageContent(page, template)
+    start = time.perf_counter()
+    page_content.tables
+    elapsed = time.perf_counter() - start
+    page_records, _ = page_processor(page_content, page.page_number)
+    cropped = "tables" not in page_content.extraction_counts
+    return elapsed, cropped, page_records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-page and template-cropped table detection per page")
+    parser.add_argument("pdfs", nargs="*", default=sorted(glob.glob(os.path.join(RESOURCES, "*.pdf"))))
+    parser.add_argument("--pages", action="store_true", help="print a line per page, not just the totals")
+    args = parser.parse_args()
+
+    # parsing the page content stream costs the same either way, so it is timed apart from table detection
+    print(f"{'pdf':<22} {'page':>5} {'parse ms':>9} {'full ms':>8} {'crop ms':>8} {'cropped':>8} identical")
+    for pdf_path in args.pdfs:
+        keyword = search_keyword(first_page_text(pdf_path), list(PAGE_PROCESSORS))
+        if keyword is None:
+            print(f"{os.path.basename(pdf_path):<22} skipped, no template for this vendor")
+            continue
+        page_processor = PAGE_PROCESSORS[keyword]
+        parse_total = full_total = crop_total = 0
+        cropped_pages = identical_pages = 0
+        with pdfplumber.open(pdf_path) as pdf_doc:
+            for page in pdf_doc.pages:
+                start = time.perf_counter()
+                page.objects
+                parse_time = time.perf_counter() - start
+                full_time, _, full_records = timed_tables(page, page_processor, None)
+                crop_time, cropped, crop_records = timed_tables(page, page_processor, TEMPLATES[keyword])
+                identical = list(full_records.items()) == list(crop_records.items())
+                parse_total += parse_time
+                full_total += full_time
+                crop_total += crop_time
+                cropped_pages += cropped
+                identical_pages += identical
+                if args.pages:
+                    print(f"{os.path.basename(pdf_path):<22} {page.page_number:>5} {parse_time * 1000:>9.1f} "
+                          f"{full_time * 1000:>8.1f} {crop_time * 1000:>8.1f} {str(cropped):>8} {identical}")
+            page_count = len(pdf_doc.pages)
+        print(f"{os.path.basename(pdf_path):<22} {'all':>5} {parse_total * 1000:>9.0f} {full_total * 1000:>8.0f} "
+              f"{crop_total * 1000:>8.0f} {cropped_pages:>4}/{page_count:<3} {identical_pages}/{page_count} "
+              f"({full_total / crop_total:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
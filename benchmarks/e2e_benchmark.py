@@ -0,0 +1,174 @@
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "src"))
+import excel_management
+import manufacturer_catalog
+import page_engine
+import pdf_processing
+
+SAMPLES = ["sparrows.pdf", "centurion.pdf", "CenturionLoft.pdf"]
+STAGES = ["catalog", "classify", "extract", "excel"]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "e2e_benchmark.json")
+# a stage fails when it is this much slower, or uses this much more memory, than its baseline
+THRESHOLD = 0.25
+# differences below these are noise for the millisecond stages, whatever their share of the baseline
+SLACK = {"seconds": 0.05, "peak_rss_mb": 5.0}
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # without /proc only the process-wide peak is known
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakMemory:
+    """Samples the resident set size on a thread while the block runs and keeps the highest value, in bytes."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    def _sample(self):
+        while not self._done.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._done.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def run_stage(results, stage, pages, function):
+    with PeakMemory() as memory, redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - start
+    results[stage] = {"seconds": elapsed, "pages_per_sec": pages / elapsed if elapsed else 0.0,
+                      "peak_rss_mb": memory.peak / 1024 / 1024}
+    return value
+
+
+def run_sample(pdf_name):
+    """Runs every stage for one sample in this process and prints the results as JSON."""
+    pdf_path = os.path.join(ROOT, "resources", pdf_name)
+    pages = page_engine.count_pages(pdf_path)
+    results = dict()
+    run_stage(results, "catalog", pages, manufacturer_catalog.get_catalog)
+    vendor, _ = run_stage(results, "classify", pages, lambda: pdf_processing.classify_text(
+        pdf_processing.first_page_text(pdf_path), pdf_processing.KEYWORDS))
+    iter_records, client = pdf_processing.EXTRACTORS[vendor]
+    # the page engine is called directly, so neither the result cache nor page snapshots answer for the parser
+    extraction_info, page_errors = run_stage(results, "extract", pages, lambda: page_engine.collect_events(
+        iter_records(pdf_path, workers=1, snapshot_mode="off")))
+    with tempfile.TemporaryDirectory() as directory:
+        workbook_path = os.path.join(directory, "benchmark.xlsx")
+        run_stage(results, "excel", pages,
+                  lambda: excel_management.create_excel(extraction_info, workbook_path, client, page_errors))
+        if not os.path.exists(workbook_path):
+            raise RuntimeError(f"no workbook was written for {pdf_name}")
+    print(json.dumps({"pages": pages, "records": len(extraction_info), "stages": results}))
+
+
+def measure(pdf_name, repeat):
+    """Runs the sample in fresh processes and keeps the fastest time and the lowest peak of each stage."""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, __file__, "--run", pdf_name], capture_output=True, text=True,
+                                check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None:
+            best = result
+            continue
+        for stage, metrics in result["stages"].items():
+            kept = best["stages"][stage]
+            if metrics["seconds"] < kept["seconds"]:
+                kept["seconds"], kept["pages_per_sec"] = metrics["seconds"], metrics["pages_per_sec"]
+            kept["peak_rss_mb"] = min(kept["peak_rss_mb"], metrics["peak_rss_mb"])
+    return best
+
+
+def regressions(results, baseline, threshold):
+    """Lists the stages slower, or with a higher peak, than the baseline by more than threshold and the SLACK."""
+    found = list()
+    for pdf_name, result in results.items():
+        for stage, metrics in result["stages"].items():
+            reference = baseline.get(pdf_name, {}).get("stages", {}).get(stage)
+            if reference is None:
+                continue
+            for metric in ("seconds", "peak_rss_mb"):
+                if metrics[metric] > reference[metric] * (1 + threshold) + SLACK[metric]:
+                    found.append(f"{pdf_name} {stage} {metric}: {metrics[metric]:.3f} vs baseline "
+                                 f"{reference[metric]:.3f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time classification, extraction and Excel generation of the "
+                                                 "sample PDFs and compare them with a baseline")
+    parser.add_argument("samples", nargs="*", default=SAMPLES, help="PDF names in resources/")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per sample, the best one is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare with or to save")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"allowed slowdown or memory growth per stage as a fraction (default {THRESHOLD})")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_sample(args.run)
+        return 0
+
+    baseline = dict()
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = dict()
+    print(f"{'pdf':<18} {'stage':<9} {'seconds':>8} {'pages/sec':>10} {'peak RSS MB':>12} {'vs baseline':>12}")
+    for pdf_name in args.samples:
+        results[pdf_name] = measure(pdf_name, args.repeat)
+        for stage in STAGES:
+            metrics = results[pdf_name]["stages"][stage]
+            reference = baseline.get(pdf_name, {}).get("stages", {}).get(stage)
+            change = f"{metrics['seconds'] / reference['seconds'] - 1:+.0%}" if reference else "-"
+            print(f"{pdf_name:<18} {stage:<9} {metrics['seconds']:>8.3f} {metrics['pages_per_sec']:>10.1f} "
+                  f"{metrics['peak_rss_mb']:>12.1f} {change:>12}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    found = regressions(results, baseline, args.threshold)
+    for regression in found:
+        print(f"REGRESSION {regression}")
+    if not baseline:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
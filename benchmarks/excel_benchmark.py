@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import excel_management
+
+WRITERS = {"in-memory": False, "write-only": True}
+
+
+def synthetic_records(count, ids_per_record=4):
+    # like the extractors, several id numbers of one pack share the same record dict
+    records = dict()
+    for index in range(0, count, ids_per_record):
+        page_info = {
+            "Item Description": f"Chain Sling 2 Leg 13mm x 2.5m c/w Shortening Clutches, batch {index}",
+            "Model": "G80", "SWL Value": "5.3", "SWL Unit": "TONNES", "Manufacturer": "Crosby",
+            "Certificate No": f"SB{340000 + index}", "Previous Inspection": "01/09/2023",
+            "Next Inspection Due Date": "01/03/2024", "Fit For Purpose Y/N": "Y", "Status": "In Service",
+            "Provider Identification": "Sparrows", "Errors": "",
+        }
+        for offset in range(ids_per_record):
+            records[f"ID{index + offset:07d}"] = page_info
+    return records
+
+
+def run_writer(writer, count):
+    """Runs one writer in this process and prints its timing and peak RSS as JSON."""
+    records = synthetic_records(count)
+    page_errors = {page: "No recognized table found" for page in range(1, 200)}
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "benchmark.xlsx")
+        start = time.perf_counter()
+        excel_management.create_excel(records, filename, "Sparrows", page_errors, write_only=WRITERS[writer])
+        elapsed = time.perf_counter() - start
+        # create_excel reports errors instead of raising them
+        if not os.path.exists(filename):
+            raise RuntimeError(f"{writer} writer did not create the workbook")
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_kb": peak_kb, "baseline_kb": baseline_kb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the in-memory and write-only Excel writers")
+    parser.add_argument("--rows", type=int, nargs="*", default=[1000, 10000, 50000])
+    parser.add_argument("--run", choices=list(WRITERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_writer(args.run, args.rows[0])
+        return
+
+    print(f"{'rows':>7} {'writer':<11} {'seconds':>8} {'rows/sec':>9} {'peak RSS MB':>12} {'over baseline MB':>17}")
+    for rows in args.rows:
+        for writer in WRITERS:
+            # each writer runs in a fresh process so its peak RSS is its own
+            output = subprocess.run([sys.executable, __file__, "--run", writer, "--rows", str(rows)],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{rows:>7} {writer:<11} {result['seconds']:>8.2f} {rows / result['seconds']:>9.0f} "
+                  f"{result['peak_kb'] / 1024:>12.1f} {(result['peak_kb'] - result['baseline_kb']) / 1024:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
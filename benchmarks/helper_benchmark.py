@@ -0,0 +1,226 @@
+import argparse
+import importlib
+import io
+import json
+import os
+import re
+import sys
+import timeit
+import tracemalloc
+from contextlib import redirect_stdout
+from openpyxl import load_workbook
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "src"))
+sys.path.append(os.path.join(ROOT, "lambda_functions"))
+# the Lambda modules create their boto3 clients on import; no request is sent
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+
+EXTRACTION_DATA = os.path.join(ROOT, "database", "Extraction_data.xlsx")
+ERROR_CASES = os.path.join(ROOT, "database", "Error_cases.xlsx")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "helper_benchmark.json")
+MODULES = {
+    "src": {"sparrow": "sparrow_extraction", "centurion": "centurion_extraction", "first_integrated": "first_integrated"},
+    "lambda": {"sparrow": "lambda_sparrow_extraction", "centurion": "lambda_centurion&hendrik_extraction",
+               "first_integrated": "lambda_first_integrated"},
+}
+# helper name, vendor module and the corpus its calls are drawn from
+HELPERS = [
+    ("process_swl", "sparrow", "swl"),
+    ("process_swl", "centurion", "swl"),
+    ("process_swl", "first_integrated", "swl"),
+    ("get_identification_number_list", "sparrow", "id_ranges"),
+    ("get_identification_number_list", "centurion", "id_ranges"),
+    ("get_identification_parts_list", "sparrow", "id_parts"),
+    ("get_identification_parts_list", "centurion", "id_parts"),
+    ("split_id_numbers_with_range", "first_integrated", "fi_ranges"),
+    ("extrac_serialnumber", "centurion", "serial_cells"),
+    ("contains_keyword", "first_integrated", "first_rows"),
+]
+# the table labels first_integrated looks for in the first row of a table
+FIRST_ROW_KEYWORDS = ["Name & Address of employer for Whom the examination was made", "Date of Thorough Examination",
+                      "Name &AddressofManufacturer", "Name & Address of Manufacturer"]
+
+
+def sheet_rows(filename):
+    workbook = load_workbook(filename, read_only=True)
+    sheets = {sheet.title: [row for row in sheet.iter_rows(values_only=True)] for sheet in workbook.worksheets}
+    workbook.close()
+    return sheets
+
+
+def packs(rows, certificate_column, description_column=3):
+    """
+    Groups consecutive rows with the same certificate and description, as one pack of a report page.
+    Returns (id numbers, rows) per pack.
+    """
+    groups = list()
+    for row in rows:
+        id_number = str(row[0]).strip() if row[0] is not None else None
+        if not id_number:
+            continue
+        key = (row[certificate_column], row[description_column])
+        if groups and groups[-1][0] == key:
+            groups[-1][1].append(id_number)
+            groups[-1][2].append(row)
+        else:
+            groups.append((key, [id_number], [row]))
+    return [(ids, pack_rows) for _, ids, pack_rows in groups]
+
+
+def id_range(ids):
+    """Returns (prefix, first number, last number) when the ids are consecutive numbers after one prefix."""
+    matches = [re.fullmatch(r"([A-Za-z]+)(\d+)", id_number) for id_number in ids]
+    if len(ids) < 2 or not all(matches) or len({match.group(1) for match in matches}) > 1:
+        return None
+    numbers = [int(match.group(2)) for match in matches]
+    if sorted(numbers) != list(range(min(numbers), min(numbers) + len(numbers))):
+        return None
+    width = len(matches[0].group(2))
+    return matches[0].group(1), str(min(numbers)).zfill(width), str(max(numbers))
+
+
+def build_corpora():
+    """Mines realistic inputs for every helper from the recorded extractions and the documented error cases."""
+    extraction = sheet_rows(EXTRACTION_DATA)
+    sparrows, centurion, first_integrated = (extraction[name][1:] for name in
+                                             ("Sparrows", "Centurion", "First Integrated"))
+    error_texts = [str(cell) for row in sheet_rows(ERROR_CASES)["Sheet1"][1:] for cell in row if cell]
+
+    swl = [str(row[5]) for row in sparrows + centurion if row[5] is not None]
+    swl += [f"{row[5]} {row[6]}" if row[6] else str(row[5]) for row in first_integrated if row[5] is not None]
+    # cells that match no pattern take the slow path through the whole unit list
+    swl += error_texts
+
+    id_packs = [ids for ids, _ in packs(sparrows, 7) + packs(centurion, 7)]
+    id_ranges = [(f"{ids[0]} to {ids[-1]}", len(ids)) for ids in id_packs if len(ids) > 1]
+    id_ranges += [(f"{ids[0]} x{len(ids)}", len(ids)) for ids in id_packs if len(ids) > 1 and "x" not in ids[0]]
+    id_ranges += [(ids[0], 1) for ids in id_packs if len(ids) == 1]
+    id_parts = list()
+    for ids in id_packs:
+        part = ids[0].split("-")[-1].replace(" ", "")
+        if re.fullmatch(r"[A-Za-z]*\d+|\d+[A-Za-z]*", part):
+            id_parts.append((part, len(ids)))
+
+    # First Integrated lists a pack as one "GIT27715-27720" cell, which split_id_numbers_with_range expands
+    fi_ranges = list()
+    for ids, _ in packs(first_integrated, 9):
+        consecutive = id_range(ids)
+        if consecutive:
+            prefix, first, last = consecutive
+            fi_ranges.append(([f"{prefix}{first}-{last}"],))
+        else:
+            fi_ranges.extend(([id_number],) for id_number in ids)
+
+    serial_cells = [("SerialNo(s): " + ", ".join(f"{id_number} - {row[6] or 'N/A'}"
+                                                 for id_number, row in zip(ids, pack_rows)),)
+                    for ids, pack_rows in packs(centurion, 7)]
+
+    rows = [row for sheet in extraction.values() for row in sheet] + sheet_rows(ERROR_CASES)["Sheet1"]
+    first_rows = [(tuple(None if cell is None else str(cell) for cell in row), keyword)
+                  for row in rows for keyword in FIRST_ROW_KEYWORDS]
+    # a few rows that do start with a label, as on the First Integrated table pages
+    first_rows += [((keyword, None, "value"), keyword) for keyword in FIRST_ROW_KEYWORDS]
+
+    return {"swl": [(value,) for value in swl], "id_ranges": id_ranges, "id_parts": id_parts,
+            "fi_ranges": fi_ranges, "serial_cells": serial_cells, "first_rows": first_rows}
+
+
+def run_corpus(function, corpus):
+    # the extractors call the helpers inside try blocks, so inputs that raise are timed too
+    for args in corpus:
+        try:
+            function(*args)
+        except Exception:
+            pass
+
+
+def count_raising(function, corpus):
+    raising = 0
+    for args in corpus:
+        try:
+            function(*args)
+        except Exception:
+            raising += 1
+    return raising
+
+
+def nanoseconds_per_call(function, corpus, repeat):
+    """Best of repeat timings over the whole corpus, per call, less the cost of calling a no-op the same way."""
+    def noop(*args):
+        return None
+
+    def best(target):
+        timer = timeit.Timer(lambda: run_corpus(target, corpus))
+        loops, _ = timer.autorange()
+        return min(timer.repeat(repeat=repeat, number=loops)) / loops / len(corpus) * 1e9
+    return max(best(function) - best(noop), 0.0)
+
+
+def bytes_per_call(function, corpus):
+    """Average peak of memory allocated during one call, traced by tracemalloc."""
+    tracemalloc.start()
+    total = 0
+    for args in corpus:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            function(*args)
+        except Exception:
+            pass
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the per-page and per-cell helpers of the extractors on "
+                                                 "inputs mined from database/Extraction_data.xlsx")
+    parser.add_argument("--helpers", nargs="*", help="only these helper names")
+    parser.add_argument("--impl", nargs="*", choices=list(MODULES), default=list(MODULES),
+                        help="src copies, Lambda copies or both")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats, the best one is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare with or to save")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    corpora = build_corpora()
+    baseline = dict()
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = dict()
+    print(f"{'helper':<31} {'module':<36} {'inputs':>6} {'raising':>7} {'ns/call':>9} {'alloc B/call':>13} "
+          f"{'vs baseline':>12}")
+    for impl in args.impl:
+        for helper, vendor, corpus_name in HELPERS:
+            if args.helpers and helper not in args.helpers:
+                continue
+            module_name = MODULES[impl][vendor]
+            with redirect_stdout(io.StringIO()):
+                function = getattr(importlib.import_module(module_name), helper, None)
+            if function is None:
+                continue
+            corpus = corpora[corpus_name]
+            with redirect_stdout(io.StringIO()):
+                nanoseconds = nanoseconds_per_call(function, corpus, args.repeat)
+                allocated = bytes_per_call(function, corpus)
+                raising = count_raising(function, corpus)
+            key = f"{module_name}.{helper}"
+            results[key] = {"inputs": len(corpus), "raising": raising, "ns_per_call": nanoseconds,
+                            "bytes_per_call": allocated}
+            reference = baseline.get(key)
+            change = f"{nanoseconds / reference['ns_per_call'] - 1:+.0%}" if reference else "-"
+            print(f"{helper:<31} {module_name:<36} {len(corpus):>6} {raising:>7} {nanoseconds:>9.0f} "
+                  f"{allocated:>13.0f} {change:>12}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
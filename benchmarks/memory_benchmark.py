@@ -0,0 +1,126 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+import pypdfium2 as pdfium
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "src"))
+import centurion_extraction
+import first_integrated
+import page_engine
+import page_router
+import page_templates
+import sparrow_extraction
+from e2e_benchmark import PeakMemory, current_rss
+
+# the page parser, template and router of each sample's vendor, as the extractors call page_engine with them
+PARSERS = {
+    "sparrows.pdf": (sparrow_extraction.process_sparrow_page, page_templates.TEMPLATES["Sparrows"], None),
+    "centurion.pdf": (centurion_extraction.process_centurion_page, page_templates.TEMPLATES["Centurion"],
+                      page_router.route_centurion_page),
+    "CenturionLoft.pdf": (centurion_extraction.process_centurion_page, page_templates.TEMPLATES["Centurion"],
+                          page_router.route_centurion_page),
+    "First Integrated.pdf": (first_integrated.process_first_integrated_page, None,
+                             page_router.route_first_integrated_page),
+}
+MODES = {"bounded": "on", "unbounded": "off"}
+# a bounded run fails when memory still grows by more than this per page once it has warmed up; pdfminer keeps
+# each page's decoded content stream, some 50-100 KiB with the vendor parsers, where the caches took about 5 MiB
+MAX_GROWTH_KB = 150.0
+
+
+def read_text(page_content, page_number):
+    return {}, (None if page_content.text else "no text")
+
+
+def build_pdf(sample, pages, pdf_path):
+    """Writes a PDF of the sample's pages repeated until it has the given number of pages."""
+    source = pdfium.PdfDocument(os.path.join(ROOT, "resources", sample))
+    document = pdfium.PdfDocument.new()
+    while len(document) < pages:
+        count = min(len(source), pages - len(document))
+        document.import_pages(source, list(range(count)))
+    document.save(pdf_path)
+    document.close()
+    source.close()
+
+
+def growth_kb_per_page(samples):
+    """Least-squares slope of RSS against page number over the second half of the samples, in KiB per page."""
+    samples = samples[len(samples) // 2:]
+    if len(samples) < 2:
+        return 0.0
+    pages = [page for page, _ in samples]
+    rss = [value for _, value in samples]
+    mean_page, mean_rss = sum(pages) / len(pages), sum(rss) / len(rss)
+    variance = sum((page - mean_page) ** 2 for page in pages)
+    covariance = sum((page - mean_page) * (value - mean_rss) for page, value in samples)
+    return covariance / variance * 1024 if variance else 0.0
+
+
+def run_mode(pdf_path, sample, parser, every):
+    """Parses the PDF in this process, noting the RSS every few pages, and prints the results as JSON."""
+    if parser == "text":
+        page_processor, template, router = read_text, None, None
+    else:
+        page_processor, template, router = PARSERS[sample]
+    start_rss = current_rss() / 1024 / 1024
+    samples = list()
+    start = time.perf_counter()
+    with PeakMemory() as memory, redirect_stdout(io.StringIO()):
+        for page_number, _, _ in page_engine.iter_page_results(pdf_path, page_processor, 1, template, router, "off"):
+            if page_number % every == 0:
+                samples.append((page_number, current_rss() / 1024 / 1024))
+    print(json.dumps({"pages": page_engine.count_pages(pdf_path), "seconds": time.perf_counter() - start,
+                      "start_rss_mb": start_rss, "end_rss_mb": samples[-1][1] if samples else start_rss,
+                      "peak_rss_mb": memory.peak / 1024 / 1024, "growth_kb_per_page": growth_kb_per_page(samples),
+                      "samples": samples}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse a long PDF built from a sample and show whether memory "
+                                                 "stays flat with page_engine.BOUNDED_MEMORY on and off")
+    parser.add_argument("--sample", default="sparrows.pdf", choices=list(PARSERS), help="PDF in resources/")
+    parser.add_argument("--pages", type=int, default=1000, help="pages of the generated PDF")
+    parser.add_argument("--parser", choices=["text", "vendor"], default="text",
+                        help="read only the text of each page (fast) or run the sample's vendor parser")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=["bounded"],
+                        help="unbounded keeps every page's caches, about 5 MB a page, so keep --pages low with it")
+    parser.add_argument("--every", type=int, default=10, help="pages between RSS samples")
+    parser.add_argument("--max-growth", type=float, default=MAX_GROWTH_KB,
+                        help=f"KiB per page a bounded run may still grow by (default {MAX_GROWTH_KB})")
+    parser.add_argument("--run", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_mode(args.run[0], args.run[1], args.parser, args.every)
+        return 0
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = os.path.join(directory, f"{args.pages}-pages.pdf")
+        build_pdf(args.sample, args.pages, pdf_path)
+        print(f"{'mode':<10} {'pages':>6} {'seconds':>8} {'start MB':>9} {'end MB':>8} {'peak MB':>8} "
+              f"{'KiB/page':>9}")
+        for mode in args.modes:
+            # each mode runs in a fresh process, as the RSS of one would hide the other's
+            environment = dict(os.environ, PDF_BOUNDED_MEMORY=MODES[mode], PDF_METRICS="off")
+            output = subprocess.run([sys.executable, __file__, "--parser", args.parser, "--every", str(args.every),
+                                     "--run", pdf_path, args.sample], capture_output=True, text=True, check=True,
+                                    env=environment).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<10} {result['pages']:>6} {result['seconds']:>8.1f} {result['start_rss_mb']:>9.0f} "
+                  f"{result['end_rss_mb']:>8.0f} {result['peak_rss_mb']:>8.0f} {result['growth_kb_per_page']:>9.1f}")
+            if mode == "bounded" and result["growth_kb_per_page"] > args.max_growth:
+                print(f"Memory still grows by {result['growth_kb_per_page']:.0f} KiB per page")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import page_engine
+from pdf_processing import EXTRACTORS, first_page_text, search_keyword
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources")
+
+
+def timed_extraction(pdf_path, iter_records, workers):
+    # the vendor's own record iterator, with its template and router, so the benchmark runs the extractors' path;
+    # the result cache and page snapshots are bypassed so every run parses the pages
+    start = time.perf_counter()
+    result = page_engine.collect_events(iter_records(pdf_path, workers=workers, snapshot_mode="off"))
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial and page-parallel extraction of the sample PDFs")
+    parser.add_argument("pdfs", nargs="*", default=sorted(glob.glob(os.path.join(RESOURCES, "*.pdf"))))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    print(f"{'pdf':<22} {'pages':>5} {'serial s':>9} {f'{args.workers} workers s':>12} {'speedup':>8} identical")
+    for pdf_path in args.pdfs:
+        keyword = search_keyword(first_page_text(pdf_path), list(EXTRACTORS))
+        if keyword is None:
+            print(f"{os.path.basename(pdf_path):<22} skipped, vendor not recognised")
+            continue
+        iter_records = EXTRACTORS[keyword][0]
+        serial_time, serial_result = timed_extraction(pdf_path, iter_records, 1)
+        parallel_time, parallel_result = timed_extraction(pdf_path, iter_records, args.workers)
+        identical = [list(part.items()) for part in serial_result] == [list(part.items()) for part in parallel_result]
+        print(f"{os.path.basename(pdf_path):<22} {page_engine.count_pages(pdf_path):>5} {serial_time:>9.2f} "
+              f"{parallel_time:>12.2f} {serial_time / parallel_time:>7.2f}x {identical}")
+
+
+if __name__ == "__main__":
+    main()
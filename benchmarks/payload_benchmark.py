@@ -0,0 +1,79 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "src"))
+sys.path.append(os.path.join(ROOT, "src", "test"))
+sys.path.append(os.path.join(ROOT, "lambda_functions"))
+import excel_management
+import page_engine
+from extraction_store import open_extraction, put_extraction
+from local_s3 import LocalS3
+from sparrow_extraction import iter_sparrow_records
+from centurion_extraction import iter_centurion_records
+
+# asynchronous (Event) Lambda invocations reject payloads above 256 KB
+EVENT_PAYLOAD_LIMIT = 256 * 1024
+
+
+def synthetic_extraction(count, ids_per_record=25):
+    extracted_data = dict()
+    for index in range(0, count, ids_per_record):
+        page_info = {"Item Description": f"Shackle Bow 4.75t Screw Pin Galvanised, batch {index}",
+                     "Manufacturer": "Crosby", "Model": "G209", "SWL Value": "4.75", "SWL Unit": "t",
+                     "Certificate No": f"SB{340000 + index}", "Previous Inspection": "01/09/2023",
+                     "Next Inspection Due Date": "01/03/2024", "Provider Identification": "LOFT-SJB110523"}
+        for offset in range(ids_per_record):
+            extracted_data[f"SB{index + offset:06d}"] = page_info
+    return extracted_data
+
+
+def legacy_round_trip(extracted_data, page_errors):
+    payload = json.dumps({'extracted_data': extracted_data, 'client': "Sparrows", 'filename': "pack.xlsx",
+                          'page_errors': page_errors})
+    event = json.loads(payload)
+    excel_management.create_excel(event['extracted_data'], io.BytesIO(), event['client'], event['page_errors'])
+    return len(payload), 0
+
+
+def stored_round_trip(extracted_data, page_errors):
+    s3 = LocalS3()
+    payload = json.dumps(put_extraction(s3, extracted_data, page_errors, "Sparrows", "pack.xlsx"))
+    event = json.loads(payload)
+    stored = open_extraction(s3, event['extraction_bucket'], event['extraction_key'])
+    excel_management.create_excel(stored.rows(), io.BytesIO(), stored.client, stored.page_errors)
+    return len(payload), s3.bytes_sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the inline and S3-stored excel_management payloads")
+    parser.add_argument("--ids", type=int, nargs="*", default=[1000, 20000])
+    parser.add_argument("--samples", action="store_true", help="also measure the bundled sample PDFs")
+    args = parser.parse_args()
+
+    extractions = [(f"synthetic {count} ids", synthetic_extraction(count), dict()) for count in args.ids]
+    if args.samples:
+        for name, iter_records in (("sparrows.pdf", iter_sparrow_records), ("centurion.pdf", iter_centurion_records)):
+            with redirect_stdout(io.StringIO()):
+                extracted_data, page_errors = page_engine.collect_events(
+                    iter_records(os.path.join(ROOT, "resources", name)))
+            extractions.append((name, extracted_data, page_errors))
+
+    print(f"{'extraction':<22} {'mode':<7} {'payload bytes':>13} {'S3 bytes':>9} {'seconds':>8} fits Event invoke")
+    for name, extracted_data, page_errors in extractions:
+        for mode, round_trip in (("inline", legacy_round_trip), ("stored", stored_round_trip)):
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                payload_bytes, stored_bytes = round_trip(extracted_data, page_errors)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<22} {mode:<7} {payload_bytes:>13} {stored_bytes:>9} {elapsed:>8.2f} "
+                  f"{payload_bytes <= EVENT_PAYLOAD_LIMIT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "src"))
+import page_engine
+from page_snapshots import OFF, RECORD, REPLAY
+from sparrow_extraction import iter_sparrow_records
+from centurion_extraction import iter_centurion_records
+from first_integrated import iter_first_integrated_records
+
+EXTRACTORS = {"sparrows": iter_sparrow_records, "centurion": iter_centurion_records,
+              "first_integrated": iter_first_integrated_records}
+SAMPLES = [("sparrows.pdf", "sparrows"), ("centurion.pdf", "centurion"), ("CenturionLoft.pdf", "centurion")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time parsing a PDF against replaying its page snapshots")
+    parser.add_argument("--pdf", nargs=2, action="append", metavar=("PATH", "EXTRACTOR"),
+                        help=f"PDF and extractor ({', '.join(EXTRACTORS)}), the bundled samples by default")
+    args = parser.parse_args()
+    samples = args.pdf or [(os.path.join(ROOT, "resources", name), extractor) for name, extractor in SAMPLES]
+
+    print(f"{'pdf':<20} {'mode':<7} {'seconds':>8} {'same result'}")
+    for pdf_path, extractor in samples:
+        baseline = None
+        for mode in (OFF, RECORD, REPLAY):
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                result = page_engine.collect_events(EXTRACTORS[extractor](pdf_path, workers=1, snapshot_mode=mode))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or result
+            print(f"{os.path.basename(pdf_path):<20} {mode:<7} {elapsed:>8.2f} {result == baseline}")
+
+
+if __name__ == "__main__":
+    main()
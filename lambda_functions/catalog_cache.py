@@ -0,0 +1,190 @@
+import gzip
+import json
+import os
+import time
+from collections import namedtuple
+from io import BytesIO
+from botocore.exceptions import ClientError
+from openpyxl import load_workbook
+
+
+CATALOG_BUCKET = 'resources-and-extraction-data'
+CATALOG_KEY = 'Full_list_of_Manufacturers_and_Models.xlsx'
+# built from the workbook by src/manufacturer_catalog.py and uploaded next to it
+ARTIFACT_KEY = 'Full_list_of_Manufacturers_and_Models.json.gz'
+ARTIFACT_FORMAT = 2
+# 0 means the catalog is revalidated once per invocation
+REVALIDATE_SECONDS = float(os.environ.get('CATALOG_REVALIDATE_SECONDS', '0'))
+
+CatalogEntry = namedtuple("CatalogEntry", ["row", "keyword", "value", "tokens"])
+
+
+class PhraseIndex:
+    """
+    Index of catalog keywords keyed by their first lower-cased token.
+
+    A keyword made of several words matches when its tokens appear next to each other in the description. When
+    several keywords match, the one nearest the top of the sheet wins.
+    """
+
+    def __init__(self):
+        self.entries = list()
+        self._by_first_token = dict()
+        self._lowered = list()
+
+    def add(self, keyword, value):
+        entry = CatalogEntry(len(self.entries), keyword, value, tuple(str(keyword).lower().split()))
+        self.entries.append(entry)
+        self._lowered.append(str(keyword).lower())
+        if entry.tokens:
+            candidates = self._by_first_token.setdefault(entry.tokens[0], list())
+            if entry.tokens not in (candidate.tokens for candidate in candidates):
+                candidates.append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def first_match(self, description_tokens):
+        best = None
+        for position, token in enumerate(description_tokens):
+            for entry in self._by_first_token.get(token, ()):
+                if best is not None and entry.row >= best.row:
+                    break
+                if tuple(description_tokens[position:position + len(entry.tokens)]) == entry.tokens:
+                    best = entry
+                    break
+        return best
+
+    def first_substring_match(self, description):
+        text = description.lower()
+        for entry, lowered in zip(self.entries, self._lowered):
+            if lowered in text:
+                return entry
+        return None
+
+
+class ManufacturerCatalog:
+    def __init__(self):
+        self.manufacturers = PhraseIndex()
+        self.models = PhraseIndex()
+
+    @classmethod
+    def from_workbook(cls, filename):
+        workbook = load_workbook(filename=filename, read_only=True)
+        manufacturer_rows = [(row[0], row[1] if len(row) > 1 else None)
+                             for row in workbook['Manufacture'].iter_rows(min_row=2, values_only=True) if row and row[0]]
+        model_rows = [(row[0], row[1] if len(row) > 1 else None)
+                      for row in workbook['Model'].iter_rows(min_row=2, values_only=True) if row and row[0]]
+        workbook.close()
+        return cls.from_rows(manufacturer_rows, model_rows)
+
+    @classmethod
+    def from_rows(cls, manufacturer_rows, model_rows):
+        catalog = cls()
+        for keyword, value in manufacturer_rows:
+            catalog.manufacturers.add(keyword, value)
+        for keyword, value in model_rows:
+            catalog.models.add(keyword, value)
+        return catalog
+
+    def find_manufacturer(self, description: str):
+        return self.manufacturers.first_match(description.lower().split())
+
+    def find_model(self, description: str):
+        return self.models.first_match(description.lower().split())
+
+    def find_model_in_text(self, description: str):
+        return self.models.first_substring_match(description)
+
+
+def is_not_modified(error):
+    status_code = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return status_code == 304 or error.response.get('Error', {}).get('Code') in ('304', 'NotModified')
+
+
+class CatalogCache:
+    """
+    Keeps the parsed catalog in module scope so warm containers reuse it across invocations.
+
+    The catalog is fetched on the first lookup, from the prebuilt artifact when its source hash matches the
+    workbook's ETag and from the workbook otherwise. After that the workbook is revalidated with a conditional
+    HEAD on its ETag at most once per invocation, and only when the last check is older than revalidate_seconds.
+    failed tells whether loading or revalidating the catalog failed during the current invocation.
+    """
+
+    def __init__(self, s3_client, bucket=CATALOG_BUCKET, key=CATALOG_KEY, artifact_key=ARTIFACT_KEY,
+                 revalidate_seconds=REVALIDATE_SECONDS, clock=time.monotonic):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.artifact_key = artifact_key
+        self.revalidate_seconds = revalidate_seconds
+        self.clock = clock
+        self.catalog = None
+        self.etag = None
+        self.checked_at = None
+        self.revalidated = False
+        self.downloads = 0
+        self.artifact_loads = 0
+        self.not_modified = 0
+        self.failed = False
+
+    def start_invocation(self):
+        self.revalidated = False
+        self.failed = False
+
+    def get(self):
+        if self.catalog is None or (not self.revalidated and
+                                    self.clock() - self.checked_at >= self.revalidate_seconds):
+            try:
+                self._refresh()
+            except Exception:
+                self.failed = True
+                raise
+        return self.catalog
+
+    def _refresh(self):
+        request = {'Bucket': self.bucket, 'Key': self.key}
+        if self.catalog is not None and self.etag:
+            request['IfNoneMatch'] = self.etag
+        try:
+            etag = self.s3_client.head_object(**request).get('ETag')
+        except ClientError as e:
+            if self.catalog is None or not is_not_modified(e):
+                raise
+            self.not_modified += 1
+        else:
+            catalog = self._load_artifact(etag)
+            if catalog is None:
+                catalog, etag = self._load_workbook()
+            self.catalog, self.etag = catalog, etag
+        self.checked_at = self.clock()
+        self.revalidated = True
+
+    def _load_artifact(self, etag):
+        if not self.artifact_key or not etag:
+            return None
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.artifact_key)
+        except ClientError as e:
+            print(f"Catalog artifact s3://{self.bucket}/{self.artifact_key} not available: {e}")
+            return None
+        try:
+            # plain JSON, so whoever can write to the bucket cannot run code in the function
+            artifact = json.loads(gzip.decompress(response['Body'].read()))
+        except (OSError, ValueError) as e:
+            print(f"Catalog artifact s3://{self.bucket}/{self.artifact_key} could not be read: {e}")
+            return None
+        if not isinstance(artifact, dict) or artifact.get('format') != ARTIFACT_FORMAT or artifact.get('source_md5') != etag.strip('"'):
+            print(f"Catalog artifact s3://{self.bucket}/{self.artifact_key} is out of date, loading the workbook")
+            return None
+        self.artifact_loads += 1
+        print(f"Manufacturer catalog loaded from s3://{self.bucket}/{self.artifact_key}, ETag: {etag}")
+        return ManufacturerCatalog.from_rows(artifact['manufacturers'], artifact['models'])
+
+    def _load_workbook(self):
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        catalog = ManufacturerCatalog.from_workbook(BytesIO(response['Body'].read()))
+        self.downloads += 1
+        print(f"Manufacturer catalog loaded from s3://{self.bucket}/{self.key}, ETag: {response.get('ETag')}")
+        return catalog, response.get('ETag')
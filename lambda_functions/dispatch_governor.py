@@ -0,0 +1,257 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def parse_limits(text):
+    """'sparrow_extraction=10,first_integrated=4' as a dict of function name to limit."""
+    limits = dict()
+    for item in text.split(','):
+        if item.strip():
+            name, _, limit = item.partition('=')
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+# extractions of one function that may run at once, unless GOVERNOR_LIMITS names the function
+DEFAULT_LIMIT = int(os.environ.get('GOVERNOR_DEFAULT_LIMIT', '10'))
+LIMITS = parse_limits(os.environ.get('GOVERNOR_LIMITS', ''))
+# dispatches per second per function, with bursts of up to its limit
+RATE = float(os.environ.get('GOVERNOR_RATE', '2'))
+# an extraction function releases its lease when it finishes; one that crashed or timed out without releasing it
+# holds the slot this long, so keep it above the extraction functions' timeout
+LEASE_SECONDS = float(os.environ.get('GOVERNOR_LEASE_SECONDS', '900'))
+# inside Lambda the state is an S3 object every container of every function updates; elsewhere it is held in
+# memory, or in GOVERNOR_STATE_FILE when that is set
+STATE_BUCKET = os.environ.get('GOVERNOR_STATE_BUCKET', 'resources-and-extraction-data')
+STATE_KEY = os.environ.get('GOVERNOR_STATE_KEY', 'dispatch-governor/state.json')
+STATE_FILE = os.environ.get('GOVERNOR_STATE_FILE', os.path.join(tempfile.gettempdir(), 'dispatch_governor.json'))
+# conditional writes an update makes before giving up, when other containers keep changing the state first
+STATE_ATTEMPTS = 8
+
+
+class StateConflictError(Exception):
+    """Raised when the state kept changing under an update for all of its attempts."""
+
+
+class MemoryStateStore:
+    """Governor state in a dict, shared by the threads of one process."""
+
+    def __init__(self):
+        self.state = dict()
+        self._lock = threading.Lock()
+
+    def update(self, change):
+        """Calls change(state), which may modify the state, with no other update in between; returns its result."""
+        with self._lock:
+            return change(self.state)
+
+
+class FileStateStore:
+    """Governor state in a JSON file, locked while it is updated so the processes sharing it take turns."""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def update(self, change):
+        with self._lock, open(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600), 'r+') as state_file:
+            if fcntl is not None:
+                fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                state = json.loads(state_file.read() or '{}')
+            except ValueError:
+                # a state lost with the file costs at most one lease period of over-dispatching
+                state = dict()
+            result = change(state)
+            state_file.seek(0)
+            state_file.truncate()
+            json.dump(state, state_file)
+            state_file.flush()
+            return result
+
+
+def error_code(error):
+    # botocore is not imported here, the dispatcher imports this module at start-up
+    return (getattr(error, 'response', None) or {}).get('Error', {}).get('Code')
+
+
+def conditional_write_failed(error):
+    # the object was written, or deleted, since it was read
+    return error_code(error) in ('PreconditionFailed', 'ConditionalRequestConflict', 'NoSuchKey')
+
+
+class S3StateStore:
+    """
+    Governor state in a JSON object on S3, shared by every container. An update reads the object with its ETag and
+    writes it back If-Match that ETag, or If-None-Match * while there is none, and starts over when another
+    container wrote in between; the threads of one container take turns. get_client returns the S3 client, which
+    is only asked for on the first update.
+    """
+
+    def __init__(self, get_client=None, bucket=STATE_BUCKET, key=STATE_KEY, attempts=STATE_ATTEMPTS,
+                 sleep=time.sleep):
+        self.get_client = get_client
+        self.bucket = bucket
+        self.key = key
+        self.attempts = attempts
+        self.sleep = sleep
+        self._lock = threading.Lock()
+
+    def client(self):
+        if self.get_client is None:
+            import retry_policy
+            client = retry_policy.retrying_client('s3')
+            self.get_client = lambda: client
+        return self.get_client()
+
+    def update(self, change):
+        with self._lock:
+            s3_client = self.client()
+            for attempt in range(self.attempts):
+                state, etag = self._read(s3_client)
+                result = change(state)
+                condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+                try:
+                    s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=json.dumps(state).encode(),
+                                         ContentType='application/json', **condition)
+                    return result
+                except Exception as e:
+                    if not conditional_write_failed(e):
+                        raise
+                self.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+            raise StateConflictError(f"s3://{self.bucket}/{self.key} changed under {self.attempts} updates in a row")
+
+    def _read(self, s3_client):
+        try:
+            response = s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        except Exception as e:
+            if error_code(e) not in ('NoSuchKey', '404'):
+                raise
+            return dict(), None
+        try:
+            state = json.loads(response['Body'].read() or b'{}')
+        except ValueError:
+            # a state lost with the object costs at most one lease period of over-dispatching
+            state = dict()
+        return state, response['ETag']
+
+
+def default_store(get_client=None):
+    """The store of the environment; get_client is the S3 client factory of an S3StateStore."""
+    if 'GOVERNOR_STATE_FILE' in os.environ:
+        return FileStateStore()
+    if os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+        return S3StateStore(get_client)
+    return MemoryStateStore()
+
+
+class DispatchGovernor:
+    """
+    Flow control for dispatching extractions, per extraction function.
+
+    A dispatch needs a token from a bucket refilled at rate per second, holding at most the function's limit, and
+    one of limit slots. A slot is a lease with an id, which the dispatcher passes to the extraction function in
+    its payload. The extraction function releases the lease when it finishes, and the dispatcher when the invoke
+    failed; a lease nobody released expires lease_seconds after the dispatch.
+    """
+
+    def __init__(self, store=None, limits=None, default_limit=DEFAULT_LIMIT, rate=RATE, lease_seconds=LEASE_SECONDS,
+                 clock=time.time, sleep=time.sleep):
+        self.store = store if store is not None else default_store()
+        self.limits = LIMITS if limits is None else limits
+        self.default_limit = default_limit
+        self.rate = rate
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self.sleep = sleep
+
+    def limit(self, function_name):
+        return self.limits.get(function_name, self.default_limit)
+
+    def try_acquire(self, function_name, lease_id):
+        """
+        Takes a token and a slot for one dispatch, under lease_id. Returns 0 when it did, otherwise the seconds
+        until it can.
+        """
+        now = self.clock()
+        limit = self.limit(function_name)
+
+        def change(state):
+            entry = state.setdefault(function_name, {'tokens': limit, 'updated': now, 'leases': {}})
+            entry['leases'] = {lease: expiry for lease, expiry in entry['leases'].items() if expiry > now}
+            entry['tokens'] = min(limit, entry['tokens'] + max(0.0, now - entry['updated']) * self.rate)
+            entry['updated'] = now
+            if entry['tokens'] >= 1 and len(entry['leases']) < limit:
+                entry['tokens'] -= 1
+                entry['leases'][lease_id] = now + self.lease_seconds
+                return 0.0
+            waits = [(1 - entry['tokens']) / self.rate] if entry['tokens'] < 1 else []
+            if len(entry['leases']) >= limit:
+                # a limit of 0 pauses the function, no lease ever frees a slot
+                expiries = sorted(entry['leases'].values())
+                waits.append(expiries[len(expiries) - limit] - now if limit > 0 else self.lease_seconds)
+            return max(waits)
+        return self.store.update(change)
+
+    def acquire(self, function_name, timeout):
+        """
+        Waits up to timeout seconds to dispatch to function_name. Returns the id of the lease the dispatch holds,
+        or None when it may not go ahead. The whole timeout is spent before giving up, since a slot can be given
+        back at any time.
+        """
+        lease_id = uuid.uuid4().hex[:12]
+        deadline = self.clock() + timeout
+        while True:
+            try:
+                wait = self.try_acquire(function_name, lease_id)
+            except StateConflictError as e:
+                print(f"Dispatch governor state is busy, trying again: {e}")
+                wait = 1 / self.rate
+            if wait <= 0:
+                return lease_id
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return None
+            self.sleep(min(wait, remaining))
+
+    def release(self, function_name, lease_id, return_token=False):
+        """
+        Frees the slot of lease_id. return_token also gives back its token, for a dispatch whose invoke failed and
+        so never reached the function.
+        """
+        limit = self.limit(function_name)
+
+        def change(state):
+            entry = state.get(function_name)
+            if entry and entry['leases'].pop(lease_id, None) is not None and return_token:
+                entry['tokens'] = min(limit, entry['tokens'] + 1)
+        self.store.update(change)
+
+    def finished(self, function_name, event):
+        """
+        Called by an extraction function once it is done with an event of the dispatcher, to release the event's
+        lease. A lease that cannot be released is left to expire.
+        """
+        lease_id = event.get('lease_id') if isinstance(event, dict) else None
+        if not lease_id:
+            return
+        try:
+            self.release(function_name, lease_id)
+        except Exception as e:
+            print(f"Lease {lease_id} of {function_name} not released, it expires on its own: {e}")
+
+    def in_flight(self, function_name):
+        now = self.clock()
+
+        def count(state):
+            return sum(1 for expiry in state.get(function_name, {}).get('leases', {}).values() if expiry > now)
+        return self.store.update(count)
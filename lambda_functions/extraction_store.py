@@ -0,0 +1,98 @@
+import gzip
+import io
+import json
+import uuid
+from datetime import datetime
+
+
+EXTRACTION_BUCKET = 'resources-and-extraction-data'
+EXTRACTION_PREFIX = 'extraction-results/'
+EXTRACTION_FORMAT = 1
+
+
+def iter_extraction_lines(extracted_data, page_errors, client, filename):
+    """
+    Yields the JSON lines of an extraction.
+
+    The first line holds the client, filename and page errors. The id numbers of one pack share the same record
+    dict, so every record is written once, as a "record" line, before the first "ids" line that uses it. An "ids"
+    line lists consecutive id numbers with the same record, which keeps the row order of extracted_data.
+    """
+    # page numbers become strings, as they did when the dict travelled in the invoke payload
+    yield {'format': EXTRACTION_FORMAT, 'client': client, 'filename': filename,
+           'page_errors': {str(page): error for page, error in page_errors.items()}}
+    record_indexes = dict()
+    ids, current_index = list(), None
+    for id_number, record in extracted_data.items():
+        index = record_indexes.get(id(record))
+        if index is None:
+            index = record_indexes[id(record)] = len(record_indexes)
+            if ids:
+                yield {'ids': ids, 'record': current_index}
+                ids = list()
+            yield {'record': index, 'value': record}
+        elif index != current_index and ids:
+            yield {'ids': ids, 'record': current_index}
+            ids = list()
+        ids.append(id_number)
+        current_index = index
+    if ids:
+        yield {'ids': ids, 'record': current_index}
+
+
+def encode_extraction(extracted_data, page_errors, client, filename):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as gzip_file:
+        for line in iter_extraction_lines(extracted_data, page_errors, client, filename):
+            gzip_file.write(json.dumps(line, default=str).encode() + b'\n')
+    return buffer.getvalue()
+
+
+def extraction_key(filename, prefix=EXTRACTION_PREFIX):
+    # excel_management deletes the object after reading it, so each upload gets its own key even when two PDFs
+    # of the same name are extracted on the same day
+    return f"{prefix}{datetime.now().strftime('%Y-%m-%d')}/{uuid.uuid4().hex[:12]}/{filename}.jsonl.gz"
+
+
+def put_extraction(s3_client, extracted_data, page_errors, client, filename,
+                   bucket=EXTRACTION_BUCKET, prefix=EXTRACTION_PREFIX):
+    """Uploads the extraction and returns the small pointer payload for the excel_management invoke."""
+    body = encode_extraction(extracted_data, page_errors, client, filename)
+    key = extraction_key(filename, prefix)
+    s3_client.put_object(Body=body, Bucket=bucket, Key=key, ContentEncoding='gzip')
+    print(f"Extraction of {len(extracted_data)} ids stored in {len(body)} bytes at s3://{bucket}/{key}")
+    return {'extraction_bucket': bucket, 'extraction_key': key, 'client': client, 'filename': filename}
+
+
+class StoredExtraction:
+    """
+    Reads an extraction back from a binary stream, such as an S3 StreamingBody, while the rows are consumed.
+
+    Only the distinct records are held in memory. rows() yields (id number, record) pairs and can be passed
+    straight to create_excel.
+    """
+
+    def __init__(self, stream):
+        self._lines = gzip.GzipFile(fileobj=stream, mode='rb')
+        header = json.loads(self._lines.readline())
+        if header.get('format') != EXTRACTION_FORMAT:
+            raise ValueError(f"unsupported extraction format {header.get('format')}")
+        self.client = header['client']
+        self.filename = header['filename']
+        self.page_errors = header['page_errors']
+
+    def rows(self):
+        records = dict()
+        for raw_line in self._lines:
+            line = json.loads(raw_line)
+            if 'ids' in line:
+                record = records[line['record']]
+                for id_number in line['ids']:
+                    yield id_number, record
+            else:
+                records[line['record']] = line['value']
+        self._lines.close()
+
+
+def open_extraction(s3_client, bucket, key):
+    return StoredExtraction(s3_client.get_object(Bucket=bucket, Key=key)['Body'])
@@ -0,0 +1,199 @@
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+try:
+    import resource
+except ImportError:
+    # Windows has no getrusage, the peak RSS is then not reported
+    resource = None
+
+
+# CloudWatch namespace of the Embedded Metric Format records written inside Lambda
+NAMESPACE = "PdfExtraction"
+# outside Lambda each document's metrics are appended to this JSON lines file
+METRICS_FILE = os.environ.get("PDF_METRICS_FILE", os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "database", "stage_metrics.jsonl")))
+# set PDF_METRICS=off to record nothing
+ENABLED = os.environ.get("PDF_METRICS", "on").lower() not in ("off", "0", "false")
+
+# the document being measured in this thread, None outside document()
+_current = ContextVar("document_metrics", default=None)
+
+
+class DocumentMetrics:
+    """
+    Timings and counters of one document.
+
+    Each stage accumulates its total seconds and number of calls. Stages can be nested, e.g. "tables" runs inside
+    "page", so their times overlap and do not add up to the document's seconds.
+    """
+
+    def __init__(self, document, **properties):
+        self.document = document
+        self.properties = properties
+        self.stages = dict()
+        self.counters = Counter()
+        self.seconds = 0.0
+        self.peak_rss_mb = None
+
+    def add_stage(self, name, seconds, calls=1):
+        total = self.stages.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += calls
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def snapshot(self):
+        return {"stages": {name: list(total) for name, total in self.stages.items()}, "counters": dict(self.counters)}
+
+    def merge(self, snapshot):
+        for name, (seconds, calls) in snapshot["stages"].items():
+            self.add_stage(name, seconds, calls)
+        self.counters.update(snapshot["counters"])
+
+    def record(self):
+        return {"document": self.document, **self.properties, "seconds": round(self.seconds, 6),
+                "peak_rss_mb": self.peak_rss_mb,
+                "stages": {name: {"seconds": round(seconds, 6), "calls": calls}
+                           for name, (seconds, calls) in self.stages.items()},
+                "counters": dict(self.counters)}
+
+    def emf(self, function_name):
+        """The record in CloudWatch Embedded Metric Format: one metric per stage time, stage calls and counter."""
+        values = {"DocumentTime": self.seconds * 1000}
+        units = {"DocumentTime": "Milliseconds"}
+        for name, (seconds, calls) in self.stages.items():
+            values[f"{name}Time"], units[f"{name}Time"] = seconds * 1000, "Milliseconds"
+            values[f"{name}Calls"], units[f"{name}Calls"] = calls, "Count"
+        for name, value in self.counters.items():
+            values[name], units[name] = value, "Count"
+        if self.peak_rss_mb is not None:
+            values["PeakRss"], units["PeakRss"] = self.peak_rss_mb, "Megabytes"
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{"Namespace": NAMESPACE, "Dimensions": [["FunctionName"]],
+                                       "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()]}],
+            },
+            "FunctionName": function_name,
+            "document": self.document,
+            **self.properties,
+            **values,
+        }
+
+
+def peak_rss_mb():
+    """
+    The highest resident set size of this process so far, in MiB, None where getrusage is missing. In a warm
+    Lambda container it covers the earlier invocations too, like the Max Memory Used of the REPORT line.
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(maxrss / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def emit(metrics):
+    function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+    if function_name:
+        # the Lambda log stream is the EMF sink
+        print(json.dumps(metrics.emf(function_name), default=str))
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(METRICS_FILE)), exist_ok=True)
+    with open(METRICS_FILE, "a") as metrics_file:
+        metrics_file.write(json.dumps(metrics.record(), default=str) + "\n")
+
+
+@contextmanager
+def document(name, **properties):
+    """
+    Measures one document. Stages and counters recorded inside the block, in this thread, are added to it, and the
+    metrics are emitted when the block ends. Inside another document() the outer document is reused.
+    """
+    metrics = _current.get()
+    if metrics is not None or not ENABLED:
+        yield metrics
+        return
+    metrics = DocumentMetrics(name, **properties)
+    token = _current.set(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.seconds = time.perf_counter() - start
+        metrics.peak_rss_mb = peak_rss_mb()
+        _current.reset(token)
+        emit(metrics)
+
+
+@contextmanager
+def stage(name):
+    """Adds the time spent in the block to the stage of the current document, if one is being measured."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_stage(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of stage()."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = _current.get()
+            if metrics is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.add_stage(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, value)
+
+
+def set_property(name, value):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.properties[name] = value
+
+
+def measuring():
+    return _current.get() is not None
+
+
+def collect(function, *args):
+    """
+    Runs function(*args) under a fresh, unemitted DocumentMetrics and returns (result, snapshot). Worker processes
+    use it to send their stages back to the parent, which merges them with merge_snapshot.
+    """
+    metrics = DocumentMetrics(None)
+    token = _current.set(metrics)
+    try:
+        return function(*args), metrics.snapshot()
+    finally:
+        _current.reset(token)
+
+
+def merge_snapshot(snapshot):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.merge(snapshot)
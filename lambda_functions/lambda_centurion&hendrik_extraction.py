@@ -1,97 +1,66 @@
 import json
 from datetime import datetime
-import boto3
 import re
 import pdfplumber
 from io import BytesIO
-from openpyxl import load_workbook
-
-
-s3 = boto3.client('s3')
-lambda_client = boto3.client('lambda')
-retries = 3
-
-
-def move_pdf_to_out_bucket(source_bucket, object_key, file_content, file_folder):
-    target_bucket = 'pdf-out-bucket'
-    # Get the current date in the format YYYY-MM-DD
-    current_date = datetime.now().strftime('%Y-%m-%d')
-
-    # Check if the folder with the current date exists in the target S3 bucket
-    target_folder_key = f'{file_folder}/{current_date}/{object_key}'
-
-    # Check if the folder exists
-    existing_objects = s3.list_objects(Bucket=target_bucket, Prefix=f'{file_folder}/{current_date}/')
-
-    if 'Contents' not in existing_objects:
-        # Folder doesn't exist, create it
-        s3.put_object(Body='', Bucket=target_bucket, Key=f'{file_folder}/{current_date}/')
-
-    # Upload the file to the target S3 bucket and folder
-    s3.put_object(Body=file_content, Bucket=target_bucket, Key=target_folder_key)
-    print(f"File moved to the target bucket: {target_bucket}, Folder: {file_folder}/{current_date}")
-
-    # Delete the original file from the source bucket (uncomment if needed)
-    s3.delete_object(Bucket=source_bucket, Key=object_key)
-    print(f"File deleted from source bucket: {source_bucket}, file: {object_key}")
-
-
-def invoke_excel_management_lambda(source_bucket, object_key, file_content, extracted_data, client, filename, page_errors):
-    # Payload to pass to the second Lambda function
-    global retries
-    payload = {
-        'extracted_data': extracted_data,
-        'client': client,
-        'filename': filename,
-        'page_errors': page_errors
-    }
+import instrumentation
+from document_profiler import profile_document
+from catalog_cache import CatalogCache
+from dispatch_governor import DispatchGovernor, default_store
+from extraction_store import put_extraction
+from pdf_archive import archive_pdf
+import retry_policy
+from s3_result_cache import S3ResultCache
+from page_content import PageContent, release_page
+from page_templates import TEMPLATES
+from page_router import iter_page_routes, route_centurion_page
+
+
+# S3 calls are retried by retry_policy.S3_POLICY, invokes by INVOKE_POLICY
+s3 = retry_policy.retrying_client('s3')
+lambda_client = retry_policy.client('lambda')
+catalog_cache = CatalogCache(s3)
+result_cache = S3ResultCache(s3)
+# the governor pdf_processing dispatches through; this function only releases its leases
+governor = DispatchGovernor(default_store(lambda: s3))
+
+
+def invoke_excel_management_lambda(source_bucket, object_key, file_content, extracted_data, client, filename, page_errors, etag=None):
+    # The records go to S3, the invoke payload only points at them. Stored under the PDF's ETag, they are also
+    # reused when the same PDF is uploaded again
+    with instrumentation.stage("s3_put"):
+        # a result found without the catalog, where Manufacturer and Model come from, is not kept for later uploads
+        if etag and catalog_cache.etag and not catalog_cache.failed:
+            pointer = result_cache.store(etag, 'centurion_extraction', catalog_cache.etag, extracted_data, page_errors,
+                                         client, filename)
+        else:
+            pointer = put_extraction(s3, extracted_data, page_errors, client, filename)
+    payload = json.dumps(pointer)
+    print(f"excel_management payload: {len(payload)} bytes")
 
     # Invoke the second Lambda function asynchronously
-    response = lambda_client.invoke(
-        FunctionName='excel_management',
-        InvocationType='Event',
-        Payload=json.dumps(payload)
-    )
-
-    # Optionally, you can check the response for success or handle errors
-    status_code = response['StatusCode']
+    with instrumentation.stage("invoke"):
+        status_code = retry_policy.invoke_async(lambda_client, 'excel_management', payload)
     if status_code == 202:
         print(f" Lambda function: excel_management invoked successfully.")
-        move_pdf_to_out_bucket(source_bucket, object_key, file_content, "Success")
+        archive_pdf(s3, source_bucket, object_key, "Success", len(file_content))
     else:
         print(f"Error invoking Lambda function: excel_management. Status code: {status_code}")
-        if retries:
-            retries -= 1
-            print("Retrying to invoke the Lambda function: excel_management")
-            invoke_excel_management_lambda(source_bucket, object_key, file_content, extracted_data, client, filename, page_errors)
-        else:
-            move_pdf_to_out_bucket(source_bucket, object_key, file_content, "Failure")
+        archive_pdf(s3, source_bucket, object_key, "Failure", len(file_content))
+    # the result has been handed on, so trimming the cache holds nothing up
+    result_cache.sweep_sometimes()
 
 
+@instrumentation.timed("catalog_lookup")
 def get_manufacture_model(description: str):
-    # Specify the S3 bucket and file name
-    excel_bucket = 'resources-and-extraction-data'
-    excel_file_key = 'Full_list_of_Manufacturers_and_Models.xlsx'
-
-    # Download the Excel file from S3
-    excel_file_obj = s3.get_object(Bucket=excel_bucket, Key=excel_file_key)
-    excel_file_content = excel_file_obj['Body'].read()
-
-    workbook = load_workbook(filename=BytesIO(excel_file_content), read_only=True)
-    manufacturer_sheet = workbook['Manufacture']
-    model_sheet =workbook['Model']
-    description_keyword =description.lower().split()
+    catalog = catalog_cache.get()
     manufacture, model = "",""
-    for row in manufacturer_sheet.iter_rows(min_row=2, values_only=True):
-        keyword = row[0]
-        if keyword and str(keyword).lower() in description_keyword:
-            manufacture = keyword
-            break
-    for row in model_sheet.iter_rows(min_row=2, values_only=True):
-        keyword = row[0]
-        if keyword and str(keyword).lower() in description_keyword:
-            model = keyword
-            break
+    manufacturer_entry = catalog.find_manufacturer(description)
+    if manufacturer_entry:
+        manufacture = manufacturer_entry.keyword
+    model_entry = catalog.find_model(description)
+    if model_entry:
+        model = model_entry.keyword
     return manufacture, model
 
 
@@ -103,6 +72,7 @@ def extract_quantity(text):
         return None
 
 
+@instrumentation.timed("swl_parsing")
 def process_swl(swl: str):
     pattern = r'^(\d+(?:\.\d+)?)([a-zA-Z]+)?\s*(.*)$'
 
@@ -133,6 +103,7 @@ def process_swl(swl: str):
 
 
 
+@instrumentation.timed("id_parsing")
 def get_identification_parts_list(input_string: str, quantity: int):
     numeric_part = ''.join(filter(str.isdigit, input_string))
     part_list = list()
@@ -147,6 +118,7 @@ def get_identification_parts_list(input_string: str, quantity: int):
     return part_list
 
 
+@instrumentation.timed("id_parsing")
 def get_identification_number_list(identification_numbers: str, quantity: int):
     identification_number_list = []
     if "to" in identification_numbers.lower():
@@ -188,47 +160,143 @@ def get_identification_number_list(identification_numbers: str, quantity: int):
 def extraction_centurion_pdf(source_bucket, object_key):
     try:
         print("<-------------extracting centurion pdf------------>")
-        pdf_file = s3.get_object(Bucket=source_bucket, Key=object_key)
-        file_content = pdf_file['Body'].read()
-        pdf_doc = pdfplumber.open(BytesIO(file_content))
-        extraction_info = dict()
-        page_errors = dict()
-        for i, page in enumerate(pdf_doc.pages):
-            try:
-                text = page.extract_text()
-                page = pdf_doc.pages[i]
-                if "Centurion" in text and "Hendrik" not in text:
-                    if page.extract_tables():
-                        print("page number:", i)
-                        page_tables = page.extract_tables()
-                        first_table = page_tables[0]
-                        # data1:Report Number / Date of Examination / Ref No
-                        table_data1 = first_table[0][13]
-                        # data2: Identify Company keywords
-                        table_data2 = first_table[1]
-                        # data3: Identify Text keywords
-                        table_data3 = first_table[2]
-                        # data4: Provide related Value
-                        table_data4 = first_table[4]
-                        # data5 ID number Value
-                        table_data5 = first_table[5]
-                        errors = list()
-                        identification_number_list = list()
-                        if "Quantity & Description of Equipment, Serial Numbers" in table_data3[0]:
+        with instrumentation.stage("s3_get"):
+            pdf_file = s3.get_object(Bucket=source_bucket, Key=object_key)
+            file_content = pdf_file['Body'].read()
+        instrumentation.count("s3_get_bytes", len(file_content))
+        with instrumentation.stage("pdf_open"):
+            pdf_doc = pdfplumber.open(BytesIO(file_content))
+        # the routes keep a pdfium copy of the document open from the first page on, closed below with pdf_doc
+        routes = iter_page_routes(file_content, route_centurion_page)
+        try:
+            instrumentation.count("pages", len(pdf_doc.pages))
+            extraction_info = dict()
+            page_errors = dict()
+            for i, (page, route) in enumerate(zip(pdf_doc.pages, routes)):
+                try:
+                    page_content = PageContent(page, TEMPLATES["Centurion"], route)
+                    if route == "Centurion":
+                        if page_content.tables:
+                            print("page number:", i)
+                            page_tables = page_content.tables
+                            first_table = page_tables[0]
+                            # data1:Report Number / Date of Examination / Ref No
+                            table_data1 = first_table[0][13]
+                            # data2: Identify Company keywords
+                            table_data2 = first_table[1]
+                            # data3: Identify Text keywords
+                            table_data3 = first_table[2]
+                            # data4: Provide related Value
+                            table_data4 = first_table[4]
+                            # data5 ID number Value
+                            table_data5 = first_table[5]
+                            errors = list()
+                            identification_number_list = list()
+                            if "Quantity & Description of Equipment, Serial Numbers" in table_data3[0]:
+
+                                id_numbers, description, mnfer, wwl, next_thorough = None, None, None, None, None
+                                quantity = 1
+
+                                for index in range(0, len(table_data3)):
+                                    try:
+                                        if table_data3[index] is None:
+                                            continue
+                                        text_to_compare = table_data3[index].lower()
+                                        if not description and "description" in text_to_compare:
+                                            description = table_data4[0].replace('\n', ' ')
+                                            serial_numbers = table_data5[index].split(":")[-1].strip()
+                                            mnfer = table_data4[4].strip()
+
+                                        elif not wwl and "working" in text_to_compare:
+                                            wwl = table_data4[index].strip()
+                                        elif not next_thorough and "next" in text_to_compare:
+                                            date_string = table_data4[index].strip()
+                                            date_obj = datetime.strptime(date_string, "%d/%m/%Y")
+                                            next_thorough = date_obj.strftime("%d/%m/%Y")
+                                        elif not id_numbers and "certificate" in text_to_compare:
+                                            id_numbers = table_data4[index].strip()
+                                    except Exception as e:
+                                        print("Error extracting value from page:", e)
+
+                                if id_numbers:
+                                    page_info = dict()
+                                    if description:
+                                        try:
+                                            item_description = description
+                                            if not item_description:
+                                                errors.append("Item Description not found")
+                                            else:
+                                                page_info["Item Description"] = description.split(':')[0]
+                                        except Exception as e:
+                                            errors.append(e)
+                                        try:
+                                            manufacturer, model = get_manufacture_model(description)
+                                            manufacturer = mnfer
+                                            if not manufacturer:
+                                                errors.append("Manufacturer not found")
+                                            else:
+                                                page_info["Manufacturer"] = manufacturer
+                                            if not model:
+                                                errors.append("Model not found")
+                                            else:
+                                                page_info["Model"] = model
+                                        except Exception as e:
+                                            errors.append(e)
+
+                                    if wwl:
+                                        try:
+                                            swl_value, swl_unit, swl_note = process_swl(wwl)
+                                            if not swl_value:
+                                                errors.append("SWL Value not found")
+                                            else:
+                                                page_info["SWL Value"] = swl_value
+                                            if not swl_unit:
+                                                errors.append("SWL Unit not Found")
+                                            else:
+                                                page_info["SWL Unit"] = swl_unit
+                                            page_info["SWL Note"] = swl_note
+                                        except Exception as e:
+                                            errors.append(e)
+                                    else:
+                                        errors.append("SWL not found in this page.")
+                                    page_info["Next Inspection Due Date"] = next_thorough
+                                    # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
+                                    table_data1_mapping = dict()
+                                    table_data1 = table_data1.splitlines()
 
-                            id_numbers, description, mnfer, wwl, next_thorough = None, None, None, None, None
-                            quantity = 1
+                                    for data in table_data1:
+                                        data_list = data.split(':', 1)
+                                        if len(data_list) == 2:
+                                            key, value = data_list
+                                            formattted_key = key.lower().replace(" ", "").replace("/", "").replace(".", "")
+                                            table_data1_mapping[formattted_key] = value.strip()
 
-                            for index in range(0, len(table_data3)):
-                                try:
+                                    page_info["Provider Identification"] = table_data1_mapping["custrefpono"]
+                                    page_info["Certificate No"] = page_info["Provider Identification"]
+                                    page_info["Previous Inspection"] = table_data1_mapping["dateofexamination"]
+
+                                    id_numbers = serial_numbers
+
+                                    if quantity == 1:
+                                        identification_number_list.append(id_numbers)
+
+                                    for identification_number in identification_number_list:
+                                        extraction_info[identification_number] = page_info
+
+                                else:
+                                    print("No identification error")
+
+                            elif "Qty, Description of Equipment, Serial Numbers" in table_data3[0]:
+                                quantity, id_numbers, description, mnfer, wwl, next_thorough = None, None, None, None, None, None
+                                for index in range(0, len(table_data3)):
                                     if table_data3[index] is None:
                                         continue
                                     text_to_compare = table_data3[index].lower()
                                     if not description and "description" in text_to_compare:
-                                        description = table_data4[0].replace('\n', ' ')
+                                        description = table_data4[index].replace('\n', ' ')
                                         serial_numbers = table_data5[index].split(":")[-1].strip()
+                                        quantity = extract_quantity(table_data4[index])
                                         mnfer = table_data4[4].strip()
-
                                     elif not wwl and "working" in text_to_compare:
                                         wwl = table_data4[index].strip()
                                     elif not next_thorough and "next" in text_to_compare:
@@ -237,105 +305,129 @@ def extraction_centurion_pdf(source_bucket, object_key):
                                         next_thorough = date_obj.strftime("%d/%m/%Y")
                                     elif not id_numbers and "certificate" in text_to_compare:
                                         id_numbers = table_data4[index].strip()
-                                except Exception as e:
-                                    print("Error extracting value from page:", e)
 
-                            if id_numbers:
-                                page_info = dict()
-                                if description:
-                                    try:
-                                        item_description = description
-                                        if not item_description:
-                                            errors.append("Item Description not found")
-                                        else:
-                                            page_info["Item Description"] = description.split(':')[0]
-                                    except Exception as e:
-                                        errors.append(e)
-                                    try:
+                                if id_numbers:
+                                    page_info = dict()
+                                    if description:
+                                        page_info["Item Description"] = description.split(':')[0]
                                         manufacturer, model = get_manufacture_model(description)
                                         manufacturer = mnfer
-                                        if not manufacturer:
-                                            errors.append("Manufacturer not found")
-                                        else:
-                                            page_info["Manufacturer"] = manufacturer
-                                        if not model:
-                                            errors.append("Model not found")
-                                        else:
-                                            page_info["Model"] = model
-                                    except Exception as e:
-                                        errors.append(e)
+                                        page_info["Manufacturer"] = manufacturer
+                                        page_info["Model"] = model
+                                    if wwl:
+                                        try:
+                                            swl_value, swl_unit, swl_note = process_swl(wwl)
+                                            if not swl_value:
+                                                errors.append("SWL Value not found")
+                                            else:
+                                                page_info["SWL Value"] = swl_value
+                                            if not swl_unit:
+                                                errors.append("SWL Unit not Found")
+                                            else:
+                                                page_info["SWL Unit"] = swl_unit
+                                            page_info["SWL Note"] = swl_note
+                                        except Exception as e:
+                                            errors.append(e)
+                                    else:
+                                        errors.append("SWL not found in this page.")
+                                    page_info["Next Inspection Due Date"] = next_thorough
+                                    # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
+                                    table_data1_mapping = dict()
+                                    table_data1 = table_data1.splitlines()
 
-                                if wwl:
-                                    try:
-                                        swl_value, swl_unit, swl_note = process_swl(wwl)
-                                        if not swl_value:
-                                            errors.append("SWL Value not found")
-                                        else:
-                                            page_info["SWL Value"] = swl_value
-                                        if not swl_unit:
-                                            errors.append("SWL Unit not Found")
-                                        else:
-                                            page_info["SWL Unit"] = swl_unit
-                                        page_info["SWL Note"] = swl_note
-                                    except Exception as e:
-                                        errors.append(e)
+                                    for data in table_data1:
+                                        data_list = data.split(':', 1)
+                                        if len(data_list) == 2:
+                                            key, value = data_list
+                                            formattted_key = key.lower().replace(" ", "").replace("/", "").replace(".", "")
+                                            table_data1_mapping[formattted_key] = value.strip()
+
+                                    page_info["Provider Identification"] = table_data1_mapping["custrefpono"]
+                                    page_info["Certificate No"] = page_info["Provider Identification"]
+                                    page_info["Previous Inspection"] = table_data1_mapping["dateofexamination"]
+
+                                    id_numbers = serial_numbers
+
+                                    if quantity > 1:
+                                        identification_number_list = get_identification_number_list(id_numbers, quantity)
+
+                                    for identification_number in identification_number_list:
+                                        extraction_info[identification_number] = page_info
+
+                                    # print(identification_numbers, page_info)
                                 else:
-                                    errors.append("SWL not found in this page.")
-                                page_info["Next Inspection Due Date"] = next_thorough
-                                # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
-                                table_data1_mapping = dict()
-                                table_data1 = table_data1.splitlines()
+                                    print("No identification error")
 
-                                for data in table_data1:
-                                    data_list = data.split(':', 1)
-                                    if len(data_list) == 2:
-                                        key, value = data_list
-                                        formattted_key = key.lower().replace(" ", "").replace("/", "").replace(".", "")
-                                        table_data1_mapping[formattted_key] = value.strip()
 
-                                page_info["Provider Identification"] = table_data1_mapping["custrefpono"]
-                                page_info["Certificate No"] = page_info["Provider Identification"]
-                                page_info["Previous Inspection"] = table_data1_mapping["dateofexamination"]
+                    elif route == "Hendrik":
+                        text = page_content.text
 
-                                id_numbers = serial_numbers
+                        # data1: Certificate No.
+                        certificate_no = None
+                        certificate_match = re.search(r'Certificate No\. :\s*(\d+)', text)
+                        if certificate_match:
+                            print("page number:", i)
+                            certificate_no = certificate_match.group(1)
 
-                                if quantity == 1:
-                                    identification_number_list.append(id_numbers)
+                        page_tables = page_content.tables
+                        first_table = page_tables[0]
+                        # data2: wwl
+                        table_data1 = first_table[3]
+                        # data3: description, manufacturer
+                        table_data2 = first_table[9]
+                        table_data4 = first_table[10]
+                        # data4: previous inspection
+                        table_data3 = first_table[14]
+                        # data5: ID Number
+                        table_data5 = first_table[2]
 
-                                for identification_number in identification_number_list:
-                                    extraction_info[identification_number] = page_info
+                        identification_number_list = list()
 
-                            else:
-                                print("No identification error")
-
-                        elif "Qty, Description of Equipment, Serial Numbers" in table_data3[0]:
-                            quantity, id_numbers, description, mnfer, wwl, next_thorough = None, None, None, None, None, None
-                            for index in range(0, len(table_data3)):
-                                if table_data3[index] is None:
-                                    continue
-                                text_to_compare = table_data3[index].lower()
-                                if not description and "description" in text_to_compare:
-                                    description = table_data4[index].replace('\n', ' ')
-                                    serial_numbers = table_data5[index].split(":")[-1].strip()
-                                    quantity = extract_quantity(table_data4[index])
-                                    mnfer = table_data4[4].strip()
-                                elif not wwl and "working" in text_to_compare:
-                                    wwl = table_data4[index].strip()
-                                elif not next_thorough and "next" in text_to_compare:
-                                    date_string = table_data4[index].strip()
-                                    date_obj = datetime.strptime(date_string, "%d/%m/%Y")
-                                    next_thorough = date_obj.strftime("%d/%m/%Y")
-                                elif not id_numbers and "certificate" in text_to_compare:
-                                    id_numbers = table_data4[index].strip()
-
-                            if id_numbers:
-                                page_info = dict()
-                                if description:
-                                    page_info["Item Description"] = description.split(':')[0]
-                                    manufacturer, model = get_manufacture_model(description)
-                                    manufacturer = mnfer
-                                    page_info["Manufacturer"] = manufacturer
-                                    page_info["Model"] = model
+                        id_numbers, wwl, pre_date = None, None, None
+                        id_data = table_data5[0]
+                        id_match = re.search(r'\)\s*([^\s]+)', id_data)
+                        if id_match:
+                            id_numbers = id_match.group(1)
+
+                        wwl_data = table_data1[0]
+                        wwl_match = re.search(r'(\d+(\.\d+)?\s*t)', wwl_data)
+                        if wwl_match:
+                            wwl = wwl_match.group(1)
+
+                        pre_data = table_data3[0]
+                        pre_match = re.search(r'(\d{2}-\d{2}-\d{4})', pre_data)
+                        if pre_match:
+                            pre_value = pre_match.group(1)
+                            pre_date = pre_value.replace('-', '/')
+
+                        description, next_thorough, provider, manufacturer, model = None, None, None, None, None
+                        quantity = 1
+
+                        for index in range(0, len(table_data2)):
+                            if table_data2[index] is None:
+                                continue
+                            text_to_compare = table_data2[index].lower()
+                            if not description and 'description' in text_to_compare:
+                                description = table_data4[index].replace('\n', ' ')
+                                manufacturer_data = table_data4[2]
+
+                        if id_numbers:
+                            page_info = dict()
+                            if description:
+                                page_info["Item Description"] = description.split(':')[0]
+                                try:
+                                    manufacturer, model = get_manufacture_model(manufacturer_data)
+                                    model = get_manufacture_model(description)
+                                    if not manufacturer:
+                                        errors.append("Manufacturer not found")
+                                    else:
+                                        page_info["Manufacturer"] = manufacturer
+                                    if not model:
+                                        errors.append("Model not found")
+                                    else:
+                                        page_info["Model"] = model
+                                except Exception as e:
+                                    errors.append(e)
                                 if wwl:
                                     try:
                                         swl_value, swl_unit, swl_note = process_swl(wwl)
@@ -352,142 +444,34 @@ def extraction_centurion_pdf(source_bucket, object_key):
                                         errors.append(e)
                                 else:
                                     errors.append("SWL not found in this page.")
+                                page_info["Certificate No"] = certificate_no
                                 page_info["Next Inspection Due Date"] = next_thorough
-                                # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
-                                table_data1_mapping = dict()
-                                table_data1 = table_data1.splitlines()
-
-                                for data in table_data1:
-                                    data_list = data.split(':', 1)
-                                    if len(data_list) == 2:
-                                        key, value = data_list
-                                        formattted_key = key.lower().replace(" ", "").replace("/", "").replace(".", "")
-                                        table_data1_mapping[formattted_key] = value.strip()
-
-                                page_info["Provider Identification"] = table_data1_mapping["custrefpono"]
-                                page_info["Certificate No"] = page_info["Provider Identification"]
-                                page_info["Previous Inspection"] = table_data1_mapping["dateofexamination"]
-
-                                id_numbers = serial_numbers
+                                page_info["Provider Identification"] = provider
+                                page_info["Previous Inspection"] = pre_date
 
-                                if quantity > 1:
-                                    identification_number_list = get_identification_number_list(id_numbers, quantity)
+                                if quantity == 1:
+                                    identification_number_list.append(id_numbers)
 
                                 for identification_number in identification_number_list:
                                     extraction_info[identification_number] = page_info
-
-                                # print(identification_numbers, page_info)
-                            else:
-                                print("No identification error")
-
-
-                elif "Hendrik" in text:
-                    page = pdf_doc.pages[i]
-                    text = page.extract_text()
-
-                    # data1: Certificate No.
-                    certificate_no = None
-                    certificate_match = re.search(r'Certificate No\. :\s*(\d+)', text)
-                    if certificate_match:
-                        print("page number:", i)
-                        certificate_no = certificate_match.group(1)
-
-                    page_tables = page.extract_tables()
-                    first_table = page_tables[0]
-                    # data2: wwl
-                    table_data1 = first_table[3]
-                    # data3: description, manufacturer
-                    table_data2 = first_table[9]
-                    table_data4 = first_table[10]
-                    # data4: previous inspection
-                    table_data3 = first_table[14]
-                    # data5: ID Number
-                    table_data5 = first_table[2]
-
-                    identification_number_list = list()
-
-                    id_numbers, wwl, pre_date = None, None, None
-                    id_data = table_data5[0]
-                    id_match = re.search(r'\)\s*([^\s]+)', id_data)
-                    if id_match:
-                        id_numbers = id_match.group(1)
-
-                    wwl_data = table_data1[0]
-                    wwl_match = re.search(r'(\d+(\.\d+)?\s*t)', wwl_data)
-                    if wwl_match:
-                        wwl = wwl_match.group(1)
-
-                    pre_data = table_data3[0]
-                    pre_match = re.search(r'(\d{2}-\d{2}-\d{4})', pre_data)
-                    if pre_match:
-                        pre_value = pre_match.group(1)
-                        pre_date = pre_value.replace('-', '/')
-
-                    description, next_thorough, provider, manufacturer, model = None, None, None, None, None
-                    quantity = 1
-
-                    for index in range(0, len(table_data2)):
-                        if table_data2[index] is None:
-                            continue
-                        text_to_compare = table_data2[index].lower()
-                        if not description and 'description' in text_to_compare:
-                            description = table_data4[index].replace('\n', ' ')
-                            manufacturer_data = table_data4[2]
-
-                    if id_numbers:
-                        page_info = dict()
-                        if description:
-                            page_info["Item Description"] = description.split(':')[0]
-                            try:
-                                manufacturer, model = get_manufacture_model(manufacturer_data)
-                                model = get_manufacture_model(description)
-                                if not manufacturer:
-                                    errors.append("Manufacturer not found")
-                                else:
-                                    page_info["Manufacturer"] = manufacturer
-                                if not model:
-                                    errors.append("Model not found")
-                                else:
-                                    page_info["Model"] = model
-                            except Exception as e:
-                                errors.append(e)
-                            if wwl:
-                                try:
-                                    swl_value, swl_unit, swl_note = process_swl(wwl)
-                                    if not swl_value:
-                                        errors.append("SWL Value not found")
-                                    else:
-                                        page_info["SWL Value"] = swl_value
-                                    if not swl_unit:
-                                        errors.append("SWL Unit not Found")
-                                    else:
-                                        page_info["SWL Unit"] = swl_unit
-                                    page_info["SWL Note"] = swl_note
-                                except Exception as e:
-                                    errors.append(e)
-                            else:
-                                errors.append("SWL not found in this page.")
-                            page_info["Certificate No"] = certificate_no
-                            page_info["Next Inspection Due Date"] = next_thorough
-                            page_info["Provider Identification"] = provider
-                            page_info["Previous Inspection"] = pre_date
-
-                            if quantity == 1:
-                                identification_number_list.append(id_numbers)
-
-                            for identification_number in identification_number_list:
-                                extraction_info[identification_number] = page_info
+                        else:
+                            print("No identification error")
                     else:
-                        print("No identification error")
-                else:
-                    print("No verified company found")
-            except Exception as e:
-                page_errors[i+1] = "Error" + str(e) + "occurred while processing the page:"
-                print("Error", e, "occurred while processing the page: ", i)
-        invoke_excel_management_lambda(source_bucket, object_key, file_content, extraction_info, "Centurion", object_key.replace("pdf", "xlsx"), page_errors)
+                        print("No verified company found")
+                except Exception as e:
+                    page_errors[i+1] = "Error" + str(e) + "occurred while processing the page:"
+                    print("Error", e, "occurred while processing the page: ", i)
+                finally:
+                    release_page(page)
+        finally:
+            routes.close()
+            pdf_doc.close()
+        instrumentation.count("records", len(extraction_info))
+        instrumentation.count("page_errors", len(page_errors))
+        invoke_excel_management_lambda(source_bucket, object_key, file_content, extraction_info, "Centurion", object_key.replace("pdf", "xlsx"), page_errors, pdf_file['ETag'])
     except Exception as e:
         print("An error occurred while processing in the pdf:", e)
-        move_pdf_to_out_bucket(source_bucket, object_key, file_content, "Failure")
+        archive_pdf(s3, source_bucket, object_key, "Failure")
 
 
 def lambda_handler(event, context):
@@ -495,8 +479,13 @@ def lambda_handler(event, context):
     try:
         source_bucket = event['source_bucket']
         object_key = event['object_key']
+        catalog_cache.start_invocation()
         print(f"Received payload from the first Lambda function. Source bucket: {source_bucket}, Object key: {object_key}")
-        extraction_centurion_pdf(source_bucket, object_key)
+        with instrumentation.document(object_key, vendor="Centurion"), profile_document(object_key, s3_client=s3):
+            extraction_centurion_pdf(source_bucket, object_key)
     except Exception as e:
         print("An error occurred while decoding source bucket and object key:", e)
+    finally:
+        # frees the slot pdf_processing took for this extraction
+        governor.finished('centurion_extraction', event)
 
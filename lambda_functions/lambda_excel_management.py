@@ -3,10 +3,14 @@ import boto3
 from io import BytesIO
 import openpyxl
 from datetime import datetime
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, Border, Side
+from extraction_store import open_extraction
+import instrumentation
+import retry_policy
 
-s3 = boto3.client('s3')
-retries = 3
+# S3 calls are retried by retry_policy.S3_POLICY
+s3 = retry_policy.retrying_client('s3')
 topic_arn = ""
 
 
@@ -23,61 +27,61 @@ def send_sns(message, subject):
         return True
 
 
+@instrumentation.timed("s3_put")
 def save_workbook_to_s3(workbook, bucket, key):
     # Save the modified workbook to bytes
     print("<--------------saving excel on the bucket------------------>")
     current_date = datetime.now().strftime('%Y-%m-%d')
+    # S3 has no folders, the date prefix of the key is all the console needs to show one
     target_key = f'{current_date}/{key}'
-     # Check if the folder exists
-    existing_objects = s3.list_objects(Bucket=bucket, Prefix=f'{current_date}/')
-
-    if 'Contents' not in existing_objects:
-        # Folder doesn't exist, create it
-        s3.put_object(Body='', Bucket=bucket, Key=f'{current_date}/')
     buffer = BytesIO()
     workbook.save(buffer)
     # Upload the modified Excel file back to S3, overwriting the original file
     s3.put_object(Body=buffer.getvalue(), Bucket=bucket, Key=target_key)
 
 
-def create_excel(extracted_data: dict, filename: str, client: str, page_errors: dict, column_mapping: dict):
+@instrumentation.timed("excel_build")
+def create_excel(extracted_data, filename: str, client: str, page_errors, column_mapping: dict):
+    """
+    Builds the workbook in openpyxl's write-only mode, one pre-built row list per record, so memory does not grow
+    with the number of records. extracted_data and page_errors are dicts or iterators of (key, value) pairs.
+    """
     print("<--------------Creating new excel------------------>")
-    workbook = openpyxl.Workbook()  # Create a new Workbook
-
-    # Create a sheet for extracted data
-    sheet_data = workbook.active
-    sheet_data.title = "Extraction Data"  # Set sheet name
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet_data = workbook.create_sheet(title="Extraction Data")
 
-    sheet_data['A1'] = "Rig-Ware import v2"
-    sheet_data['B1'] = client
-    sheet_data['C1'] = "CreateLocations=No"
+    # write-only rows are plain lists, so each header's column letter becomes a list position
+    column_positions = {header: ord(column) - 65 for header, column in column_mapping.items()}
+    row_width = max(column_positions.values()) + 1
 
-    # Write column headers for extracted data sheet
+    # column widths have to be set before the first row is written
     for header, column in column_mapping.items():
-        cell = sheet_data[column + '2']
-        cell.value = header
+        sheet_data.column_dimensions[column].width = max(len(header), 10)  # Set a minimum width of 10 characters
+
+    sheet_data.append(["Rig-Ware import v2", client, "CreateLocations=No"])
+    header_row = [None] * row_width
+    for header, position in column_positions.items():
+        cell = WriteOnlyCell(sheet_data, value=header)
         cell.font = Font(bold=True)
         cell.alignment = Alignment(horizontal='center', vertical='center')  # Center align the text
         cell.border = Border(bottom=Side(border_style='thin'))  # Add a thin border at the bottom
-
-        # Adjust column width to fit the header text
-        column_width = max(len(header), 10)  # Set a minimum width of 10 characters
-        sheet_data.column_dimensions[column].width = column_width
+        header_row[position] = cell
+    sheet_data.append(header_row)
 
     # Write extracted data to the worksheet
-    for row_idx, (key, data) in enumerate(extracted_data.items(), start=3):
-        sheet_data.cell(row=row_idx, column=1, value=key)  # Write key in the first column
+    for key, data in (extracted_data.items() if isinstance(extracted_data, dict) else extracted_data):
+        row = [None] * row_width
+        row[0] = key  # Write key in the first column
         for cell_name, value in data.items():
-            column_name = column_mapping.get(cell_name)
-            if column_name:
-                sheet_data.cell(row=row_idx, column=ord(column_name) - 64, value=value)
+            position = column_positions.get(cell_name)
+            if position is not None:
+                row[position] = value
+        sheet_data.append(row)
 
     # Create a sheet for errors
-    sheet_errors = workbook.create_sheet(title="Errors")  # Create a new worksheet
+    sheet_errors = workbook.create_sheet(title="Errors")
     sheet_errors.append(["Page No", "Error"])  # Write column headers
-
-    # Write errors to the worksheet
-    for key, value in page_errors.items():
+    for key, value in (page_errors.items() if isinstance(page_errors, dict) else page_errors):
         sheet_errors.append([key, value])  # Write key-value pairs as rows
 
     save_workbook_to_s3(workbook, 'excel-extraction-data', filename)
@@ -87,41 +91,51 @@ def create_excel(extracted_data: dict, filename: str, client: str, page_errors:
 
 
 def lambda_handler(event, context):
-    global retries
-    try:
-        # Parse the payload from the event
-        extracted_data = event['extracted_data']
-        client = event['client']
-        filename = event['filename']
-        page_errors = event['page_errors']
-        print(f"Received payload from other Lambda function. extracted_data: {extracted_data}, client: {client}, filename: {filename}")
-        column_mapping = {
-            "Id Number": "A",
-            "RFID": "B",
-            "Item Category": "C",
-            "Item Description": "D",
-            "Model": "E",
-            "SWL Value": "F",
-            "SWL Unit": "G",
-            "SWL Note": "H",
-            "Manufacturer": "I",
-            "Certificate No": "J",
-            "Location": "K",
-            "Detailed Location ": "L",
-            "Previous Inspection": "M",
-            "Next Inspection Due Date": "N",
-            "Fit For Purpose Y/N": "O",
-            "Status": "P",
-            "Provider Identification": "Q",
-            "Errors": "R"
-        }
-        create_excel(extracted_data, filename, client, page_errors, column_mapping)
-    except Exception as e:
-        print(f"An error occurred in excel creation: {e}")
-        if retries:
-            retries -= 1
-            lambda_handler(event, context)
-        else:
+    with instrumentation.document(event.get('filename')):
+        try:
+            # Parse the payload from the event
+            filename = event['filename']
+            if 'extraction_key' in event:
+                # the records are streamed from the intermediate object the extraction function stored
+                with instrumentation.stage("s3_get"):
+                    stored_extraction = open_extraction(s3, event['extraction_bucket'], event['extraction_key'])
+                # a cached extraction sent by pdf_processing carries its client in the stored header only
+                client = event.get('client', stored_extraction.client)
+                extracted_data = stored_extraction.rows()
+                page_errors = stored_extraction.page_errors
+                print(f"Reading extracted_data from s3://{event['extraction_bucket']}/{event['extraction_key']}, client: {client}, filename: {filename}")
+            else:
+                client = event['client']
+                extracted_data = event['extracted_data']
+                page_errors = event['page_errors']
+                print(f"Received payload from other Lambda function. extracted_data: {extracted_data}, client: {client}, filename: {filename}")
+            column_mapping = {
+                "Id Number": "A",
+                "RFID": "B",
+                "Item Category": "C",
+                "Item Description": "D",
+                "Model": "E",
+                "SWL Value": "F",
+                "SWL Unit": "G",
+                "SWL Note": "H",
+                "Manufacturer": "I",
+                "Certificate No": "J",
+                "Location": "K",
+                "Detailed Location ": "L",
+                "Previous Inspection": "M",
+                "Next Inspection Due Date": "N",
+                "Fit For Purpose Y/N": "O",
+                "Status": "P",
+                "Provider Identification": "Q",
+                "Errors": "R"
+            }
+            create_excel(extracted_data, filename, client, page_errors, column_mapping)
+            # result cache entries are kept for later uploads of the same PDF
+            if 'extraction_key' in event and not event.get('keep_extraction'):
+                s3.delete_object(Bucket=event['extraction_bucket'], Key=event['extraction_key'])
+        except Exception as e:
+            # S3 errors worth retrying were retried where they happened, running the whole build again would not help
+            print(f"An error occurred in excel creation: {e}")
             message = "Excel file creation is failed for the following file: " + filename.replace("xlsx", "pdf")
             subject = "An error occurred in excel creation"
             send_sns(message, subject)
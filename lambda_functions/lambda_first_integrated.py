@@ -1,74 +1,56 @@
 import json
 from datetime import datetime, timedelta
-import boto3
 import re
 import pdfplumber
 from io import BytesIO
-from openpyxl import load_workbook
-
-s3 = boto3.client('s3')
-lambda_client = boto3.client('lambda')
-retries = 3
-
-
-def move_pdf_to_out_bucket(source_bucket, object_key, file_content, file_folder):
-    target_bucket = 'pdf-out-bucket'
-    # Get the current date in the format YYYY-MM-DD
-    current_date = datetime.now().strftime('%Y-%m-%d')
-
-    # Check if the folder with the current date exists in the target S3 bucket
-    target_folder_key = f'{file_folder}/{current_date}/{object_key}'
-
-    # Check if the folder exists
-    existing_objects = s3.list_objects(Bucket=target_bucket, Prefix=f'{file_folder}/{current_date}/')
-
-    if 'Contents' not in existing_objects:
-        # Folder doesn't exist, create it
-        s3.put_object(Body='', Bucket=target_bucket, Key=f'{file_folder}/{current_date}/')
-
-    # Upload the file to the target S3 bucket and folder
-    s3.put_object(Body=file_content, Bucket=target_bucket, Key=target_folder_key)
-    print(f"File moved to the target bucket: {target_bucket}, Folder: {file_folder}/{current_date}")
-
-    # Delete the original file from the source bucket (uncomment if needed)
-    s3.delete_object(Bucket=source_bucket, Key=object_key)
-    print(f"File deleted from source bucket: {source_bucket}, file: {object_key}")
+import instrumentation
+from document_profiler import profile_document
+from catalog_cache import CatalogCache
+from dispatch_governor import DispatchGovernor, default_store
+from extraction_store import put_extraction
+from pdf_archive import archive_pdf
+import retry_policy
+from s3_result_cache import S3ResultCache
+from page_content import PageContent, release_page
+from page_router import NO_TABLES, iter_page_routes, route_first_integrated_page
+
+# S3 calls are retried by retry_policy.S3_POLICY, invokes by INVOKE_POLICY
+s3 = retry_policy.retrying_client('s3')
+lambda_client = retry_policy.client('lambda')
+catalog_cache = CatalogCache(s3)
+result_cache = S3ResultCache(s3)
+# the governor pdf_processing dispatches through; this function only releases its leases
+governor = DispatchGovernor(default_store(lambda: s3))
 
 
 def invoke_excel_management_lambda(source_bucket, object_key, file_content, extracted_data, client, filename,
-                                   page_errors):
-    # Payload to pass to the second Lambda function
-    global retries
-    payload = {
-        'extracted_data': extracted_data,
-        'client': client,
-        'filename': filename,
-        'page_errors': page_errors
-    }
+                                   page_errors, etag=None):
+    # The records go to S3, the invoke payload only points at them. Stored under the PDF's ETag, they are also
+    # reused when the same PDF is uploaded again
+    with instrumentation.stage("s3_put"):
+        # a result found without the catalog, where Manufacturer and Model come from, is not kept for later uploads
+        if etag and catalog_cache.etag and not catalog_cache.failed:
+            pointer = result_cache.store(etag, 'first_integrated', catalog_cache.etag, extracted_data, page_errors,
+                                         client, filename)
+        else:
+            pointer = put_extraction(s3, extracted_data, page_errors, client, filename)
+    payload = json.dumps(pointer)
+    print(f"excel_management payload: {len(payload)} bytes")
 
     # Invoke the second Lambda function asynchronously
-    response = lambda_client.invoke(
-        FunctionName='excel_management',
-        InvocationType='Event',
-        Payload=json.dumps(payload)
-    )
-
-    # Optionally, you can check the response for success or handle errors
-    status_code = response['StatusCode']
+    with instrumentation.stage("invoke"):
+        status_code = retry_policy.invoke_async(lambda_client, 'excel_management', payload)
     if status_code == 202:
         print(f" Lambda function: excel_management invoked successfully.")
-        move_pdf_to_out_bucket(source_bucket, object_key, file_content, "Success")
+        archive_pdf(s3, source_bucket, object_key, "Success", len(file_content))
     else:
         print(f"Error invoking Lambda function: excel_management. Status code: {status_code}")
-        if retries:
-            retries -= 1
-            print("Retrying to invoke the Lambda function: excel_management")
-            invoke_excel_management_lambda(source_bucket, object_key, file_content, extracted_data, client, filename,
-                                           page_errors)
-        else:
-            move_pdf_to_out_bucket(source_bucket, object_key, file_content, "Failure")
+        archive_pdf(s3, source_bucket, object_key, "Failure", len(file_content))
+    # the result has been handed on, so trimming the cache holds nothing up
+    result_cache.sweep_sometimes()
 
 
+@instrumentation.timed("id_parsing")
 def split_id_numbers_with_range(id_numbers):
     new_id_numbers = []
     new_errors = list()
@@ -109,6 +91,7 @@ def split_id_numbers_with_range(id_numbers):
     return new_id_numbers, new_errors
 
 
+@instrumentation.timed("swl_parsing")
 def process_swl(swl: str):
     pattern = r'^(\d+(?:\.\d+)?)\s*([a-zA-Z]+)?\s*(.*)$'
     # Match the pattern
@@ -140,37 +123,21 @@ def process_swl(swl: str):
     return value_part, unit_part, note_part
 
 
+@instrumentation.timed("catalog_lookup")
 def get_manufacture_model(description: str):
-    # Specify the S3 bucket and file name
-    excel_bucket = 'resources-and-extraction-data'
-    excel_file_key = 'Full_list_of_Manufacturers_and_Models.xlsx'
-
-    # Download the Excel file from S3
-    excel_file_obj = s3.get_object(Bucket=excel_bucket, Key=excel_file_key)
-    excel_file_content = excel_file_obj['Body'].read()
-
-    # Load the workbook from the downloaded content
-    workbook = load_workbook(filename=BytesIO(excel_file_content), read_only=True)
-    manufacturer_sheet = workbook['Manufacture']
-    model_sheet = workbook['Model']
+    catalog = catalog_cache.get()
     description_keywords = description.lower().split()
     manufacture, model = "", ""
-    for row in manufacturer_sheet.iter_rows(min_row=2, values_only=True):
-        keyword = row[0]
-        value = row[1]
-        if keyword and str(keyword).lower() in description_keywords:
-            manufacture = value
-            break
+    manufacturer_entry = catalog.find_manufacturer(description)
+    if manufacturer_entry:
+        manufacture = manufacturer_entry.value
     if str(manufacture).lower() == "miller" and "weblift" in description_keywords:
         manufacture = "Miller Weblift"
-    for row in model_sheet.iter_rows(min_row=2, values_only=True):
-        keyword = row[0]
-        value = row[1]
-        if keyword and str(keyword).lower() in description_keywords:
-            model = keyword
-            if not manufacture and value:
-                manufacture = value
-            break
+    model_entry = catalog.find_model(description)
+    if model_entry:
+        model = model_entry.keyword
+        if not manufacture and model_entry.value:
+            manufacture = model_entry.value
     # print("manufacture: ", manufacture,"model: ", model)
     return manufacture, model
 
@@ -197,45 +164,62 @@ def add_six_months(date_str):
 def extract_first_integrated_pdf(source_bucket, object_key):
     try:
         print("<------------extracting first_integrated pdf------------>")
-        pdf_file = s3.get_object(Bucket=source_bucket, Key=object_key)
-        file_content = pdf_file['Body'].read()
-        pdf_doc = pdfplumber.open(BytesIO(file_content))
-        extraction_info = dict()
-        page_errors = dict()
-        for i in range(0, len(pdf_doc.pages)):
-            try:
-                # for page_number, page in enumerate(pdf_doc.pages()):
-                page = pdf_doc.pages[i]
-                page_tables = page.extract_tables()
-                print("page number:", i)
-                # print("page tables:", page_tables)
-                if not page_tables:
-                    page_errors[i + 1] = f" No tables found on page {i + 1}. Skipping..."
-                    continue
-
-                first_row = page_tables[0][0]
-
-                if contains_keyword(first_row, "Name & Address of employer for Whom the examination was made"):
-                    process_table_type1(page_tables, extraction_info)
-                elif contains_keyword(first_row, "Date of Thorough Examination"):
-                    process_table_type2(page_tables[0], extraction_info)
-                elif contains_keyword(first_row, "Name &AddressofManufacturer") or contains_keyword(first_row,
-                                                                                                    "Name & Address of Manufacturer"):
-                    process_table_type3(page_tables[0], extraction_info)
-                else:
-                    page_errors[i + 1] = f"No recognized table found on page {i + 1}"
-
-            except Exception as e:
-                page_errors[i + 1] = f"Error occurred on page {i + 1}: {e}"
-                print(f"Error occurred on page {i + 1}: {e}")
+        with instrumentation.stage("s3_get"):
+            pdf_file = s3.get_object(Bucket=source_bucket, Key=object_key)
+            file_content = pdf_file['Body'].read()
+        instrumentation.count("s3_get_bytes", len(file_content))
+        with instrumentation.stage("pdf_open"):
+            pdf_doc = pdfplumber.open(BytesIO(file_content))
+        # the routes keep a pdfium copy of the document open from the first page on, closed below with pdf_doc
+        routes = iter_page_routes(file_content, route_first_integrated_page)
+        try:
+            instrumentation.count("pages", len(pdf_doc.pages))
+            extraction_info = dict()
+            page_errors = dict()
+            for i, route in zip(range(0, len(pdf_doc.pages)), routes):
+                try:
+                    # pages whose fingerprint has no table rulings are answered without the table finder
+                    if route == NO_TABLES:
+                        page_errors[i + 1] = f" No tables found on page {i + 1}. Skipping..."
+                        continue
+                    page_content = PageContent(pdf_doc.pages[i], route=route)
+                    page_tables = page_content.tables
+                    print("page number:", i)
+                    # print("page tables:", page_tables)
+                    if not page_tables:
+                        page_errors[i + 1] = f" No tables found on page {i + 1}. Skipping..."
+                        continue
+
+                    first_row = page_tables[0][0]
+
+                    if contains_keyword(first_row, "Name & Address of employer for Whom the examination was made"):
+                        process_table_type1(page_tables, extraction_info)
+                    elif contains_keyword(first_row, "Date of Thorough Examination"):
+                        process_table_type2(page_tables[0], extraction_info)
+                    elif contains_keyword(first_row, "Name &AddressofManufacturer") or contains_keyword(first_row,
+                                                                                                        "Name & Address of Manufacturer"):
+                        process_table_type3(page_tables[0], extraction_info)
+                    else:
+                        page_errors[i + 1] = f"No recognized table found on page {i + 1}"
+
+                except Exception as e:
+                    page_errors[i + 1] = f"Error occurred on page {i + 1}: {e}"
+                    print(f"Error occurred on page {i + 1}: {e}")
+                finally:
+                    release_page(pdf_doc.pages[i])
+        finally:
+            routes.close()
+            pdf_doc.close()
 
         # excel_management.create_excel(extraction_info, "../database/First Integrated.xlsx", "First_Integrated", page_errors)
 
+        instrumentation.count("records", len(extraction_info))
+        instrumentation.count("page_errors", len(page_errors))
         invoke_excel_management_lambda(source_bucket, object_key, file_content, extraction_info, "Sparrows",
-                                       object_key.replace("pdf", "xlsx"), page_errors)
+                                       object_key.replace("pdf", "xlsx"), page_errors, pdf_file['ETag'])
     except Exception as e:
         print("An error occurred while processing the pdf:", e)
-        move_pdf_to_out_bucket(source_bucket, object_key, file_content, "Failure")
+        archive_pdf(s3, source_bucket, object_key, "Failure")
 
 
 def process_table_type1(page_tables, extraction_info):
@@ -621,8 +605,13 @@ def lambda_handler(event, context):
     try:
         source_bucket = event['source_bucket']
         object_key = event['object_key']
+        catalog_cache.start_invocation()
         print(
             f"Received payload from the first Lambda function. Source bucket: {source_bucket}, Object key: {object_key}")
-        extract_first_integrated_pdf(source_bucket, object_key)
+        with instrumentation.document(object_key, vendor="First Integrated"), profile_document(object_key, s3_client=s3):
+            extract_first_integrated_pdf(source_bucket, object_key)
     except Exception as e:
         print("An error occurred while decoding source bucket and object key:", e)
+    finally:
+        # frees the slot pdf_processing took for this extraction
+        governor.finished('first_integrated', event)
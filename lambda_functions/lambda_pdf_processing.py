@@ -1,45 +1,134 @@
-import json
-import boto3
+import os
+import threading
+import time
 import urllib.parse
-import pdfplumber
-from io import BytesIO
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from s3_range_file import ObjectChangedError, S3RangeFile
+from pdf_archive import archive_pdf
+import retry_policy
+from dispatch_governor import DispatchGovernor, default_store
+import instrumentation
 
 
-s3 = boto3.client('s3')
-lambda_client = boto3.client('lambda')
-retries = 3
+# boto3, pypdfium2 and the result cache are imported, and the clients created, on first use; a warm container
+# reuses them. Tests and benchmarks may assign these directly.
+s3 = None
+lambda_client = None
+result_cache = None
+KEYWORDS = ["Sparrows", "Centurion", "First Integrated"]
+# the extraction function each vendor's PDFs are handed to
+VENDOR_FUNCTIONS = {"Sparrows": 'sparrow_extraction', "Centurion": 'centurion_extraction',
+                    "First Integrated": 'first_integrated'}
+# records of one S3 event are classified on this many threads; the work is mostly waiting on S3
+DISPATCH_WORKERS = int(os.environ.get('DISPATCH_WORKERS', '4'))
+# the vendor names appear within the first thousand characters of the sample reports; the limit leaves room for
+# reports with a longer header and still cuts off the rest of a dense first page
+CLASSIFY_CHAR_LIMIT = 4000
+# times the first page is read before giving up on a PDF that keeps being overwritten while it is classified
+CLASSIFY_ATTEMPTS = 3
+# a record waits GOVERNOR_WAIT_SECONDS for room at its extraction function, twice as long after each deferral up
+# to GOVERNOR_MAX_WAIT_SECONDS. It is then sent back to this function as a new event, until it has been deferred
+# for DEFER_SECONDS, after which the PDF is moved to the Failure folder
+GOVERNOR_WAIT_SECONDS = float(os.environ.get('GOVERNOR_WAIT_SECONDS', '30'))
+GOVERNOR_MAX_WAIT_SECONDS = float(os.environ.get('GOVERNOR_MAX_WAIT_SECONDS', '300'))
+DEFER_SECONDS = float(os.environ.get('GOVERNOR_DEFER_SECONDS', str(6 * 3600)))
+# time an invocation keeps for dispatching and archiving after waiting on the governor
+WAIT_MARGIN_SECONDS = 10.0
+# caps the extractions in flight per function; DISPATCH_GOVERNOR=off dispatches every record straight away
+governor = (None if os.environ.get('DISPATCH_GOVERNOR', 'on').lower() in ('off', '0', 'false')
+            else DispatchGovernor(default_store(lambda: get_s3())))
 
-def move_pdf_to_out_bucket(source_bucket, object_key, file_content):
-    target_bucket = 'pdf-out-bucket'
-    # Get the current date in the format YYYY-MM-DD
-    current_date = datetime.now().strftime('%Y-%m-%d')
+# boto3 sessions are not thread-safe, so the clients are created under a lock; the clients themselves are
+# thread-safe and shared by the workers
+_clients_lock = threading.Lock()
+# PDFium must not be called from two threads at once, even for different documents
+pdfium_lock = threading.Lock()
 
-    # Check if the folder with the current date exists in the target S3 bucket
-    target_folder_key = f'Failure/{current_date}/{object_key}'
 
-    # Check if the folder exists
-    existing_objects = s3.list_objects(Bucket=target_bucket, Prefix=f'Failure/{current_date}/')
+def get_s3():
+    global s3
+    with _clients_lock:
+        if s3 is None:
+            s3 = retry_policy.retrying_client('s3')
+    return s3
 
-    if 'Contents' not in existing_objects:
-        # Folder doesn't exist, create it
-        s3.put_object(Body='', Bucket=target_bucket, Key=f'Failure/{current_date}/')
 
-    # Upload the file to the target S3 bucket and folder
-    s3.put_object(Body=file_content, Bucket=target_bucket, Key=target_folder_key)
-    print(f"File moved to the target bucket: {target_bucket}, Folder: Failure/{current_date}")
+def get_lambda_client():
+    global lambda_client
+    with _clients_lock:
+        if lambda_client is None:
+            lambda_client = retry_policy.client('lambda')
+    return lambda_client
 
-    # Delete the original file from the source bucket (uncomment if needed)
-    s3.delete_object(Bucket=source_bucket, Key=object_key)
-    print(f"File deleted from source bucket: {source_bucket}, file: {object_key}")
 
+def get_result_cache():
+    global result_cache
+    if result_cache is None:
+        s3_client = get_s3()
+        with _clients_lock:
+            if result_cache is None:
+                from s3_result_cache import S3ResultCache
+                result_cache = S3ResultCache(s3_client)
+    return result_cache
 
-def pdf_to_text(file_content):
-    doc = pdfplumber.open(BytesIO(file_content))
-    text = ""
-    page = doc.pages[0]
-    text += page.extract_text()
-    return text
+
+def first_page_text(pdf_file, char_limit=CLASSIFY_CHAR_LIMIT):
+    """
+    Returns up to char_limit characters of the first page's text, read through pdfium. pdfium skips the layout
+    analysis pdfplumber does, so classifying a document takes milliseconds rather than a good part of a second.
+    """
+    import pypdfium2 as pdfium
+    pdfium_doc = pdfium.PdfDocument(pdf_file)
+    try:
+        page = pdfium_doc[0]
+        try:
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_range(count=min(char_limit, textpage.count_chars()))
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+    finally:
+        pdfium_doc.close()
+
+
+def prefetch_pdf_ends(pdf_file):
+    """
+    Downloads the first and last blocks of the PDF, the header and the trailer pdfium reads before anything else.
+    Done outside pdfium_lock, so the downloads of the records in one event overlap.
+    """
+    pdf_file.prefetch(0, pdf_file.block_size)
+    pdf_file.prefetch(pdf_file.size - pdf_file.block_size, pdf_file.size)
+
+
+def read_first_page(pdf_file):
+    """
+    Returns the first page's text of pdf_file, starting over when the object is overwritten halfway, since pdfium
+    would otherwise be reading parts of two different PDFs.
+    """
+    for attempt in range(1, CLASSIFY_ATTEMPTS + 1):
+        try:
+            prefetch_pdf_ends(pdf_file)
+            with instrumentation.stage("classify"), pdfium_lock:
+                return first_page_text(pdf_file)
+        except ObjectChangedError as e:
+            if attempt == CLASSIFY_ATTEMPTS:
+                raise
+            print(f"{e}, reading it again")
+            instrumentation.count("objects_changed")
+
+
+def classify_text(text, keywords):
+    """
+    Returns (keyword, confidence). The keyword is the one search_keyword picks, and the confidence is its share
+    of all keyword mentions in the text: 1.0 when no other vendor is named, 0.0 when none is found.
+    """
+    keyword = search_keyword(text, keywords)
+    if keyword is None:
+        return None, 0.0
+    mentions = {candidate: text.lower().count(candidate.lower()) for candidate in keywords}
+    return keyword, mentions[keyword] / sum(mentions.values())
 
 
 def search_keyword(text, keywords):
@@ -53,61 +142,158 @@ def is_empty(text):
     return not bool(text.strip())
 
 
-def invoke_pdf_extraction_lambda(source_bucket, object_key, lambda_function, file_content):
+def excel_filename(object_key):
+    return object_key.replace("pdf", "xlsx")
+
+
+def invoke_cached_excel_management(source_bucket, object_key, pdf_file, cached_payload):
+    """Sends a cached extraction of the same PDF straight to excel_management, skipping the extraction function."""
+    payload = dict(cached_payload, filename=excel_filename(object_key))
+    with instrumentation.stage("invoke"):
+        status_code = retry_policy.invoke_async(get_lambda_client(), 'excel_management', payload)
+    if status_code == 202:
+        print(f"Cached extraction {payload['extraction_key']} sent to excel_management.")
+        archive_pdf(get_s3(), source_bucket, object_key, 'Success', pdf_file.size)
+        return True
+    print(f"Error invoking Lambda function excel_management with the cached extraction. Status code: {status_code}")
+    return False
+
+
+def invoke_pdf_extraction_lambda(source_bucket, object_key, lambda_function, pdf_file, wait_seconds=0.0):
+    """
+    Hands the PDF to lambda_function, or a cached extraction of it to excel_management. Returns 'cached',
+    'dispatched', or 'failed' when the invoke failed after retry_policy.INVOKE_POLICY's retries, or was stopped by
+    its circuit breaker, and the PDF is moved to the Failure folder. The extraction waits up to wait_seconds for
+    room from the governor, and 'deferred' is returned when it did not get any.
+    """
+    with instrumentation.stage("result_cache_lookup"):
+        cached_payload = get_result_cache().lookup(pdf_file.etag, lambda_function,
+                                                   filename=excel_filename(object_key))
+    if cached_payload and invoke_cached_excel_management(source_bucket, object_key, pdf_file, cached_payload):
+        return 'cached'
+    if governor is not None:
+        with instrumentation.stage("governor_wait"):
+            lease_id = governor.acquire(lambda_function, wait_seconds)
+        if lease_id is None:
+            print(f"{lambda_function} has {governor.in_flight(lambda_function)} extractions in flight, "
+                  f"deferring {object_key}")
+            return 'deferred'
     # Payload to pass to the second Lambda function
-    global retries
     payload = {
         'source_bucket': source_bucket,
         'object_key': object_key
     }
+    if governor is not None:
+        # the extraction function releases the lease when it finishes
+        payload['lease_id'] = lease_id
 
     # Invoke the second Lambda function asynchronously
-    response = lambda_client.invoke(
-        FunctionName=lambda_function,
-        InvocationType='Event',
-        Payload=json.dumps(payload)
-    )
-
-    # Optionally, you can check the response for success or handle errors
-    status_code = response['StatusCode']
+    with instrumentation.stage("invoke"):
+        status_code = retry_policy.invoke_async(get_lambda_client(), lambda_function, payload)
     if status_code == 202:
         print(f" Lambda function {lambda_function} invoked successfully.")
-    else:
-        print(f"Error invoking Lambda function {lambda_function}. Status code: {status_code}")
-        if retries:
-            retries -= 1
-            print(f"Retrying to invoking Lambda function {lambda_function}")
-            invoke_pdf_extraction_lambda(source_bucket, object_key, lambda_function, file_content)
-        else:
-            move_pdf_to_out_bucket(source_bucket, object_key, file_content)
+        return 'dispatched'
+    print(f"Error invoking Lambda function {lambda_function}. Status code: {status_code}")
+    if governor is not None:
+        governor.release(lambda_function, lease_id, return_token=True)
+    archive_pdf(get_s3(), source_bucket, object_key, 'Failure', pdf_file.size)
+    return 'failed'
 
 
-def lambda_handler(event, context):
+def governor_wait_seconds(record, context):
+    """
+    GOVERNOR_WAIT_SECONDS, doubled for each time the record was deferred up to GOVERNOR_MAX_WAIT_SECONDS, or less
+    when the invocation would run out of time waiting.
+    """
+    wait_seconds = min(GOVERNOR_MAX_WAIT_SECONDS, GOVERNOR_WAIT_SECONDS * 2 ** min(record.get('deferrals', 0), 16))
+    if context is not None:
+        wait_seconds = min(wait_seconds, context.get_remaining_time_in_millis() / 1000 - WAIT_MARGIN_SECONDS)
+    return max(0.0, wait_seconds)
+
+
+def deferral_expired(record):
+    return 'deferred_at' in record and time.time() - record['deferred_at'] > DEFER_SECONDS
+
+
+def defer_record(record, context):
+    """
+    Sends the record back to this function as a new asynchronous event, so it is offered to the governor again
+    without holding up this invocation; the PDF stays in its bucket meanwhile. Returns whether it was sent.
+    """
+    if context is None:
+        return False
+    deferred = dict(record, deferrals=record.get('deferrals', 0) + 1,
+                    deferred_at=record.get('deferred_at', time.time()))
+    status_code = retry_policy.invoke_async(get_lambda_client(), context.function_name, {'Records': [deferred]})
+    if status_code != 202:
+        return False
+    instrumentation.count("deferrals")
+    return True
+
+
+def process_record(record, context=None):
+    """
+    Classifies the PDF of one S3 event record and hands it on. Returns the record's outcome: its bucket, key,
+    the extraction function it went to and its status, one of 'dispatched', 'cached', 'deferred' (sent back to
+    this function to wait for room at the extraction function), 'expired' (deferred for DEFER_SECONDS and moved
+    to the Failure folder), 'failed', 'unclassified' (moved to the Failure folder) or 'error'.
+    """
+    outcome = {'bucket': None, 'key': None, 'function': None, 'status': 'error'}
     try:
         # Extracting bucket and object key from the S3 event
-        source_bucket = event['Records'][0]['s3']['bucket']['name']
-        object_key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'])
-        # Download the file from S3
-        pdf_file = s3.get_object(Bucket=source_bucket, Key=object_key)
-        file_content = pdf_file['Body'].read()
-        text_content = pdf_to_text(file_content)
-        keywords = ["Sparrows", "Centurion", "First Integrated"]
-
-        if is_empty(text_content):
-            print(f"No matching keyword found with existing clients, No procesing it, pushing this file to out failure folder")
-            move_pdf_to_out_bucket(source_bucket, object_key, file_content)
-        else:
-            found_keyword = search_keyword(text_content, keywords)
-            print(f"keyword found: {found_keyword}")
-            if found_keyword and found_keyword == "Sparrows":
-                invoke_pdf_extraction_lambda(source_bucket, object_key, 'sparrow_extraction', file_content)
-            elif found_keyword and found_keyword == "Centurion":
-                invoke_pdf_extraction_lambda(source_bucket, object_key, 'centurion_extraction', file_content)
-            elif found_keyword and found_keyword == "First Integrated":
-                invoke_pdf_extraction_lambda(source_bucket, object_key, 'first_integrated', file_content)
+        source_bucket = outcome['bucket'] = record['s3']['bucket']['name']
+        object_key = outcome['key'] = urllib.parse.unquote_plus(record['s3']['object']['key'])
+        with instrumentation.document(object_key):
+            # Only the parts of the PDF that pdfium reads for the first page are downloaded
+            pdf_file = S3RangeFile(get_s3(), source_bucket, object_key)
+            text_content = read_first_page(pdf_file)
+            instrumentation.count("s3_range_requests", pdf_file.requests)
+            instrumentation.count("s3_range_bytes", pdf_file.bytes_transferred)
+            print(f"Read {pdf_file.bytes_transferred} of {pdf_file.size} bytes of {object_key} in "
+                  f"{pdf_file.requests} requests")
+
+            found_keyword = None
+            if not is_empty(text_content):
+                found_keyword, confidence = classify_text(text_content, KEYWORDS)
+                print(f"{object_key} keyword found: {found_keyword}, confidence: {confidence:.2f}")
+            if found_keyword in VENDOR_FUNCTIONS:
+                lambda_function = outcome['function'] = VENDOR_FUNCTIONS[found_keyword]
+                outcome['status'] = invoke_pdf_extraction_lambda(source_bucket, object_key, lambda_function, pdf_file,
+                                                                 governor_wait_seconds(record, context))
+                # a record is never dispatched without room, so one that cannot wait any longer is given up on
+                if outcome['status'] == 'deferred' and deferral_expired(record):
+                    print(f"{object_key} found no room at {lambda_function} in {DEFER_SECONDS:.0f} seconds, "
+                          f"pushing this file to out failure folder")
+                    instrumentation.count("deferrals_expired")
+                    archive_pdf(get_s3(), source_bucket, object_key, 'Failure', pdf_file.size)
+                    outcome['status'] = 'expired'
+                elif outcome['status'] == 'deferred' and not defer_record(record, context):
+                    print(f"{object_key} could not be deferred, pushing this file to out failure folder")
+                    archive_pdf(get_s3(), source_bucket, object_key, 'Failure', pdf_file.size)
+                    outcome['status'] = 'failed'
             else:
-                print(
-                    f"No matching keyword found with existing clients, No procesing it, pushing this file to out failure folder")
-                move_pdf_to_out_bucket(source_bucket, object_key, file_content)
+                print(f"No matching keyword found with existing clients, No procesing {object_key}, "
+                      f"pushing this file to out failure folder")
+                archive_pdf(get_s3(), source_bucket, object_key, 'Failure', pdf_file.size)
+                outcome['status'] = 'unclassified'
+    except Exception as e:
+        print(f"Error in processing the PDF file {outcome['key']}:", e)
+        outcome['error'] = str(e)
+    return outcome
+
+
+def lambda_handler(event, context):
+    """
+    Dispatches every record of the S3 event, on up to DISPATCH_WORKERS threads, and returns their outcomes in the
+    order of the records.
+    """
+    try:
+        records = list(event['Records'])
     except Exception as e:
         print("Error in processing the PDF file:", e)
+        return []
+    workers = min(DISPATCH_WORKERS, len(records))
+    if workers <= 1:
+        return [process_record(record, context) for record in records]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(process_record, records, [context] * len(records)))
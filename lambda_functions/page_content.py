@@ -0,0 +1,72 @@
+import copy
+from collections import Counter
+import instrumentation
+
+
+def release_page(page):
+    """
+    Drops the objects, layout and text map pdfplumber cached on the page while it was read. Without this, every
+    page of a document holds them until the document is closed, and memory grows with the page count. What is
+    left is pdfminer's decoded content stream of the page, tens of KiB. The page can still be read again.
+    """
+    page.flush_cache()
+    # pdfplumber keeps an lru_cache of text maps on each page, and flush_cache leaves it alone
+    page.get_textmap.cache_clear()
+
+
+class PageContent:
+    """
+    Text and tables of one pdfplumber page, each extracted on first use and reused afterwards.
+
+    Every extract_text()/extract_tables() call re-runs pdfplumber's text and table finders, so the vendor parsers
+    read the page through this object instead. extraction_counts records how many times each extraction really ran.
+    With a template (see page_templates) the tables come from the template's crop region, and from the full page
+    when the page does not fit it. route is what page_router decided for the page from its fingerprint, None when
+    no router was used. snapshot is a dict the text and tables are read from when present and written to once
+    extracted (see page_snapshots). Tables are copied in and out of it, so a parser editing its rows in place
+    cannot change the snapshot.
+    """
+
+    def __init__(self, page, template=None, route=None, snapshot=None):
+        self.page = page
+        self.page_number = page.page_number
+        self.template = template
+        self.route = route
+        self.snapshot = snapshot
+        self.extraction_counts = Counter()
+        self._text = None
+        self._tables = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            if self.snapshot is not None and "text" in self.snapshot:
+                self._text = self.snapshot["text"]
+                return self._text
+            with instrumentation.stage("text"):
+                self._text = self.page.extract_text()
+            self.extraction_counts["text"] += 1
+            if self.snapshot is not None:
+                self.snapshot["text"] = self._text
+        return self._text
+
+    @property
+    def tables(self):
+        if self._tables is None:
+            if self.snapshot is not None and "tables" in self.snapshot:
+                self._tables = copy.deepcopy(self.snapshot["tables"])
+                return self._tables
+            with instrumentation.stage("tables"):
+                if self.template is not None:
+                    self._tables = self.template.extract_tables(self.page)
+                    self.extraction_counts["cropped tables"] += 1
+                if self._tables is None:
+                    self._tables = self.page.extract_tables()
+                    self.extraction_counts["tables"] += 1
+            if self.snapshot is not None:
+                self.snapshot["tables"] = copy.deepcopy(self._tables)
+        return self._tables
+
+    def release(self):
+        """Releases pdfplumber's caches of the page. The text and tables already read are kept."""
+        release_page(self.page)
@@ -0,0 +1,44 @@
+class TemplateProfile:
+    """
+    The part of a vendor's page layout that its parser reads, so table detection can skip logos, footers and
+    signature blocks.
+
+    bbox is given in PDF points for pages of page_size. It has to reach below the last vertical ruling of the
+    table rows the parser indexes, otherwise pdfplumber finds fewer columns and positions such as
+    first_table[0][13] move. columns is the cell count of the first row of the first table. When the cropped
+    region does not give a table of that width, the page is scanned in full instead.
+    """
+
+    # scanned and re-exported documents are sometimes a point or two off the nominal page size
+    SIZE_TOLERANCE = 2
+
+    def __init__(self, name, page_size, bbox, columns, table_settings=None):
+        self.name = name
+        self.page_size = page_size
+        self.bbox = bbox
+        self.columns = columns
+        self.table_settings = table_settings or dict()
+
+    def matches(self, page):
+        width, height = self.page_size
+        return abs(page.width - width) <= self.SIZE_TOLERANCE and abs(page.height - height) <= self.SIZE_TOLERANCE
+
+    def extract_tables(self, page):
+        """Returns the tables of the cropped region, or None when the page does not fit this template."""
+        if not self.matches(page):
+            return None
+        x0, top, x1, bottom = self.bbox
+        region = page.crop((x0, top, min(x1, page.width), min(bottom, page.height)))
+        tables = region.extract_tables(self.table_settings)
+        if not tables or not tables[0] or len(tables[0][0]) != self.columns:
+            return None
+        return tables
+
+
+TEMPLATES = {
+    # the parser reads rows 0-4 of the first table; the other tables and the signature block start below 586
+    "Sparrows": TemplateProfile("Sparrows", (595, 842), (0, 0, 595, 586), columns=5),
+    # landscape Centurion reports: rows 0-5 are read, row 7 (down to 466) carries the last column ruling.
+    # Portrait Hendrik certificates do not match and are scanned in full.
+    "Centurion": TemplateProfile("Centurion", (842, 595), (0, 0, 842, 470), columns=16),
+}
@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import instrumentation
+
+
+OUT_BUCKET = 'pdf-out-bucket'
+# a PDF up to this size is copied with one CopyObject; a larger one in parts of PART_SIZE, COPY_WORKERS at a time
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+PART_SIZE = 16 * 1024 * 1024
+COPY_WORKERS = 8
+
+
+def archive_key(object_key, file_folder, date=None):
+    """<file_folder>/<YYYY-MM-DD>/<object_key>; S3 has no folders, so nothing needs creating first."""
+    return f"{file_folder}/{(date or datetime.now()).strftime('%Y-%m-%d')}/{object_key}"
+
+
+def copy_parts(s3_client, copy_source, bucket, key, size, part_size=PART_SIZE, workers=COPY_WORKERS):
+    """Copies the source to bucket/key with a multipart upload of server-side part copies. Returns the part count."""
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key, ContentType='application/pdf')['UploadId']
+
+    def copy_part(part_number):
+        start = (part_number - 1) * part_size
+        end = min(start + part_size, size) - 1
+        response = s3_client.upload_part_copy(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
+                                              CopySource=copy_source, CopySourceRange=f"bytes={start}-{end}")
+        return {'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']}
+
+    part_numbers = range(1, (size + part_size - 1) // part_size + 1)
+    try:
+        with ThreadPoolExecutor(max_workers=min(workers, len(part_numbers))) as executor:
+            parts = list(executor.map(copy_part, part_numbers))
+        s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                            MultipartUpload={'Parts': parts})
+    except Exception:
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    return len(parts)
+
+
+def archive_pdf(s3_client, source_bucket, object_key, file_folder='Failure', size=None, target_bucket=OUT_BUCKET):
+    """
+    Moves the PDF to <file_folder>/<date>/<object_key> in target_bucket and returns the seconds the copy and the
+    delete took.
+
+    The copy is done by S3, so the PDF's bytes never pass through the function. With size known, a PDF over
+    MULTIPART_THRESHOLD is copied in parts side by side; otherwise one CopyObject copies it. The source is deleted
+    only once the copy is complete, so a PDF whose copy fails stays where it was.
+    """
+    target_key = archive_key(object_key, file_folder)
+    copy_source = {'Bucket': source_bucket, 'Key': object_key}
+    with instrumentation.stage("s3_archive"):
+        start = time.perf_counter()
+        with instrumentation.stage("s3_copy"):
+            if size is not None and size > MULTIPART_THRESHOLD:
+                parts = copy_parts(s3_client, copy_source, target_bucket, target_key, size, PART_SIZE, COPY_WORKERS)
+            else:
+                s3_client.copy_object(Bucket=target_bucket, Key=target_key, CopySource=copy_source)
+                parts = 1
+        copied = time.perf_counter()
+        with instrumentation.stage("s3_delete"):
+            s3_client.delete_object(Bucket=source_bucket, Key=object_key)
+        timings = {'copy_seconds': copied - start, 'delete_seconds': time.perf_counter() - copied, 'parts': parts}
+    print(f"File moved from {source_bucket} to s3://{target_bucket}/{target_key} "
+          f"(copy {timings['copy_seconds'] * 1000:.0f} ms in {parts} part(s), "
+          f"delete {timings['delete_seconds'] * 1000:.0f} ms)")
+    return timings
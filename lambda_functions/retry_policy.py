@@ -0,0 +1,202 @@
+import json
+import random
+import threading
+import time
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+import instrumentation
+
+
+# error codes of a downstream that is overloaded or briefly unavailable; anything else is an answer, not a failure
+RETRYABLE_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled', 'RequestThrottledException',
+    'TooManyRequestsException', 'SlowDown', 'RequestLimitExceeded', 'BandwidthLimitExceeded',
+    'EC2ThrottledException', 'ServiceException', 'ServiceUnavailable', 'InternalError', 'RequestTimeout',
+    'RequestTimeoutException', 'PriorRequestNotComplete',
+}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# the parameter that names the downstream of a call, which has its own circuit breaker
+BREAKER_KEYS = {'s3': 'Bucket', 'lambda': 'FunctionName'}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a downstream whose circuit breaker is open."""
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, HTTPClientError)):
+        return True
+    if isinstance(error, ClientError):
+        status_code = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return error.response.get('Error', {}).get('Code') in RETRYABLE_CODES or status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def failed_response(response):
+    """Whether a call that returned still failed, as a Lambda invoke answering with a status code other than 2xx."""
+    status_code = response.get('StatusCode') if isinstance(response, dict) else None
+    return status_code is not None and not 200 <= status_code < 300
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold failed calls in a row. While open, calls fail fast; after reset_seconds one trial
+    call is let through, which closes the breaker when it succeeds and opens it for another period when it fails.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at >= self.reset_seconds:
+                # the trial call; others keep failing fast until it is back
+                self.opened_at = self.clock()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+class RetryPolicy:
+    """
+    Retries a call that fails with a throttling or transient error, or returns a failed_response, up to attempts
+    times in all. Before each retry it sleeps a random time up to base_delay * 2 ** retry, capped at max_delay
+    ("full jitter", so callers throttled together do not retry together), and it gives up early rather than sleep
+    past budget_seconds from the first attempt. Each downstream has a CircuitBreaker, shared by every call made
+    through the policy in the container.
+    """
+
+    def __init__(self, attempts=4, base_delay=0.2, max_delay=5.0, budget_seconds=30.0, failure_threshold=5,
+                 reset_seconds=30.0, sleep=time.sleep, random=random.random, clock=time.monotonic):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_seconds = budget_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.sleep = sleep
+        self.random = random
+        self.clock = clock
+        self._breakers = dict()
+        self._lock = threading.Lock()
+
+    def breaker(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_seconds, self.clock)
+            return self._breakers[name]
+
+    def backoff(self, retry):
+        return self.random() * min(self.max_delay, self.base_delay * 2 ** retry)
+
+    def call(self, name, operation, *args, **kwargs):
+        """Calls operation(*args, **kwargs) for the downstream name. Raises CircuitOpenError while its breaker is open."""
+        breaker = self.breaker(name)
+        deadline = self.clock() + self.budget_seconds
+        for attempt in range(self.attempts):
+            if not breaker.allow():
+                instrumentation.count("circuit_open")
+                raise CircuitOpenError(f"{name} is failing, calls to it are stopped for up to {self.reset_seconds}s")
+            try:
+                response = operation(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    # the downstream answered, it is up
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                failure, response = e, None
+            else:
+                if not failed_response(response):
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                failure = f"status code {response['StatusCode']}"
+            delay = self.backoff(attempt)
+            if attempt + 1 == self.attempts or self.clock() + delay > deadline:
+                break
+            print(f"{name} failed ({failure}), retry {attempt + 1} in {delay:.2f}s")
+            instrumentation.count("retries")
+            self.sleep(delay)
+        if response is None:
+            raise failure
+        return response
+
+
+# S3 recovers from SlowDown within seconds; a throttled function is left alone for longer
+S3_POLICY = RetryPolicy(attempts=5, base_delay=0.1, max_delay=2.0, budget_seconds=20.0, failure_threshold=10,
+                        reset_seconds=10.0)
+INVOKE_POLICY = RetryPolicy(attempts=4, base_delay=0.2, max_delay=5.0, budget_seconds=30.0, failure_threshold=5,
+                            reset_seconds=30.0)
+POLICIES = {'s3': S3_POLICY, 'lambda': INVOKE_POLICY}
+
+
+class RetryingClient:
+    """
+    A boto3 client whose operations all go through a RetryPolicy, with a circuit breaker per downstream: per
+    bucket for S3, per function for Lambda. Everything else is the client's own.
+    """
+
+    def __init__(self, client, policy, breaker_key):
+        self._client = client
+        self._policy = policy
+        self._service = client.meta.service_model.service_name
+        self._breaker_key = breaker_key
+
+    def __getattr__(self, attribute):
+        value = getattr(self._client, attribute)
+        if attribute not in self._client.meta.method_to_api_mapping:
+            return value
+
+        def call(*args, **kwargs):
+            name = f"{self._service}:{kwargs.get(self._breaker_key, '')}"
+            return self._policy.call(name, value, *args, **kwargs)
+        return call
+
+
+def client(service_name):
+    """A boto3 client that makes each request once, leaving the retries to the policies."""
+    import boto3
+    from botocore.config import Config
+    return boto3.client(service_name, config=Config(retries={'total_max_attempts': 1}))
+
+
+def retrying_client(service_name, policy=None):
+    return RetryingClient(client(service_name), policy or POLICIES[service_name], BREAKER_KEYS[service_name])
+
+
+def invoke_async(lambda_client, function_name, payload, policy=None):
+    """
+    Invokes function_name asynchronously with the payload, a dict or a JSON string, under the policy (by default
+    INVOKE_POLICY, looked up on each call). Returns the status code, 202 when Lambda queued the event, or None when
+    the call failed with an error or was stopped by the circuit breaker.
+    """
+    policy = policy or INVOKE_POLICY
+    try:
+        response = policy.call(f"lambda:{function_name}", lambda_client.invoke, FunctionName=function_name,
+                               InvocationType='Event',
+                               Payload=payload if isinstance(payload, str) else json.dumps(payload))
+    except Exception as e:
+        print(f"Invoking Lambda function {function_name} failed: {e}")
+        return None
+    return response['StatusCode']
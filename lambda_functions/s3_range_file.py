@@ -0,0 +1,149 @@
+import io
+from collections import OrderedDict
+
+
+# PDF readers jump between the trailer, the xref table and the objects they need, so blocks are kept small
+BLOCK_SIZE = 64 * 1024
+# at most 16 MiB of the object is held in memory
+CACHE_BLOCKS = 256
+
+
+class ObjectChangedError(Exception):
+    """Raised when the object was overwritten between two reads; the file has been reopened on the new object."""
+
+
+def precondition_failed(error):
+    # botocore is not imported here, the dispatcher imports this module at start-up
+    response = getattr(error, 'response', None) or {}
+    return (response.get('Error', {}).get('Code') == 'PreconditionFailed'
+            or response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 412)
+
+
+class S3RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over an S3 object, fetched with ranged GETs.
+
+    The object is read in BLOCK_SIZE blocks. The most recently used cache_blocks blocks are kept, and consecutive
+    missing blocks are fetched with a single request. pdfplumber and pypdfium2 can open it like a local file, and
+    they only download the parts of the PDF they read. requests and bytes_transferred count the traffic,
+    and etag holds the ETag of the object when the size was looked up.
+
+    Every GET is made If-Match that ETag, so the blocks all come from one version of the object. When it has been
+    overwritten, the file is reopened on the new object and ObjectChangedError is raised; whatever was read
+    before belongs to the old version, and the reader has to start over.
+    """
+
+    def __init__(self, s3_client, bucket, key, block_size=BLOCK_SIZE, cache_blocks=CACHE_BLOCKS, size=None):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self.requests = 0
+        self.bytes_transferred = 0
+        self.etag = None
+        self.size = size
+        self.position = 0
+        self._blocks = OrderedDict()
+        if size is None:
+            self.reopen()
+
+    def reopen(self):
+        """Looks up the size and ETag of the object again, dropping the cached blocks and going back to the start."""
+        head = self.s3_client.head_object(Bucket=self.bucket, Key=self.key)
+        self.requests += 1
+        self.size, self.etag = head['ContentLength'], head['ETag']
+        self.position = 0
+        self._blocks.clear()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+        self.position = position
+        return self.position
+
+    def read(self, size=-1):
+        end = self.size if size is None or size < 0 else min(self.position + size, self.size)
+        if self.position >= end:
+            return b''
+        first_block = self.position // self.block_size
+        last_block = (end - 1) // self.block_size
+        self._load(first_block, last_block)
+        data = b''.join(self._blocks[index] for index in range(first_block, last_block + 1))
+        offset = first_block * self.block_size
+        data = data[self.position - offset:end - offset]
+        self.position = end
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def prefetch(self, start, end):
+        """Loads the blocks holding bytes start to end - 1 into the cache, leaving the position where it is."""
+        start, end = max(start, 0), min(end, self.size)
+        if start < end:
+            self._load(start // self.block_size, (end - 1) // self.block_size)
+
+    def _load(self, first_block, last_block):
+        missing = list()
+        for index in range(first_block, last_block + 1):
+            if index in self._blocks:
+                self._blocks.move_to_end(index)
+            else:
+                missing.append(index)
+        # fetch each run of consecutive missing blocks with one ranged GET
+        run_start = None
+        for position, index in enumerate(missing):
+            if run_start is None:
+                run_start = index
+            if position + 1 == len(missing) or missing[position + 1] != index + 1:
+                self._fetch(run_start, index)
+                run_start = None
+        while len(self._blocks) > max(self.cache_blocks, last_block - first_block + 1):
+            self._blocks.popitem(last=False)
+
+    def _fetch(self, first_block, last_block):
+        start = first_block * self.block_size
+        end = min((last_block + 1) * self.block_size, self.size) - 1
+        request = {'Bucket': self.bucket, 'Key': self.key, 'Range': f"bytes={start}-{end}"}
+        if self.etag is not None:
+            request['IfMatch'] = self.etag
+        try:
+            response = self.s3_client.get_object(**request)
+        except Exception as e:
+            if not precondition_failed(e):
+                raise
+            self.requests += 1
+            etag = self.etag
+            self.reopen()
+            raise ObjectChangedError(f"s3://{self.bucket}/{self.key} changed from {etag} to {self.etag} "
+                                     f"while it was read") from e
+        data = response['Body'].read()
+        self.requests += 1
+        self.bytes_transferred += len(data)
+        for index in range(first_block, last_block + 1):
+            offset = (index - first_block) * self.block_size
+            self._blocks[index] = data[offset:offset + self.block_size]
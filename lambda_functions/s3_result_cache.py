@@ -0,0 +1,122 @@
+import os
+import random
+import time
+from botocore.exceptions import ClientError
+from extraction_store import EXTRACTION_BUCKET, encode_extraction, extraction_key
+
+
+RESULT_CACHE_BUCKET = 'resources-and-extraction-data'
+RESULT_CACHE_PREFIX = 'result-cache/'
+MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+MAX_AGE_SECONDS = float(os.environ.get('RESULT_CACHE_MAX_AGE_SECONDS', str(30 * 24 * 3600)))
+# a hit renews an entry's LastModified at most this often, which costs a copy of the entry onto itself
+REFRESH_SECONDS = float(os.environ.get('RESULT_CACHE_REFRESH_SECONDS', str(24 * 3600)))
+# share of the extractions after which the prefix is listed and trimmed to MAX_BYTES
+SWEEP_PROBABILITY = float(os.environ.get('RESULT_CACHE_SWEEP_PROBABILITY', '0.01'))
+
+# bump a function's version whenever a deployment changes what it extracts, so results of the old code are not reused
+EXTRACTOR_VERSIONS = {'sparrow_extraction': 1, 'centurion_extraction': 1, 'first_integrated': 1}
+# the manufacturer catalog the extraction functions load through catalog_cache.py. Its ETag is part of every key,
+# so results found with an older catalog are not reused once the workbook is edited
+CATALOG_BUCKET = 'resources-and-extraction-data'
+CATALOG_KEY = 'Full_list_of_Manufacturers_and_Models.xlsx'
+
+
+class S3ResultCache:
+    """
+    Extraction results under an S3 prefix, keyed by the PDF's ETag, the extraction function's version and the
+    ETag of the manufacturer catalog the result was found with.
+
+    The ETag is the MD5 of the PDF for single part uploads, so identical PDFs share an entry and the dispatcher can
+    look one up without downloading the PDF. Entries are stored in the extraction_store format, which
+    excel_management reads directly. A hit is copied to an extraction key of its own, which excel_management
+    deletes like any other, so removing an entry never pulls it from under a workbook being built. Hits renew the
+    entry's LastModified, and entries not used for max_age_seconds are misses. Storing never lists the prefix:
+    an S3 lifecycle rule removes entries by age, and sweep_sometimes, called after an extraction, occasionally
+    removes the least recently used entries until the prefix holds at most max_bytes.
+    """
+
+    def __init__(self, s3_client, bucket=RESULT_CACHE_BUCKET, prefix=RESULT_CACHE_PREFIX, max_bytes=MAX_BYTES,
+                 max_age_seconds=MAX_AGE_SECONDS, refresh_seconds=REFRESH_SECONDS,
+                 sweep_probability=SWEEP_PROBABILITY, clock=time.time):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.refresh_seconds = refresh_seconds
+        self.sweep_probability = sweep_probability
+        self.clock = clock
+
+    def key_for(self, etag, function_name, catalog_etag):
+        content_hash = etag.strip('"')
+        catalog_hash = catalog_etag.strip('"')
+        return (f"{self.prefix}{function_name}/v{EXTRACTOR_VERSIONS[function_name]}/{catalog_hash}/"
+                f"{content_hash}.jsonl.gz")
+
+    def catalog_etag(self):
+        return self.s3_client.head_object(Bucket=CATALOG_BUCKET, Key=CATALOG_KEY)['ETag']
+
+    def lookup(self, etag, function_name, catalog_etag=None, filename='cached.xlsx'):
+        """
+        Copies a cached result to an extraction key of its own, named after filename, and returns the
+        excel_management pointer payload of the copy, or None. Without catalog_etag, the current catalog's is read
+        from S3.
+        """
+        try:
+            key = self.key_for(etag, function_name, catalog_etag or self.catalog_etag())
+            head = self.s3_client.head_object(Bucket=self.bucket, Key=key)
+            age = self.clock() - head['LastModified'].timestamp()
+            if age > self.max_age_seconds:
+                return None
+            copy_key = extraction_key(filename)
+            # a sweep may remove the entry after the HEAD, the copy then fails like a miss
+            self.s3_client.copy_object(Bucket=EXTRACTION_BUCKET, Key=copy_key,
+                                       CopySource={'Bucket': self.bucket, 'Key': key})
+        except ClientError:
+            return None
+        if age > self.refresh_seconds:
+            self.refresh(key)
+        return {'extraction_bucket': EXTRACTION_BUCKET, 'extraction_key': copy_key}
+
+    def refresh(self, key):
+        """Copies the entry onto itself, which renews the LastModified the lifecycle rule and the sweep go by."""
+        try:
+            self.s3_client.copy_object(Bucket=self.bucket, Key=key, CopySource={'Bucket': self.bucket, 'Key': key},
+                                       MetadataDirective='REPLACE', ContentEncoding='gzip')
+        except ClientError as e:
+            print(f"Result cache entry s3://{self.bucket}/{key} not refreshed: {e}")
+
+    def store(self, etag, function_name, catalog_etag, extracted_data, page_errors, client, filename):
+        """Stores the result found with the catalog of catalog_etag and returns its excel_management pointer payload."""
+        key = self.key_for(etag, function_name, catalog_etag)
+        body = encode_extraction(extracted_data, page_errors, client, filename)
+        self.s3_client.put_object(Body=body, Bucket=self.bucket, Key=key, ContentEncoding='gzip')
+        print(f"Extraction of {len(extracted_data)} ids cached in {len(body)} bytes at s3://{self.bucket}/{key}")
+        return {'extraction_bucket': self.bucket, 'extraction_key': key, 'client': client, 'filename': filename,
+                'keep_extraction': True}
+
+    def sweep_sometimes(self):
+        """Runs evict for sweep_probability of the calls, so the listing is shared out over many extractions."""
+        if random.random() < self.sweep_probability:
+            try:
+                self.evict()
+            except ClientError as e:
+                print(f"Result cache sweep of s3://{self.bucket}/{self.prefix} stopped: {e}")
+
+    def evict(self):
+        """Removes expired entries, then the least recently used ones until the prefix holds at most max_bytes."""
+        entries = list()
+        marker = ''
+        while True:
+            listing = self.s3_client.list_objects(Bucket=self.bucket, Prefix=self.prefix, Marker=marker)
+            entries.extend(listing.get('Contents', []))
+            if not listing.get('IsTruncated'):
+                break
+            marker = entries[-1]['Key']
+        now = self.clock()
+        total_bytes = 0
+        for entry in sorted(entries, key=lambda entry: entry['LastModified'], reverse=True):
+            total_bytes += entry['Size']
+            if now - entry['LastModified'].timestamp() > self.max_age_seconds or total_bytes > self.max_bytes:
+                self.s3_client.delete_object(Bucket=self.bucket, Key=entry['Key'])
@@ -0,0 +1,168 @@
+import argparse
+import glob
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pypdfium2 as pdfium
+import document_profiler
+import excel_management
+import instrumentation
+import manufacturer_catalog
+import pdf_processing
+
+
+OUTPUT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "batch"))
+# PDFs in flight at once; each one is extracted in a single process, so the pool is not nested
+WORKERS = int(os.environ.get("PDF_BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+
+def find_pdfs(inputs):
+    """Expands files, directories (searched recursively) and glob patterns into PDF paths, each listed once."""
+    pdf_paths = list()
+    for source in inputs:
+        if os.path.isdir(source):
+            matches = sorted(glob.glob(os.path.join(source, "**", "*.pdf"), recursive=True) +
+                             glob.glob(os.path.join(source, "**", "*.PDF"), recursive=True))
+        elif os.path.isfile(source):
+            matches = [source]
+        else:
+            matches = sorted(glob.glob(source, recursive=True))
+            if not matches:
+                print(f"No PDF found for {source}")
+        pdf_paths.extend(path for path in matches if path.lower().endswith(".pdf"))
+    return list(dict.fromkeys(os.path.abspath(path) for path in pdf_paths))
+
+
+def output_names(pdf_paths, output_dir):
+    """One workbook path per PDF, named after it, with a counter when two PDFs share a name."""
+    names = dict()
+    used = set()
+    for pdf_path in pdf_paths:
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        name = stem
+        for counter in itertools.count(2):
+            if name.lower() not in used:
+                break
+            name = f"{stem}-{counter}"
+        used.add(name.lower())
+        names[pdf_path] = os.path.join(output_dir, f"{name}.xlsx")
+    return names
+
+
+def warm_worker():
+    """
+    Pool initializer: loads the manufacturer catalog once per worker instead of on its first PDF. pdfplumber,
+    pdfium, openpyxl and the extractors are imported with this module, before the worker takes a PDF.
+    """
+    manufacturer_catalog.get_catalog()
+
+
+def process_pdf(pdf_path, workbook_path=None, profile_rate=None, profile_destination=None):
+    """
+    Classifies and extracts one PDF. The workbook is written here when workbook_path is given; otherwise the records
+    are returned for the combined workbook. profile_rate and profile_destination are passed to
+    document_profiler.profile_document.
+    """
+    start = time.perf_counter()
+    summary = {"pdf": pdf_path, "vendor": None, "pages": 0, "records": 0, "page_errors": 0, "workbook": None,
+               "error": None}
+    try:
+        with instrumentation.document(pdf_path), \
+                document_profiler.profile_document(pdf_path, profile_rate, profile_destination):
+            pdfium_doc = pdfium.PdfDocument(pdf_path)
+            summary["pages"] = len(pdfium_doc)
+            pdfium_doc.close()
+            vendor, extraction_info, page_errors = pdf_processing.extract_pdf(pdf_path, workers=1)
+            instrumentation.set_property("vendor", vendor)
+            summary.update(vendor=vendor, records=len(extraction_info), page_errors=len(page_errors))
+            if vendor is None:
+                summary["error"] = "No matching keywords found"
+            elif workbook_path:
+                excel_management.create_excel(extraction_info, workbook_path, pdf_processing.EXTRACTORS[vendor][1],
+                                              page_errors)
+                summary["workbook"] = workbook_path
+            else:
+                summary["extraction"] = (extraction_info, page_errors)
+    except Exception as e:
+        summary["error"] = str(e)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def iter_combined_rows(summaries):
+    for summary in summaries:
+        yield from summary["extraction"][0].items()
+
+
+def iter_combined_errors(summaries):
+    # page numbers repeat across PDFs, so each error is labelled with its file
+    for summary in summaries:
+        for page_number, error in summary["extraction"][1].items():
+            yield f"{os.path.basename(summary['pdf'])} page {page_number}", error
+
+
+def write_combined_workbook(summaries, workbook_path):
+    extracted = [summary for summary in summaries if "extraction" in summary]
+    clients = sorted({pdf_processing.EXTRACTORS[summary["vendor"]][1] for summary in extracted})
+    excel_management.create_excel(iter_combined_rows(extracted), workbook_path, ", ".join(clients),
+                                  iter_combined_errors(extracted))
+
+
+def run_batch(pdf_paths, workers=WORKERS, output_dir=OUTPUT_DIR, combined=None, profile_rate=None,
+              profile_destination=None):
+    """Extracts the PDFs on a process pool and returns their summaries in input order, with the elapsed seconds."""
+    start = time.perf_counter()
+    workbook_paths = dict.fromkeys(pdf_paths) if combined else output_names(pdf_paths, output_dir)
+    os.makedirs(os.path.dirname(os.path.abspath(combined)) if combined else output_dir, exist_ok=True)
+    summaries = dict()
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(pdf_paths))), initializer=warm_worker) as executor:
+        futures = {executor.submit(process_pdf, pdf_path, workbook_paths[pdf_path], profile_rate,
+                                   profile_destination): pdf_path
+                   for pdf_path in pdf_paths}
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries[futures[future]] = summary
+            status = summary["error"] or f"{summary['vendor']}, {summary['records']} records"
+            print(f"[{len(summaries)}/{len(pdf_paths)}] {os.path.basename(summary['pdf'])}: {status} "
+                  f"({summary['pages']} pages, {summary['seconds']:.1f}s)")
+    ordered = [summaries[pdf_path] for pdf_path in pdf_paths]
+    if combined:
+        write_combined_workbook(ordered, combined)
+    return ordered, time.perf_counter() - start
+
+
+def print_summary(summaries, elapsed):
+    documents = len(summaries)
+    pages = sum(summary["pages"] for summary in summaries)
+    failed = [summary for summary in summaries if summary["error"]]
+    print(f"{documents} PDFs, {pages} pages in {elapsed:.1f}s: "
+          f"{documents / elapsed * 60 if elapsed else 0:.1f} docs/min, {pages / elapsed if elapsed else 0:.1f} pages/sec")
+    for summary in failed:
+        print(f"Not extracted: {summary['pdf']}: {summary['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify and extract a batch of PDFs on a process pool")
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"worker processes (default {WORKERS})")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="directory for one workbook per PDF")
+    parser.add_argument("--combined", metavar="WORKBOOK", help="write all records to this single workbook instead")
+    parser.add_argument("--profile", type=float, nargs="?", const=1.0, metavar="RATE",
+                        help="profile every PDF, or this share of them, with cProfile and tracemalloc")
+    parser.add_argument("--profile-dir", help=f"directory for the profiles (default {document_profiler.DESTINATION})")
+    args = parser.parse_args(argv)
+
+    pdf_paths = find_pdfs(args.inputs)
+    if not pdf_paths:
+        print("No PDF files to process")
+        return 1
+    summaries, elapsed = run_batch(pdf_paths, args.workers, args.output_dir, args.combined, args.profile,
+                                   args.profile_dir)
+    print_summary(summaries, elapsed)
+    return 1 if any(summary["error"] for summary in summaries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
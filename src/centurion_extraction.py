@@ -1,35 +1,33 @@
 import re
-import pdfplumber
-from openpyxl import load_workbook
 from datetime import datetime
 
+import document_profiler
 import excel_management
-
+import instrumentation
+import manufacturer_catalog
+import page_engine
+import page_router
+import page_templates
+import result_cache
+
+@instrumentation.timed("catalog_lookup")
 def get_manufacture_model(description: str):
-    workbook = load_workbook("database/Full_list_of_Manufacturers_and_Models.xlsx")
-    manufacturer_sheet = workbook['Manufacture']
-    model_sheet = workbook['Model']
-    description_keywords = description.lower().split()
+    catalog = manufacturer_catalog.get_catalog()
     manufacture, model = "", ""
-    for row in manufacturer_sheet.iter_rows(min_row=2, values_only=True):
-        keyword = row[0]
-        value = row[1]
-        if keyword and str(keyword).lower() in description_keywords:
-            manufacture = value
-            break
+    manufacturer_entry = catalog.find_manufacturer(description)
+    if manufacturer_entry:
+        manufacture = manufacturer_entry.value
     # if str(manufacture).lower() == "miller" and "weblift" in description_keywords:
     #     manufacture = "Miller Weblift"
-    for row in model_sheet.iter_rows(min_row=2, values_only=True):
-        keyword = row[0]
-        value = row[1]
-        if keyword and str(keyword).lower() in description_keywords:
-            model = keyword
-            if not manufacture and value:
-                manufacture = value
-            break
+    model_entry = catalog.find_model(description)
+    if model_entry:
+        model = model_entry.keyword
+        if not manufacture and model_entry.value:
+            manufacture = model_entry.value
     return manufacture, model
 
 
+@instrumentation.timed("swl_parsing")
 def process_swl(swl: str):
     pattern = r'^(\d+(?:\.\d+)?)([a-zA-Z]+)?\s*(.*)$'
 
@@ -58,6 +56,7 @@ def process_swl(swl: str):
     return value_part, unit_part, note_part
 
 
+@instrumentation.timed("id_parsing")
 def get_identification_parts_list(input_string: str, quantity: int):
     numeric_part = ''.join(filter(str.isdigit, input_string))
     part_list = list()
@@ -72,6 +71,7 @@ def get_identification_parts_list(input_string: str, quantity: int):
     return part_list
 
 
+@instrumentation.timed("id_parsing")
 def get_identification_number_list(identification_numbers: str, quantity: int):
     identification_number_list = []
     if "to" in identification_numbers.lower():
@@ -128,6 +128,7 @@ def extract_quantity(text):
         return None
 
 
+@instrumentation.timed("id_parsing")
 def extrac_serialnumber(cell_content):
     serial_numbers_raw = cell_content.split(',')
     serial_numbers_cleaned = []
@@ -148,146 +149,49 @@ def extrac_serialnumber(cell_content):
     return cleaned_serials_string
 
 
-def extraction_centurion_pdf(pdf_path):
-    print("<------------extracting centurion pdf------------>")
-    pdf = pdfplumber.open(pdf_path)
-    extraction_info = dict()
-    page_errors = dict()
-    for i, page in enumerate(pdf.pages):
-        text = page.extract_text()
-        page = pdf.pages[i]
-        if "Centurion" in text and "Hendrik" not in text:
-            if page.extract_tables():
-                try:
-                    print("page number:", i)
-                    page_tables = page.extract_tables()
-                    first_table = page_tables[0]
-                    # data1:Report Number / Date of Examination / Ref No
-                    table_data1 = first_table[0][13]
-                    # data2: Identify Company keywords
-                    table_data2 = first_table[1]
-                    # data3: Identify Text keywords
-                    table_data3 = first_table[2]
-                    # data4: Provide related Value
-                    table_data4 = first_table[4]
-                    # data5 ID number Value
-                    table_data5 = first_table[5]
-                    full_serials = ' '.join([item for item in table_data5 if item is not None])
-                    errors = list()
-                    identification_number_list = list()
-                except Exception as e:
-                    print("Error extracting format from page:", e)
-                    continue
-                if "Quantity & Description of Equipment, Serial Numbers" in table_data3[0]:
-
-                    id_numbers, description, mnfer, wwl, next_thorough = None, None, None, None, None
-                    quantity = 1
-
-                    for index in range(0, len(table_data3)):
-                        try:
-                            if table_data3[index] is None:
-                                continue
-                            text_to_compare = table_data3[index].lower()
-                            if not description and "description" in text_to_compare:
-                                description = table_data4[0].replace('\n', ' ')
-                                serial_numbers = full_serials
-                                serial = re.sub(r'\s+', '', serial_numbers)
-                                serial_cleaned = extrac_serialnumber(serial)
-                                mnfer = table_data4[4].strip()
-
-                            elif not wwl and "working" in text_to_compare:
-                                wwl = table_data4[index].strip()
-                            elif not next_thorough and "next" in text_to_compare:
-                                date_string = table_data4[index].strip()
-                                date_obj = datetime.strptime(date_string, "%d/%m/%Y")
-                                next_thorough = date_obj.strftime("%d/%m/%Y")
-                            elif not id_numbers and "certificate" in text_to_compare:
-                                id_numbers = table_data4[index].strip()
-                        except Exception as e:
-                            print("Error extracting value from page:", e)
-
-
-                    if id_numbers:
-                        page_info = dict()
-                        if description:
-                            try:
-                                item_description = description
-                                if not item_description:
-                                    errors.append("Item Description not found")
-                                else:
-                                    page_info["Item Description"] = description.split(':')[0]
-                            except Exception as e:
-                                errors.append(e)
-                            try:
-                                manufacturer, model = get_manufacture_model(description)
-                                manufacturer = mnfer
-                                if not manufacturer:
-                                    errors.append("Manufacturer not found")
-                                else:
-                                    page_info["Manufacturer"] = manufacturer
-                                if not model:
-                                    errors.append("Model not found")
-                                else:
-                                    page_info["Model"] = model
-                            except Exception as e:
-                                errors.append(e)
-
-                        if wwl:
-                            try:
-                                swl_value, swl_unit, swl_note = process_swl(wwl)
-                                if not swl_value:
-                                    errors.append("SWL Value not found")
-                                else:
-                                    page_info["SWL Value"] =swl_value
-                                if not swl_unit:
-                                    errors.append("SWL Unit not Found")
-                                else:
-                                    page_info["SWL Unit"] = swl_unit
-                                page_info["SWL Note"] = swl_note
-                            except Exception as e:
-                                errors.append(e)
-                        else:
-                            errors.append("SWL not found in this page.")
-                        page_info["Next Inspection Due Date"] = next_thorough
-                        # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
-                        table_data1_mapping = dict()
-                        table_data1 = table_data1.splitlines()
-
-                        for data in table_data1:
-                            data_list = data.split(':', 1)
-                            if len(data_list) == 2:
-                                key, value = data_list
-                                formattted_key = key.lower().replace(" ", "").replace("/", "").replace(".", "")
-                                table_data1_mapping[formattted_key] = value.strip()
-
-                        page_info["Provider Identification"] = table_data1_mapping["custrefpono"]
-                        page_info["Certificate No"] = table_data1_mapping["reportnumber"]
-                        page_info["Previous Inspection"] = table_data1_mapping["dateofexamination"]
-
-                        id_numbers = serial_cleaned
-
-                        if quantity == 1:
-                            identification_number_list.append(id_numbers)
-
-                        for identification_number in identification_number_list:
-                            extraction_info[identification_number] = page_info
-
-                    else:
-                        print("No identification error")
-
-                elif "Qty, Description of Equipment, Serial Numbers" in table_data3[0]:
-                    quantity, id_numbers, description, mnfer, wwl, next_thorough = None, None, None, None, None, None
-                    for index in range(0, len(table_data3)):
+def process_centurion_page(page_content, page_number):
+    page_records = dict()
+    # the route comes from the page fingerprint; without one, the extracted text decides
+    route = page_content.route or page_router.route_centurion_text(page_content.text)
+    if route == "Centurion":
+        if page_content.tables:
+            try:
+                print("page number:", page_number - 1)
+                page_tables = page_content.tables
+                first_table = page_tables[0]
+                # data1:Report Number / Date of Examination / Ref No
+                table_data1 = first_table[0][13]
+                # data2: Identify Company keywords
+                table_data2 = first_table[1]
+                # data3: Identify Text keywords
+                table_data3 = first_table[2]
+                # data4: Provide related Value
+                table_data4 = first_table[4]
+                # data5 ID number Value
+                table_data5 = first_table[5]
+                full_serials = ' '.join([item for item in table_data5 if item is not None])
+                errors = list()
+                identification_number_list = list()
+            except Exception as e:
+                print("Error extracting format from page:", e)
+                return page_records, None
+            if "Quantity & Description of Equipment, Serial Numbers" in table_data3[0]:
+
+                id_numbers, description, mnfer, wwl, next_thorough = None, None, None, None, None
+                quantity = 1
+
+                for index in range(0, len(table_data3)):
+                    try:
                         if table_data3[index] is None:
                             continue
                         text_to_compare = table_data3[index].lower()
                         if not description and "description" in text_to_compare:
-                            description = table_data4[index].replace('\n', ' ')
+                            description = table_data4[0].replace('\n', ' ')
                             serial_numbers = full_serials
                             serial = re.sub(r'\s+', '', serial_numbers)
                             serial_cleaned = extrac_serialnumber(serial)
-                            quantity = extract_quantity(table_data4[index])
                             mnfer = table_data4[4].strip()
+
                         elif not wwl and "working" in text_to_compare:
                             wwl = table_data4[index].strip()
                         elif not next_thorough and "next" in text_to_compare:
@@ -296,67 +200,174 @@ def extraction_centurion_pdf(pdf_path):
                             next_thorough = date_obj.strftime("%d/%m/%Y")
                         elif not id_numbers and "certificate" in text_to_compare:
                             id_numbers = table_data4[index].strip()
-                            old_id = id_numbers
-                            id_numbers = serial_cleaned
+                    except Exception as e:
+                        print("Error extracting value from page:", e)
 
 
-                    if id_numbers:
-                        page_info = dict()
-                        if description:
-                            page_info["Item Description"] = description.split(':')[0]
+                if id_numbers:
+                    page_info = dict()
+                    if description:
+                        try:
+                            item_description = description
+                            if not item_description:
+                                errors.append("Item Description not found")
+                            else:
+                                page_info["Item Description"] = description.split(':')[0]
+                        except Exception as e:
+                            errors.append(e)
+                        try:
                             manufacturer, model = get_manufacture_model(description)
                             manufacturer = mnfer
-                            page_info["Manufacturer"] = manufacturer
-                            page_info["Model"] = model
-                        if wwl:
-                            try:
-                                swl_value, swl_unit, swl_note = process_swl(wwl)
-                                if not swl_value:
-                                    errors.append("SWL Value not found")
-                                else:
-                                    page_info["SWL Value"] = swl_value
-                                if not swl_unit:
-                                    errors.append("SWL Unit not Found")
-                                else:
-                                    page_info["SWL Unit"] = swl_unit
-                                page_info["SWL Note"] = swl_note
-                            except Exception as e:
-                                errors.append(e)
-                        else:
-                            errors.append("SWL not found in this page.")
-                        page_info["Next Inspection Due Date"] = next_thorough
-                        # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
-                        table_data1_mapping = dict()
-                        table_data1 = table_data1.splitlines()
-
-                        for data in table_data1:
-                            data_list = data.split(':', 1)
-                            if len(data_list) == 2:
-                                key, value = data_list
-                                formattted_key = key.lower().replace(" ", "").replace("/", "").replace(".", "")
-                                table_data1_mapping[formattted_key] = value.strip()
-
-                        page_info["Provider Identification"] = table_data1_mapping["custrefpono"]
-                        page_info["Certificate No"] = table_data1_mapping["reportnumber"]
-                        page_info["Previous Inspection"] = table_data1_mapping["dateofexamination"]
-
-
-
-                        if quantity > 1:
-                            identification_number_list = get_identification_number_list(id_numbers, quantity)
-
-                        for identification_number in identification_number_list:
-                            extraction_info[identification_number] = page_info
-
-                        #
+                            if not manufacturer:
+                                errors.append("Manufacturer not found")
+                            else:
+                                page_info["Manufacturer"] = manufacturer
+                            if not model:
+                                errors.append("Model not found")
+                            else:
+                                page_info["Model"] = model
+                        except Exception as e:
+                            errors.append(e)
+
+                    if wwl:
+                        try:
+                            swl_value, swl_unit, swl_note = process_swl(wwl)
+                            if not swl_value:
+                                errors.append("SWL Value not found")
+                            else:
+                                page_info["SWL Value"] =swl_value
+                            if not swl_unit:
+                                errors.append("SWL Unit not Found")
+                            else:
+                                page_info["SWL Unit"] = swl_unit
+                            page_info["SWL Note"] = swl_note
+                        except Exception as e:
+                            errors.append(e)
                     else:
-                        print("No identification error")
+                        errors.append("SWL not found in this page.")
+                    page_info["Next Inspection Due Date"] = next_thorough
+                    # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
+                    table_data1_mapping = dict()
+                    table_data1 = table_data1.splitlines()
+
+                    for data in table_data1:
+                        data_list = data.split(':', 1)
+                        if len(data_list) == 2:
+                            key, value = data_list
+                            formattted_key = key.lower().replace(" ", "").replace("/", "").replace(".", "")
+                            table_data1_mapping[formattted_key] = value.strip()
+
+                    page_info["Provider Identification"] = table_data1_mapping["custrefpono"]
+                    page_info["Certificate No"] = table_data1_mapping["reportnumber"]
+                    page_info["Previous Inspection"] = table_data1_mapping["dateofexamination"]
+
+                    id_numbers = serial_cleaned
+
+                    if quantity == 1:
+                        identification_number_list.append(id_numbers)
+
+                    for identification_number in identification_number_list:
+                        page_records[identification_number] = page_info
+
+                else:
+                    print("No identification error")
+
+            elif "Qty, Description of Equipment, Serial Numbers" in table_data3[0]:
+                quantity, id_numbers, description, mnfer, wwl, next_thorough = None, None, None, None, None, None
+                for index in range(0, len(table_data3)):
+                    if table_data3[index] is None:
+                        continue
+                    text_to_compare = table_data3[index].lower()
+                    if not description and "description" in text_to_compare:
+                        description = table_data4[index].replace('\n', ' ')
+                        serial_numbers = full_serials
+                        serial = re.sub(r'\s+', '', serial_numbers)
+                        serial_cleaned = extrac_serialnumber(serial)
+                        quantity = extract_quantity(table_data4[index])
+                        mnfer = table_data4[4].strip()
+                    elif not wwl and "working" in text_to_compare:
+                        wwl = table_data4[index].strip()
+                    elif not next_thorough and "next" in text_to_compare:
+                        date_string = table_data4[index].strip()
+                        date_obj = datetime.strptime(date_string, "%d/%m/%Y")
+                        next_thorough = date_obj.strftime("%d/%m/%Y")
+                    elif not id_numbers and "certificate" in text_to_compare:
+                        id_numbers = table_data4[index].strip()
+                        old_id = id_numbers
+                        id_numbers = serial_cleaned
 
-        else:
-            print("No verified company found")
 
-    print(len(extraction_info.keys()))
-    excel_management.create_excel(extraction_info, "database/Centurion.xlsx", "Centurion", page_errors)
+                if id_numbers:
+                    page_info = dict()
+                    if description:
+                        page_info["Item Description"] = description.split(':')[0]
+                        manufacturer, model = get_manufacture_model(description)
+                        manufacturer = mnfer
+                        page_info["Manufacturer"] = manufacturer
+                        page_info["Model"] = model
+                    if wwl:
+                        try:
+                            swl_value, swl_unit, swl_note = process_swl(wwl)
+                            if not swl_value:
+                                errors.append("SWL Value not found")
+                            else:
+                                page_info["SWL Value"] = swl_value
+                            if not swl_unit:
+                                errors.append("SWL Unit not Found")
+                            else:
+                                page_info["SWL Unit"] = swl_unit
+                            page_info["SWL Note"] = swl_note
+                        except Exception as e:
+                            errors.append(e)
+                    else:
+                        errors.append("SWL not found in this page.")
+                    page_info["Next Inspection Due Date"] = next_thorough
+                    # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
+                    table_data1_mapping = dict()
+                    table_data1 = table_data1.splitlines()
+
+                    for data in table_data1:
+                        data_list = data.split(':', 1)
+                        if len(data_list) == 2:
+                            key, value = data_list
+                            formattted_key = key.lower().replace(" ", "").replace("/", "").replace(".", "")
+                            table_data1_mapping[formattted_key] = value.strip()
+
+                    page_info["Provider Identification"] = table_data1_mapping["custrefpono"]
+                    page_info["Certificate No"] = table_data1_mapping["reportnumber"]
+                    page_info["Previous Inspection"] = table_data1_mapping["dateofexamination"]
+
+
+
+                    if quantity > 1:
+                        identification_number_list = get_identification_number_list(id_numbers, quantity)
+
+                    for identification_number in identification_number_list:
+                        page_records[identification_number] = page_info
+
+                    #
+                else:
+                    print("No identification error")
+
+    else:
+        print("No verified company found")
+    return page_records, None
+
+def iter_centurion_records(pdf_path, workers=None, snapshot_mode=None):
+    """Yields a page_engine.ExtractionEvent for each record and page error of a Centurion PDF, page by page."""
+    return page_engine.iter_page_events(pdf_path, process_centurion_page, workers,
+                                        page_templates.TEMPLATES["Centurion"], page_router.route_centurion_page,
+                                        snapshot_mode)
+
+
+def extraction_centurion_pdf(pdf_path, workers=None):
+    print("<------------extracting centurion pdf------------>")
+    with instrumentation.document(pdf_path, vendor="Centurion"), document_profiler.profile_document(pdf_path):
+        extraction_info, page_errors = result_cache.cached_extraction(
+            pdf_path, "Centurion", lambda: page_engine.collect_events(iter_centurion_records(pdf_path, workers)))
+
+        print(len(extraction_info.keys()))
+        excel_management.create_excel(extraction_info, "database/Centurion.xlsx", "Centurion", page_errors)
 
 
 if __name__ == "__main__":
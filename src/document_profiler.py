@@ -0,0 +1,127 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# share of documents profiled, 0 profiles none and 1 every one; low rates can stay on in production
+RATE = float(os.environ.get("PDF_PROFILE_RATE", "0"))
+# a local directory, or an s3://bucket/prefix/ the Lambda functions write to through their S3 client
+DESTINATION = os.environ.get("PDF_PROFILE_DESTINATION", os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "database", "profiles")))
+LAMBDA_DESTINATION = "s3://resources-and-extraction-data/profiles/"
+# tracemalloc makes a run several times slower; set PDF_PROFILE_MEMORY=off to take only the cProfile stats
+TRACE_MEMORY = os.environ.get("PDF_PROFILE_MEMORY", "on").lower() not in ("off", "0", "false")
+# frames kept per allocation, and the number of functions and allocation sites in the text reports
+TRACE_FRAMES = 5
+TOP = 40
+
+# the profiler of the document being profiled in this thread; a nested run would take its place
+_active = ContextVar("document_profiler", default=None)
+
+
+def sampled(rate):
+    return rate > 0 and random.random() < rate
+
+
+def document_name(document):
+    """The PDF's file name without its extension, with anything but letters, digits, '.', '_' and '-' replaced."""
+    stem = os.path.splitext(os.path.basename(str(document)))[0]
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", stem) or "document"
+
+
+def default_destination():
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") and "PDF_PROFILE_DESTINATION" not in os.environ:
+        return LAMBDA_DESTINATION
+    return DESTINATION
+
+
+def stats_report(profiler):
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(TOP)
+    return output.getvalue()
+
+
+def allocation_report(snapshot, peak):
+    lines = [f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB", f"Top {TOP} allocation sites:"]
+    for statistic in snapshot.statistics("lineno")[:TOP]:
+        lines.append(str(statistic))
+    return "\n".join(lines) + "\n"
+
+
+def write_profile(files, document, destination, s3_client=None):
+    """
+    Writes files, a dict of suffix to bytes, as <destination>/<PDF name>/<timestamp>-<pid><suffix>.
+    Returns the paths or S3 URLs written.
+    """
+    stem = f"{document_name(document)}/{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    written = list()
+    if destination.startswith("s3://"):
+        bucket, _, prefix = destination[len("s3://"):].partition("/")
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        for suffix, body in files.items():
+            key = f"{prefix}{stem}{suffix}"
+            s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+            written.append(f"s3://{bucket}/{key}")
+        return written
+    os.makedirs(os.path.dirname(os.path.join(destination, stem)), exist_ok=True)
+    for suffix, body in files.items():
+        path = os.path.join(destination, stem + suffix)
+        with open(path, "wb") as profile_file:
+            profile_file.write(body)
+        written.append(path)
+    return written
+
+
+@contextmanager
+def profile_document(document, rate=None, destination=None, s3_client=None, trace_memory=None):
+    """
+    Profiles the block for a sampled share of documents.
+
+    A sampled run writes <run>.pstats (load it with pstats.Stats or snakeviz), <run>-profile.txt with the
+    functions by cumulative time and, with trace_memory, <run>-allocations.txt with the top tracemalloc
+    allocation sites. <run> is the time and process id, in a directory named after the PDF under destination. The block runs
+    unprofiled when it is not sampled, or when a profiler is already active. rate, destination and trace_memory
+    default to PDF_PROFILE_RATE, PDF_PROFILE_DESTINATION and PDF_PROFILE_MEMORY.
+    """
+    if _active.get() is not None or not sampled(RATE if rate is None else rate):
+        yield None
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # a profiler the developer attached is already running
+        yield None
+        return
+    token = _active.set(profiler)
+    trace_memory = TRACE_MEMORY if trace_memory is None else trace_memory
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACE_FRAMES)
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        _active.reset(token)
+        profiler.create_stats()
+        files = {".pstats": marshal.dumps(profiler.stats), "-profile.txt": stats_report(profiler).encode()}
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            files["-allocations.txt"] = allocation_report(snapshot, peak).encode()
+        try:
+            written = write_profile(files, document, destination or default_destination(), s3_client)
+            print(f"Profile of {document} written to {written[0]}")
+        except Exception as e:
+            print(f"Profile of {document} could not be written: {e}")
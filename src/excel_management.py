@@ -1,5 +1,7 @@
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, Border, Side
+import instrumentation
 
 
 column_mapping = {
@@ -24,47 +26,115 @@ column_mapping = {
 }
 
 
-def create_excel(extracted_data: dict, filename: str, client: str, page_errors: dict):
+# write-only rows are plain lists, so each header's column letter becomes a list position
+column_positions = {header: ord(column) - 65 for header, column in column_mapping.items()}
+row_width = max(column_positions.values()) + 1
+
+
+def style_header(cell):
+    cell.font = Font(bold=True)
+    cell.alignment = Alignment(horizontal='center', vertical='center')  # Center align the text
+    cell.border = Border(bottom=Side(border_style='thin'))  # Add a thin border at the bottom
+
+
+def build_row(key, data):
+    row = [None] * row_width
+    row[0] = key  # Write key in the first column
+    for cell_name, value in data.items():
+        position = column_positions.get(cell_name)
+        if position is not None:
+            row[position] = value
+    return row
+
+
+def iter_items(extracted_data):
+    return extracted_data.items() if isinstance(extracted_data, dict) else extracted_data
+
+
+def build_workbook(extracted_data, client, page_errors):
+    """The original writer: an in-memory workbook filled cell by cell."""
+    workbook = openpyxl.Workbook()  # Create a new Workbook
+
+    # Create a sheet for extracted data
+    sheet_data = workbook.active
+    sheet_data.title = "Extraction Data"  # Set sheet name
+
+    sheet_data['A1'] = "Rig-Ware import v2"
+    sheet_data['B1'] = client
+    sheet_data['C1'] = "CreateLocations=No"
+
+    # Write column headers for extracted data sheet
+    for header, column in column_mapping.items():
+        cell = sheet_data[column + '2']
+        cell.value = header
+        style_header(cell)
+
+        # Adjust column width to fit the header text
+        column_width = max(len(header), 10)  # Set a minimum width of 10 characters
+        sheet_data.column_dimensions[column].width = column_width
+
+    # Write extracted data to the worksheet
+    for row_idx, (key, data) in enumerate(iter_items(extracted_data), start=3):
+        sheet_data.cell(row=row_idx, column=1, value=key)  # Write key in the first column
+        for cell_name, value in data.items():
+            column_name = column_mapping.get(cell_name)
+            if column_name:
+                sheet_data.cell(row=row_idx, column=ord(column_name) - 64, value=value)
+
+    # Create a sheet for errors
+    sheet_errors = workbook.create_sheet(title="Errors")  # Create a new worksheet
+    sheet_errors.append(["Page No", "Error"])  # Write column headers
+
+    # Write errors to the worksheet
+    for key, value in iter_items(page_errors):
+        sheet_errors.append([key, value])  # Write key-value pairs as rows
+    return workbook
+
+
+def write_workbook(extracted_data, client, page_errors):
+    """
+    The same workbook in openpyxl's write-only mode: each row is built as a list and streamed out, so memory does
+    not grow with the number of records.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet_data = workbook.create_sheet(title="Extraction Data")
+
+    # column widths have to be set before the first row is written
+    for header, column in column_mapping.items():
+        sheet_data.column_dimensions[column].width = max(len(header), 10)  # Set a minimum width of 10 characters
+
+    sheet_data.append(["Rig-Ware import v2", client, "CreateLocations=No"])
+    header_row = [None] * row_width
+    for header, position in column_positions.items():
+        cell = WriteOnlyCell(sheet_data, value=header)
+        style_header(cell)
+        header_row[position] = cell
+    sheet_data.append(header_row)
+
+    for key, data in iter_items(extracted_data):
+        sheet_data.append(build_row(key, data))
+
+    sheet_errors = workbook.create_sheet(title="Errors")
+    sheet_errors.append(["Page No", "Error"])
+    for key, value in iter_items(page_errors):
+        sheet_errors.append([key, value])
+    return workbook
+
+
+@instrumentation.timed("excel_build")
+def create_excel(extracted_data, filename: str, client: str, page_errors, write_only=True):
+    """
+    Writes the extracted records and page errors to filename.
+
+    extracted_data is a dict of id number to record, or an iterator of (id number, record) pairs with each id
+    number once; page_errors likewise. write_only=False builds the whole workbook in memory as before.
+    """
     try:
         print("<--------------Creating new excel------------------>")
-        workbook = openpyxl.Workbook()  # Create a new Workbook
-
-        # Create a sheet for extracted data
-        sheet_data = workbook.active
-        sheet_data.title = "Extraction Data"  # Set sheet name
-
-        sheet_data['A1'] = "Rig-Ware import v2"
-        sheet_data['B1'] = client
-        sheet_data['C1'] = "CreateLocations=No"
-
-        # Write column headers for extracted data sheet
-        for header, column in column_mapping.items():
-            cell = sheet_data[column + '2']
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')  # Center align the text
-            cell.border = Border(bottom=Side(border_style='thin'))  # Add a thin border at the bottom
-
-            # Adjust column width to fit the header text
-            column_width = max(len(header), 10)  # Set a minimum width of 10 characters
-            sheet_data.column_dimensions[column].width = column_width
-
-        # Write extracted data to the worksheet
-        for row_idx, (key, data) in enumerate(extracted_data.items(), start=3):
-            sheet_data.cell(row=row_idx, column=1, value=key)  # Write key in the first column
-            for cell_name, value in data.items():
-                column_name = column_mapping.get(cell_name)
-                if column_name:
-                    sheet_data.cell(row=row_idx, column=ord(column_name) - 64, value=value)
-
-        # Create a sheet for errors
-        sheet_errors = workbook.create_sheet(title="Errors")  # Create a new worksheet
-        sheet_errors.append(["Page No", "Error"])  # Write column headers
-
-        # Write errors to the worksheet
-        for key, value in page_errors.items():
-            sheet_errors.append([key, value])  # Write key-value pairs as rows
-
+        if write_only:
+            workbook = write_workbook(extracted_data, client, page_errors)
+        else:
+            workbook = build_workbook(extracted_data, client, page_errors)
         workbook.save(filename)  # Save the workbook with the provided filename
         workbook.close()
         print("<-------------- Excel created successfully ------------------>")
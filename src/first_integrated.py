@@ -1,10 +1,15 @@
 import re
-import pdfplumber
 from datetime import datetime, timedelta
-from openpyxl import load_workbook
+import document_profiler
 import excel_management
+import instrumentation
+import manufacturer_catalog
+import page_engine
+import page_router
+import result_cache
 
 
+@instrumentation.timed("id_parsing")
 def split_id_numbers_with_range(id_numbers):
     new_id_numbers = []
     new_errors = list()
@@ -43,6 +48,7 @@ def split_id_numbers_with_range(id_numbers):
     return new_id_numbers, new_errors
 
 
+@instrumentation.timed("swl_parsing")
 def process_swl(swl: str):
     pattern = r'^(\d+(?:\.\d+)?)\s*([a-zA-Z]+)?\s*(.*)$'
     # Match the pattern
@@ -73,21 +79,16 @@ def process_swl(swl: str):
     return value_part, unit_part, note_part
 
 
+@instrumentation.timed("catalog_lookup")
 def get_manufacture_model(description: str):
-    workbook = load_workbook("../../database/Full_list_of_Manufacturers_and_Models.xlsx")
-    sheet = workbook['Model']
-
-    description_keywords = description.lower()
+    catalog = manufacturer_catalog.get_catalog()
     manufacture, model = "",""
 
     # Search for Model in the column
-    for row in sheet.iter_rows(min_row=2, values_only=True):
-        model_keyword = row[0]
-
-        if model_keyword and str(model_keyword).lower() in description_keywords:
-            model = model_keyword
-            manufacture = row[1]
-            break
+    model_entry = catalog.find_model_in_text(description)
+    if model_entry:
+        model = model_entry.keyword
+        manufacture = model_entry.value
 
     return manufacture, model
 
@@ -110,39 +111,49 @@ def add_six_months(date_str):
 
     return next_inspection_date_str
 
-# Call to the First Integrated PDF
-def extract_first_integrated_pdf(pdf_path):
-    print("<------------extracting first_integrated pdf------------>")
-    pdf_doc = pdfplumber.open(pdf_path)
-    extraction_info = dict()
-    page_errors = dict()
-    for i in range(0, len(pdf_doc.pages)):
-        try:
-            # for page_number, page in enumerate(pdf_doc.pages()):
-            page = pdf_doc.pages[i]
-            page_tables = page.extract_tables()
-            #print("page number:", i)
-            #print("page tables:", page_tables)
-            if not page_tables:
-                page_errors[i+1] = f" No tables found on page {i+1}. Skipping..."
-                continue
-
-            first_row = page_tables[0][0]
-
-            if contains_keyword(first_row, "Name & Address of employer for Whom the examination was made"):
-                process_table_type1(page_tables, extraction_info)
-            elif contains_keyword(first_row, "Date of Thorough Examination"):
-                process_table_type2(page_tables[0], extraction_info)
-            elif contains_keyword(first_row, "Name &AddressofManufacturer") or contains_keyword(first_row, "Name & Address of Manufacturer"):
-                process_table_type3(page_tables[0], extraction_info)
-            else:
-                page_errors[i+1] = f"No recognized table found on page {i+1}"
+def process_first_integrated_page(page_content, page_number):
+    page_records = dict()
+    try:
+        # pages whose fingerprint has no table rulings are answered without the table finder
+        if page_content.route == page_router.NO_TABLES:
+            return page_records, f" No tables found on page {page_number}. Skipping..."
+        page_tables = page_content.tables
+        #print("page number:", page_number - 1)
+        #print("page tables:", page_tables)
+        if not page_tables:
+            return page_records, f" No tables found on page {page_number}. Skipping..."
+
+        first_row = page_tables[0][0]
+
+        if contains_keyword(first_row, "Name & Address of employer for Whom the examination was made"):
+            process_table_type1(page_tables, page_records)
+        elif contains_keyword(first_row, "Date of Thorough Examination"):
+            process_table_type2(page_tables[0], page_records)
+        elif contains_keyword(first_row, "Name &AddressofManufacturer") or contains_keyword(first_row, "Name & Address of Manufacturer"):
+            process_table_type3(page_tables[0], page_records)
+        else:
+            return page_records, f"No recognized table found on page {page_number}"
 
-        except Exception as e:
-            page_errors[i+1] = f"Error occurred on page {i+1}: {e}"
-            print(f"Error occurred on page {i+1}: {e}")
+    except Exception as e:
+        print(f"Error occurred on page {page_number}: {e}")
+        return page_records, f"Error occurred on page {page_number}: {e}"
+    return page_records, None
+
+
+def iter_first_integrated_records(pdf_path, workers=None, snapshot_mode=None):
+    """Yields a page_engine.ExtractionEvent for each record and page error of a First Integrated PDF, page by page."""
+    return page_engine.iter_page_events(pdf_path, process_first_integrated_page, workers,
+                                        router=page_router.route_first_integrated_page, snapshot_mode=snapshot_mode)
 
-    excel_management.create_excel(extraction_info, "../database/First Integrated.xlsx", "First_Integrated", page_errors)
+
+# Call to the First Integrated PDF
+def extract_first_integrated_pdf(pdf_path, workers=None):
+    print("<------------extracting first_integrated pdf------------>")
+    with instrumentation.document(pdf_path, vendor="First Integrated"), document_profiler.profile_document(pdf_path):
+        extraction_info, page_errors = result_cache.cached_extraction(
+            pdf_path, "First Integrated",
+            lambda: page_engine.collect_events(iter_first_integrated_records(pdf_path, workers)))
+        excel_management.create_excel(extraction_info, "../database/First Integrated.xlsx", "First_Integrated", page_errors)
 
 
 def process_table_type1(page_tables, extraction_info):
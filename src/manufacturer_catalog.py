@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+from io import BytesIO
+from openpyxl import load_workbook
+
+
+CATALOG_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database",
+                                             "Full_list_of_Manufacturers_and_Models.xlsx"))
+# built by running this module, see build_artifact
+ARTIFACT_PATH = os.path.splitext(CATALOG_PATH)[0] + ".json.gz"
+ARTIFACT_FORMAT = 2
+
+# row: position of the entry in its sheet, keyword: column A as found in the sheet, value: column B
+CatalogEntry = namedtuple("CatalogEntry", ["row", "keyword", "value", "tokens"])
+
+_catalogs = dict()
+
+
+class PhraseIndex:
+    """
+    Index of catalog keywords keyed by their first lower-cased token.
+
+    A keyword made of several words ("Aberdeen Web Lift") matches when its tokens appear next to each other in
+    the description. When several keywords match, the one nearest the top of the sheet wins, like the row by row
+    scan this index replaces.
+    """
+
+    def __init__(self):
+        self.entries = list()
+        self._by_first_token = dict()
+        self._lowered = list()
+
+    def add(self, keyword, value):
+        entry = CatalogEntry(len(self.entries), keyword, value, tuple(str(keyword).lower().split()))
+        self.entries.append(entry)
+        self._lowered.append(str(keyword).lower())
+        if entry.tokens:
+            candidates = self._by_first_token.setdefault(entry.tokens[0], list())
+            # a repeated keyword can never win against its first occurrence
+            if entry.tokens not in (candidate.tokens for candidate in candidates):
+                candidates.append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def first_match(self, description_tokens):
+        best = None
+        for position, token in enumerate(description_tokens):
+            for entry in self._by_first_token.get(token, ()):
+                if best is not None and entry.row >= best.row:
+                    break
+                if tuple(description_tokens[position:position + len(entry.tokens)]) == entry.tokens:
+                    best = entry
+                    break
+        return best
+
+    def first_substring_match(self, description):
+        # keywords found anywhere in the text, even inside a word, cannot be hashed by token
+        text = description.lower()
+        for entry, lowered in zip(self.entries, self._lowered):
+            if lowered in text:
+                return entry
+        return None
+
+
+class ManufacturerCatalog:
+    def __init__(self):
+        self.manufacturers = PhraseIndex()
+        self.models = PhraseIndex()
+
+    @classmethod
+    def from_workbook(cls, filename):
+        workbook = load_workbook(filename, read_only=True)
+        manufacturer_rows = [(row[0], row[1] if len(row) > 1 else None)
+                             for row in workbook['Manufacture'].iter_rows(min_row=2, values_only=True) if row and row[0]]
+        model_rows = [(row[0], row[1] if len(row) > 1 else None)
+                      for row in workbook['Model'].iter_rows(min_row=2, values_only=True) if row and row[0]]
+        workbook.close()
+        return cls.from_rows(manufacturer_rows, model_rows)
+
+    @classmethod
+    def from_rows(cls, manufacturer_rows, model_rows):
+        catalog = cls()
+        for keyword, value in manufacturer_rows:
+            catalog.manufacturers.add(keyword, value)
+        for keyword, value in model_rows:
+            catalog.models.add(keyword, value)
+        return catalog
+
+    def to_rows(self):
+        return ([(entry.keyword, entry.value) for entry in self.manufacturers.entries],
+                [(entry.keyword, entry.value) for entry in self.models.entries])
+
+    def find_manufacturer(self, description: str):
+        return self.manufacturers.first_match(description.lower().split())
+
+    def find_model(self, description: str):
+        return self.models.first_match(description.lower().split())
+
+    def find_model_in_text(self, description: str):
+        return self.models.first_substring_match(description)
+
+
+def source_digest(filename=CATALOG_PATH):
+    """The sha256 of the workbook, as build_artifact records it."""
+    with open(filename, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_artifact(filename=CATALOG_PATH, artifact_filename=ARTIFACT_PATH):
+    """
+    Writes the catalog rows as gzip JSON together with the hashes of the workbook they came from.
+
+    JSON holds only data, so loading an artifact someone else uploaded cannot run code, and the Lambda functions
+    can load the same file. The md5 matches the S3 ETag of the workbook when it is uploaded in a single part.
+    """
+    with open(filename, "rb") as f:
+        content = f.read()
+    manufacturer_rows, model_rows = ManufacturerCatalog.from_workbook(BytesIO(content)).to_rows()
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "source_sha256": hashlib.sha256(content).hexdigest(),
+        "source_md5": hashlib.md5(content).hexdigest(),
+        "manufacturers": manufacturer_rows,
+        "models": model_rows,
+    }
+    with gzip.open(artifact_filename, "wt", encoding="utf-8") as f:
+        json.dump(artifact, f)
+    return artifact
+
+
+def load_catalog(filename=CATALOG_PATH, artifact_filename=ARTIFACT_PATH):
+    """Loads the catalog from the prebuilt artifact, or from the workbook when the artifact is missing or stale."""
+    with open(filename, "rb") as f:
+        content = f.read()
+    if os.path.exists(artifact_filename):
+        with gzip.open(artifact_filename, "rt", encoding="utf-8") as f:
+            artifact = json.load(f)
+        if artifact.get("format") == ARTIFACT_FORMAT and \
+                artifact.get("source_sha256") == hashlib.sha256(content).hexdigest():
+            return ManufacturerCatalog.from_rows(artifact["manufacturers"], artifact["models"])
+        print(f"Catalog artifact {artifact_filename} is out of date, loading the workbook instead")
+    return ManufacturerCatalog.from_workbook(BytesIO(content))
+
+
+def get_catalog(filename=CATALOG_PATH, artifact_filename=ARTIFACT_PATH):
+    """Returns the catalog for the workbook, loading it only on the first call in this process."""
+    filename = os.path.abspath(filename)
+    if filename not in _catalogs:
+        _catalogs[filename] = load_catalog(filename, artifact_filename)
+    return _catalogs[filename]
+
+
+def clear_cache():
+    _catalogs.clear()
+
+
+if __name__ == "__main__":
+    workbook_path = sys.argv[1] if len(sys.argv) > 1 else CATALOG_PATH
+    artifact_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(workbook_path)[0] + ".json.gz"
+    built = build_artifact(workbook_path, artifact_path)
+    print(f"Wrote {artifact_path}: {len(built['manufacturers'])} manufacturers, {len(built['models'])} models, "
+          f"source sha256 {built['source_sha256']}")
@@ -0,0 +1,138 @@
+import itertools
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import pdfplumber
+import instrumentation
+from page_content import PageContent
+import page_router
+import page_snapshots
+
+
+# 1 keeps extraction in this process, set PDF_EXTRACTION_WORKERS to fan pages out over a process pool
+WORKERS = int(os.environ.get("PDF_EXTRACTION_WORKERS", "1"))
+# each worker gets several page ranges so a slow range does not leave the other workers idle
+RANGES_PER_WORKER = 4
+# pdfplumber's caches of each page are dropped once it is parsed, so memory stays flat through long documents;
+# set PDF_BOUNDED_MEMORY=off to keep them until the document is closed
+BOUNDED_MEMORY = os.environ.get("PDF_BOUNDED_MEMORY", "on").lower() not in ("off", "0", "false")
+
+RECORD = "record"
+PAGE_ERROR = "page error"
+# a RECORD event carries (id number, record), a PAGE_ERROR event (page number, error message)
+ExtractionEvent = namedtuple("ExtractionEvent", ["kind", "key", "value"])
+
+
+def iter_page_range(pdf_path, page_processor, start, stop, template=None, router=None, snapshots=None):
+    """
+    Opens the PDF and yields the result of page_processor(page_content, page_number) for pages start..stop-1.
+    The PDF is closed when the range is done, or when the caller stops iterating.
+
+    snapshots is the PDF's page_snapshots.PageSnapshots, None to parse every page. When replayed snapshots
+    cover the whole range, their routes are used and the pages are not fingerprinted again.
+    """
+    if router is None:
+        routes = itertools.repeat(None)
+    elif snapshots is not None and all(snapshots.exists(i) for i in range(start, stop)):
+        routes = (snapshots.load(i)["route"] for i in range(start, stop))
+    else:
+        routes = page_router.iter_page_routes(pdf_path, router, start, stop)
+    with instrumentation.stage("pdf_open"):
+        pdf_doc = pdfplumber.open(pdf_path)
+    with pdf_doc:
+        for i, route in zip(range(start, stop), routes):
+            snapshot = None
+            if snapshots is not None:
+                snapshot = snapshots.load(i)
+                stored_fields = len(snapshot)
+                if router is not None:
+                    snapshot["route"] = route
+            page_content = PageContent(pdf_doc.pages[i], template, route, snapshot)
+            with instrumentation.stage("page"):
+                page_records, page_error = page_processor(page_content, i + 1)
+            instrumentation.count("pages")
+            # only pages whose parser read something the snapshot did not hold are written again
+            if snapshot is not None and len(snapshot) > stored_fields:
+                snapshots.save(i, snapshot)
+            if BOUNDED_MEMORY:
+                page_content.release()
+            yield i + 1, page_records, page_error
+
+
+def process_page_range(pdf_path, page_processor, start, stop, template=None, router=None, snapshots=None):
+    return list(iter_page_range(pdf_path, page_processor, start, stop, template, router, snapshots))
+
+
+def page_ranges(page_count, workers):
+    range_count = min(page_count, workers * RANGES_PER_WORKER)
+    size = math.ceil(page_count / range_count) if range_count else 0
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size or 1)]
+
+
+def count_pages(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf_doc:
+        return len(pdf_doc.pages)
+
+
+def iter_page_results(pdf_path, page_processor, workers=None, template=None, router=None, snapshot_mode=None):
+    """
+    Yields (page_number, page_records, page_error) for every page of the PDF, in page order.
+
+    With more than one worker the pages are split into ranges and each range is parsed by a separate process,
+    which opens the PDF itself. The results are still yielded in page order. template is the vendor's
+    page_templates profile, used to crop table detection to the region the parser reads. router is a page_router
+    function that fingerprints each page first, so the parser can skip pages without extracting them.
+    snapshot_mode is a page_snapshots mode, PDF_PAGE_SNAPSHOTS when None.
+    """
+    workers = WORKERS if workers is None else workers
+    snapshots = page_snapshots.open_snapshots(pdf_path, template, router, snapshot_mode)
+    if workers <= 1:
+        yield from iter_page_range(pdf_path, page_processor, 0, count_pages(pdf_path), template, router, snapshots)
+        return
+    ranges = page_ranges(count_pages(pdf_path), workers)
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges) or 1)) as executor:
+        # each worker times its own stages, which are added to the document being measured here
+        futures = [executor.submit(instrumentation.collect, process_page_range, pdf_path, page_processor, start, stop,
+                                   template, router, snapshots)
+                   for start, stop in ranges]
+        for future in futures:
+            page_results, stages = future.result()
+            instrumentation.merge_snapshot(stages)
+            yield from page_results
+
+
+def iter_page_events(pdf_path, page_processor, workers=None, template=None, router=None, snapshot_mode=None):
+    """
+    Yields an ExtractionEvent for every record and page error as soon as its page is parsed, in page order.
+
+    An id number found again on a later page is yielded again, and that record replaces the earlier one.
+    """
+    page_results = iter_page_results(pdf_path, page_processor, workers, template, router, snapshot_mode)
+    for page_number, page_records, page_error in page_results:
+        for id_number, record in page_records.items():
+            yield ExtractionEvent(RECORD, id_number, record)
+        if page_error:
+            yield ExtractionEvent(PAGE_ERROR, page_number, page_error)
+
+
+def collect_events(events):
+    """Merges extraction events into the (extraction_info, page_errors) dicts that create_excel takes."""
+    extraction_info = dict()
+    page_errors = dict()
+    for event in events:
+        if event.kind == RECORD:
+            extraction_info[event.key] = event.value
+        else:
+            page_errors[event.key] = event.value
+    instrumentation.count("records", len(extraction_info))
+    instrumentation.count("page_errors", len(page_errors))
+    return extraction_info, page_errors
+
+
+def extract_pages(pdf_path, page_processor, workers=None, template=None, router=None, snapshot_mode=None):
+    """
+    Runs page_processor over every page and merges the results as the extractors always have: a later page
+    overwrites the record of an id number found on an earlier page.
+    """
+    return collect_events(iter_page_events(pdf_path, page_processor, workers, template, router, snapshot_mode))
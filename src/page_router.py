@@ -0,0 +1,81 @@
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+
+# routes for pages that no parser needs to see
+SKIP = "skip"
+NO_TABLES = "no tables"
+# rulings may sit in form XObjects nested any number of levels deep, and pdfplumber finds them there too
+FORM_DEPTH = 64
+
+
+class PageFingerprint:
+    """
+    Cheap signals of one page, read through pdfium: the raw page text and the number of path objects, which is
+    where table rulings come from. There is no layout analysis and no table finding, so a fingerprint costs a
+    few milliseconds where pdfplumber spends a hundred or more parsing the page.
+    """
+
+    def __init__(self, pdfium_page):
+        self.pdfium_page = pdfium_page
+        self._textpage = None
+        self._text = None
+        self._path_count = None
+
+    @property
+    def textpage(self):
+        if self._textpage is None:
+            self._textpage = self.pdfium_page.get_textpage()
+        return self._textpage
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.textpage.get_text_range()
+        return self._text
+
+    @property
+    def path_count(self):
+        if self._path_count is None:
+            self._path_count = sum(1 for _ in self.pdfium_page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH],
+                                                                          max_depth=FORM_DEPTH))
+        return self._path_count
+
+    def close(self):
+        if self._textpage is not None:
+            self._textpage.close()
+        self.pdfium_page.close()
+
+
+def route_centurion_text(text):
+    if "Centurion" in text and "Hendrik" not in text:
+        return "Centurion"
+    if "Hendrik" in text:
+        return "Hendrik"
+    return SKIP
+
+
+def route_centurion_page(fingerprint):
+    return route_centurion_text(fingerprint.text)
+
+
+def route_first_integrated_page(fingerprint):
+    # a page with rulings always goes to the table finder: pdfium lays text out unlike pdfplumber, so the table
+    # labels cannot be trusted to show in its text until a First Integrated report says otherwise
+    if not fingerprint.path_count:
+        return NO_TABLES
+    return "First Integrated"
+
+
+def iter_page_routes(pdf_source, page_router, start=0, stop=None):
+    """Yields the route of pages start..stop-1 of a PDF path or bytes."""
+    pdfium_doc = pdfium.PdfDocument(pdf_source)
+    try:
+        for i in range(start, len(pdfium_doc) if stop is None else stop):
+            fingerprint = PageFingerprint(pdfium_doc[i])
+            try:
+                yield page_router(fingerprint)
+            finally:
+                fingerprint.close()
+    finally:
+        pdfium_doc.close()
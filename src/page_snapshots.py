@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import pickle
+import pdfplumber
+import result_cache
+
+
+SNAPSHOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database",
+                                             "page_snapshots"))
+# off: pages are parsed as usual. record: pages are parsed and their text, tables and route are written to disk.
+# replay: pages are read from their snapshots, and only pages without one are parsed (and recorded).
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+MODE = os.environ.get("PDF_PAGE_SNAPSHOTS", OFF).lower()
+
+
+def settings_key(template=None, router=None):
+    """Digest of everything besides the PDF that shapes a page's text, tables and route."""
+    settings = {
+        "pdfplumber": pdfplumber.__version__,
+        "template": None if template is None else [template.name, list(template.page_size), list(template.bbox),
+                                                   template.columns, template.table_settings],
+        "router": None if router is None else router.__name__,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class PageSnapshots:
+    """
+    The page snapshots of one PDF under one set of table settings, a pickle per page index.
+
+    A snapshot is the dict a PageContent fills in: "text" and "tables" when the parser read them, and "route"
+    when the pages were routed. With replay set, load returns the stored snapshot; otherwise every page starts
+    from an empty one, which is then written over the stored one.
+    """
+
+    def __init__(self, directory, replay):
+        self.directory = directory
+        self.replay = replay
+
+    def path(self, page_index):
+        return os.path.join(self.directory, f"{page_index}.pickle")
+
+    def exists(self, page_index):
+        return self.replay and os.path.exists(self.path(page_index))
+
+    def load(self, page_index):
+        if self.exists(page_index):
+            with open(self.path(page_index), "rb") as snapshot_file:
+                return pickle.load(snapshot_file)
+        return dict()
+
+    def save(self, page_index, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = self.path(page_index) + ".tmp"
+        with open(temporary_path, "wb") as snapshot_file:
+            pickle.dump(snapshot, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.path(page_index))
+
+
+def open_snapshots(pdf_path, template=None, router=None, mode=None, directory=SNAPSHOT_DIR):
+    """Returns the PageSnapshots of the PDF keyed by its content hash and the table settings, or None when off."""
+    mode = MODE if mode is None else mode
+    if mode == OFF:
+        return None
+    if mode not in (RECORD, REPLAY):
+        raise ValueError(f"unknown page snapshot mode {mode!r}")
+    snapshot_dir = os.path.join(directory, result_cache.content_hash(pdf_path), settings_key(template, router))
+    return PageSnapshots(snapshot_dir, replay=mode == REPLAY)
@@ -1,17 +1,65 @@
 import sparrow_extraction
 import pdfplumber
+import pypdfium2 as pdfium
 import centurion_extraction
 import first_integrated
+import instrumentation
+import page_engine
+import result_cache
+
+
+KEYWORDS = ["Sparrows", "Centurion", "First Integrated"]
+# the vendor names appear within the first thousand characters of the sample reports; the limit leaves room for
+# reports with a longer header and still cuts off the rest of a dense first page
+CLASSIFY_CHAR_LIMIT = 4000
+# each vendor's record iterator and the client name its workbook is written with
+EXTRACTORS = {
+    "Sparrows": (sparrow_extraction.iter_sparrow_records, "Sparrows"),
+    "Centurion": (centurion_extraction.iter_centurion_records, "Centurion"),
+    "First Integrated": (first_integrated.iter_first_integrated_records, "First_Integrated"),
+}
 
 
 def pdf_to_text(pdf_path):
-    doc = pdfplumber.open(pdf_path)
-    text = ""
-    page = doc.pages[0]
-    text += page.extract_text()
+    with pdfplumber.open(pdf_path) as doc:
+        text = ""
+        page = doc.pages[0]
+        text += page.extract_text()
     return text
 
 
+def first_page_text(pdf_source, char_limit=CLASSIFY_CHAR_LIMIT):
+    """
+    Returns up to char_limit characters of the first page's text, read through pdfium. pdfium skips the layout
+    analysis pdfplumber does, so this takes milliseconds where pdf_to_text takes a good part of a second.
+    """
+    pdfium_doc = pdfium.PdfDocument(pdf_source)
+    try:
+        page = pdfium_doc[0]
+        try:
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_range(count=min(char_limit, textpage.count_chars()))
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+    finally:
+        pdfium_doc.close()
+
+
+def classify_text(text, keywords):
+    """
+    Returns (keyword, confidence). The keyword is the one search_keyword picks, and the confidence is its share
+    of all keyword mentions in the text: 1.0 when no other vendor is named, 0.0 when none is found.
+    """
+    keyword = search_keyword(text, keywords)
+    if keyword is None:
+        return None, 0.0
+    mentions = {candidate: text.lower().count(candidate.lower()) for candidate in keywords}
+    return keyword, mentions[keyword] / sum(mentions.values())
+
+
 def search_keyword(text, keywords):
     for keyword in keywords:
         if keyword.lower() in text.lower():
@@ -23,19 +71,36 @@ def is_empty(text):
     return not bool(text.strip())
 
 
+def extract_pdf(pdf_path, workers=None):
+    """
+    Classifies the PDF and runs its vendor's extractor through the result cache.
+
+    Returns (vendor, extraction_info, page_errors), with vendor None and empty dicts when the first page names
+    none of the KEYWORDS.
+    """
+    with instrumentation.stage("classify"):
+        text_content = first_page_text(pdf_path)
+        found_keyword = None if is_empty(text_content) else classify_text(text_content, KEYWORDS)[0]
+    if found_keyword is None:
+        return None, dict(), dict()
+    iter_records = EXTRACTORS[found_keyword][0]
+    extraction_info, page_errors = result_cache.cached_extraction(
+        pdf_path, found_keyword, lambda: page_engine.collect_events(iter_records(pdf_path, workers)))
+    return found_keyword, extraction_info, page_errors
+
+
 def main():
     try:
         pdf_path = "../resources/CenturionLoft.pdf"
         images_path = "../resources/images"
-        text_content = pdf_to_text(pdf_path)
-        keywords = ["Sparrows", "Centurion", "First Integrated"]
+        text_content = first_page_text(pdf_path)
 
         if is_empty(text_content):
             print(f"No text found")
 
         else:
-            found_keyword = search_keyword(text_content, keywords)
-            print(f"keyword found: {found_keyword}")
+            found_keyword, confidence = classify_text(text_content, KEYWORDS)
+            print(f"keyword found: {found_keyword}, confidence: {confidence:.2f}")
             if found_keyword and found_keyword == "Sparrows":
                 sparrow_extraction.extract_sparrow_pdf(pdf_path)
             elif found_keyword and found_keyword == "Centurion":
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+import instrumentation
+import manufacturer_catalog
+
+
+CACHE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database",
+                                          "result_cache"))
+# set PDF_RESULT_CACHE=off to always run the extractors
+ENABLED = os.environ.get("PDF_RESULT_CACHE", "on").lower() not in ("off", "0", "false")
+MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MAX_AGE_SECONDS = float(os.environ.get("RESULT_CACHE_MAX_AGE_SECONDS", str(30 * 24 * 3600)))
+
+# bump a vendor's version when its output changes for reasons the source and catalog digests cannot see
+EXTRACTOR_VERSIONS = {"Sparrows": 1, "Centurion": 1, "First Integrated": 1}
+# modules whose code shapes the extracted records, next to each vendor's own parser module
+SHARED_MODULES = ("page_engine.py", "page_content.py", "page_templates.py", "page_router.py",
+                  "manufacturer_catalog.py")
+VENDOR_MODULES = {"Sparrows": "sparrow_extraction.py", "Centurion": "centurion_extraction.py",
+                  "First Integrated": "first_integrated.py"}
+
+
+def content_hash(pdf_path):
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as pdf_file:
+        for block in iter(lambda: pdf_file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extractor_version(vendor):
+    """The vendor's version number plus a digest of the parser sources, so an edited parser never reads old results."""
+    digest = hashlib.sha256()
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in (VENDOR_MODULES[vendor],) + SHARED_MODULES:
+        with open(os.path.join(source_dir, module), "rb") as source_file:
+            digest.update(source_file.read())
+    return f"v{EXTRACTOR_VERSIONS[vendor]}-{digest.hexdigest()[:12]}"
+
+
+class LocalResultCache:
+    """
+    Extraction results on disk, one pickle per PDF content hash and extractor version.
+
+    Entries older than max_age_seconds are ignored and removed. When the directory grows past max_bytes the least
+    recently used entries are removed first; reading an entry refreshes its modification time.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES, max_age_seconds=MAX_AGE_SECONDS, clock=time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            if self.clock() - os.path.getmtime(path) > self.max_age_seconds:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "rb") as cache_file:
+                result = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        now = self.clock()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            # evicted by another process meanwhile
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        os.makedirs(self.directory, exist_ok=True)
+        # batch workers extracting copies of one PDF store the same key at the same time, so each writes a file
+        # of its own and the last replace wins
+        descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        with open(descriptor, "wb") as cache_file:
+            pickle.dump(result, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        now = self.clock()
+        os.utime(temporary_path, (now, now))
+        os.replace(temporary_path, self.path(key))
+        self.evict()
+
+    def evict(self):
+        entries = list()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".pickle"):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        now = self.clock()
+        total_bytes = 0
+        for modified, size, path in sorted(entries, reverse=True):
+            total_bytes += size
+            if now - modified > self.max_age_seconds or total_bytes > self.max_bytes:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+default_cache = LocalResultCache()
+
+
+def cached_extraction(pdf_path, vendor, extract, cache=None):
+    """
+    Returns (extraction_info, page_errors) for the PDF from the cache, or from extract() on a miss, which is then
+    stored. Identical PDFs hit the same entry whatever their file name. The key includes the manufacturer
+    catalog's sha256, since the catalog fills in the Manufacturer and Model columns, and a result extracted while
+    the catalog could not be loaded is not stored.
+    """
+    if not ENABLED and cache is None:
+        return extract()
+    cache = cache or default_cache
+    try:
+        catalog_digest = manufacturer_catalog.source_digest()
+    except OSError as e:
+        print(f"Manufacturer catalog not readable, extracting {pdf_path} without the result cache: {e}")
+        return extract()
+    key = f"{content_hash(pdf_path)}-{vendor.replace(' ', '_')}-{extractor_version(vendor)}-{catalog_digest[:12]}"
+    result = cache.get(key)
+    if result is not None:
+        instrumentation.count("result_cache_hits")
+        print(f"Using cached extraction of {pdf_path}")
+        return result
+    instrumentation.count("result_cache_misses")
+    try:
+        manufacturer_catalog.get_catalog()
+    except Exception as e:
+        print(f"Manufacturer catalog failed to load, the extraction of {pdf_path} is not cached: {e}")
+        return extract()
+    result = extract()
+    cache.put(key, result)
+    return result
@@ -1,34 +1,32 @@
 import re
-import pdfplumber
-from openpyxl import load_workbook
+import document_profiler
 import excel_management
+import instrumentation
+import manufacturer_catalog
+import page_engine
+import page_templates
+import result_cache
 
 
+@instrumentation.timed("catalog_lookup")
 def get_manufacture_model(description: str):
-    workbook = load_workbook("database/Full_list_of_Manufacturers_and_Models.xlsx")
-    manufacturer_sheet = workbook['Manufacture']
-    model_sheet = workbook['Model']
+    catalog = manufacturer_catalog.get_catalog()
     description_keywords = description.lower().split()
     manufacture, model = "", ""
-    for row in manufacturer_sheet.iter_rows(min_row=2, values_only=True):
-        keyword = row[0]
-        value = row[1]
-        if keyword and str(keyword).lower() in description_keywords:
-            manufacture = value
-            break
+    manufacturer_entry = catalog.find_manufacturer(description)
+    if manufacturer_entry:
+        manufacture = manufacturer_entry.value
     if str(manufacture).lower() == "miller" and "weblift" in description_keywords:
         manufacture = "Miller Weblift"
-    for row in model_sheet.iter_rows(min_row=2, values_only=True):
-        keyword = row[0]
-        value = row[1]
-        if keyword and str(keyword).lower() in description_keywords:
-            model = keyword
-            if not manufacture and value:
-                manufacture = value
-            break
+    model_entry = catalog.find_model(description)
+    if model_entry:
+        model = model_entry.keyword
+        if not manufacture and model_entry.value:
+            manufacture = model_entry.value
     return manufacture, model
 
 
+@instrumentation.timed("swl_parsing")
 def process_swl(swl: str):
     pattern = r'^(\d+(?:\.\d+)?)([a-zA-Z]+)?\s*(.*)$'
 
@@ -57,6 +55,7 @@ def process_swl(swl: str):
     return value_part, unit_part, note_part
 
 
+@instrumentation.timed("id_parsing")
 def get_identification_parts_list(input_string: str, quantity: int):
     numeric_part = ''.join(filter(str.isdigit, input_string))
     part_list = list()
@@ -71,6 +70,7 @@ def get_identification_parts_list(input_string: str, quantity: int):
     return part_list
 
 
+@instrumentation.timed("id_parsing")
 def get_identification_number_list(identification_numbers: str, quantity: int):
     #Take this as example (D971-1 to 6) or (MGL1 to MGL36)
     if "to" in identification_numbers.lower():
@@ -109,147 +109,156 @@ def get_identification_number_list(identification_numbers: str, quantity: int):
     return identification_number_list
 
 
-def extract_sparrow_pdf(pdf_path):
+def process_sparrow_page(page_content, page_number):
+    page_records = dict()
+    page_error = None
     try:
-        print("<------------extracting sparrow pdf------------>")
-        pdf_doc = pdfplumber.open(pdf_path)
-        extraction_info = dict()
-        page_errors = dict()
-        for i in range(0, len(pdf_doc.pages)):
-            try:
-                page = pdf_doc.pages[i]
-                table_extract = page.extract_tables()
-                if table_extract:
-                    print("page number:", i+1)
-                    page_tables = table_extract[0]
-                    table_data1 = page_tables[0][0].split('\n')
-                    table_data3 = page_tables[3]
-                    table_data4 = page_tables[4]
-                    identification_numbers = description = swl = quantity = None
-                    errors = list()
-                    for index in range(0, len(table_data3)):
-                        try:
-                            if table_data3[index] is None:
-                                continue
-                            text_to_compare = table_data3[index].lower()
-                            if not identification_numbers and "identification" in text_to_compare:
-                                identification_numbers = table_data4[index].strip()
-                            elif not description and "description" in text_to_compare:
-                                description = table_data4[index].replace('\n', ' ')
-                            elif not swl and "swl" in text_to_compare:
-                                swl = table_data4[index].strip()
-                            elif not quantity and "quantity" in text_to_compare:
-                                quantity = int(float(table_data4[index]))
-                        except Exception as e:
-                            print("Error extracting value from page:", e)
+        table_extract = page_content.tables
+        if table_extract:
+            print("page number:", page_number)
+            page_tables = table_extract[0]
+            table_data1 = page_tables[0][0].split('\n')
+            table_data3 = page_tables[3]
+            table_data4 = page_tables[4]
+            identification_numbers = description = swl = quantity = None
+            errors = list()
+            for index in range(0, len(table_data3)):
+                try:
+                    if table_data3[index] is None:
+                        continue
+                    text_to_compare = table_data3[index].lower()
+                    if not identification_numbers and "identification" in text_to_compare:
+                        identification_numbers = table_data4[index].strip()
+                    elif not description and "description" in text_to_compare:
+                        description = table_data4[index].replace('\n', ' ')
+                    elif not swl and "swl" in text_to_compare:
+                        swl = table_data4[index].strip()
+                    elif not quantity and "quantity" in text_to_compare:
+                        quantity = int(float(table_data4[index]))
+                except Exception as e:
+                    print("Error extracting value from page:", e)
 
-                    if identification_numbers:
-                        page_info = dict()
-                        # page_info["Id Number"] = table_data4[0].strip()
-                        if description:
-                            try:
-                                item_description = description
-                                if not item_description:
-                                    errors.append("Item Description not found")
-                                else:
-                                    page_info["Item Description"] = item_description
-                            except Exception as e:
-                                errors.append(e)
-                            try:
-                                manufacturer, model = get_manufacture_model(description)
-                                if not manufacturer:
-                                    errors.append("Manufacturer not found")
-                                else:
-                                    page_info["Manufacturer"] = manufacturer
-                                if not model:
-                                    errors.append("Model not found")
-                                else:
-                                    page_info["Model"] = model
-                            except Exception as e:
-                                errors.append(e)
+            if identification_numbers:
+                page_info = dict()
+                # page_info["Id Number"] = table_data4[0].strip()
+                if description:
+                    try:
+                        item_description = description
+                        if not item_description:
+                            errors.append("Item Description not found")
                         else:
-                            errors.append(
-                                "Description not found in the page. Item Description, Manufacturer, Model columns are left empty")
-                        # page_info["SWL"] = swl
-                        if swl:
-                            try:
-                                swl_value, swl_unit, swl_note = process_swl(swl)
-                                if not swl_value:
-                                    errors.append("SWL Value not found")
-                                else:
-                                    page_info[
-                                        "SWL Value"] = swl_value
-                                if not swl_unit:
-                                    errors.append("SWL Unit not found")
-                                else:
-                                    page_info["SWL Unit"] = swl_unit
-                                page_info["SWL Note"] = swl_note
-                            except Exception as e:
-                                errors.append(e)
+                            page_info["Item Description"] = item_description
+                    except Exception as e:
+                        errors.append(e)
+                    try:
+                        manufacturer, model = get_manufacture_model(description)
+                        if not manufacturer:
+                            errors.append("Manufacturer not found")
                         else:
-                            errors.append(
-                                "SWL not found in the page")
-                        # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
-
-                        table_data1_mapping = dict()
-                        for data in table_data1:
-                            try:
-                                data_list = data.split(':')
-                                key = data_list[0].lower().replace(" ", "").strip()
-                                value = data_list[-1].strip()
-                                table_data1_mapping[key] = value
-                            except Exception as e:
-                                print("Error extracting value from page:", e)
-
-                        if "reportnumber" not in table_data1_mapping:
-                            errors.append("Certificate no not found")
+                            page_info["Manufacturer"] = manufacturer
+                        if not model:
+                            errors.append("Model not found")
                         else:
-                            page_info["Certificate No"] = table_data1_mapping["reportnumber"]
-                        if "dateofthoroughexamination" not in table_data1_mapping:
-                            errors.append("Previous Inspection not found")
-                        else:
-                            page_info["Previous Inspection"] = table_data1_mapping["dateofthoroughexamination"]
-                        if "jobnumber" not in table_data1_mapping:
-                            errors.append("Provider Identification not found")
+                            page_info["Model"] = model
+                    except Exception as e:
+                        errors.append(e)
+                else:
+                    errors.append(
+                        "Description not found in the page. Item Description, Manufacturer, Model columns are left empty")
+                # page_info["SWL"] = swl
+                if swl:
+                    try:
+                        swl_value, swl_unit, swl_note = process_swl(swl)
+                        if not swl_value:
+                            errors.append("SWL Value not found")
                         else:
-                            page_info["Provider Identification"] = "LOFT-" + table_data1_mapping["jobnumber"]
-                        if "duedateofnextthoroughexamination" not in table_data1_mapping:
-                            errors.append("Next Inspection Due Date not found")
+                            page_info[
+                                "SWL Value"] = swl_value
+                        if not swl_unit:
+                            errors.append("SWL Unit not found")
                         else:
-                            page_info["Next Inspection Due Date"] = table_data1_mapping["duedateofnextthoroughexamination"]
+                            page_info["SWL Unit"] = swl_unit
+                        page_info["SWL Note"] = swl_note
+                    except Exception as e:
+                        errors.append(e)
+                else:
+                    errors.append(
+                        "SWL not found in the page")
+                # report_number, date_of_examination, job_number, next_date_of__examination = None, None, None, None
 
-                        try:
-                            if quantity > 1:
-                                identification_number_list = get_identification_number_list(identification_numbers,
-                                                                                            quantity)
-                            else:
-                                identification_number_list = list()
-                                identification_number_list.append(identification_numbers)
-                            if errors:
-                                errors.append("page no: "+str(i+1))
-                                page_info["Errors"] = str(errors)
-                                # print(identification_numbers, errors)
-                            for identification_number in identification_number_list:
-                                extraction_info[identification_number] = page_info
-                        except Exception as e:
-                            errors.append(
-                                "Error in extracting identification numbers. So, appending the identification number as found in the page")
-                            errors.append("page no: " +str(i+1))
-                            print("Error in extracting identification numbers. So, appending the identification number as found in the page")
-                            page_info["Errors"] = str(errors)
-                            extraction_info[identification_numbers] = page_info
-                        # print(identification_numbers, page_info)
-                    else:
-                        page_errors[i+1] = "No identification numbers are found in the page. So, the page is not processed."
-                        print("No identification number found")
+                table_data1_mapping = dict()
+                for data in table_data1:
+                    try:
+                        data_list = data.split(':')
+                        key = data_list[0].lower().replace(" ", "").strip()
+                        value = data_list[-1].strip()
+                        table_data1_mapping[key] = value
+                    except Exception as e:
+                        print("Error extracting value from page:", e)
+
+                if "reportnumber" not in table_data1_mapping:
+                    errors.append("Certificate no not found")
+                else:
+                    page_info["Certificate No"] = table_data1_mapping["reportnumber"]
+                if "dateofthoroughexamination" not in table_data1_mapping:
+                    errors.append("Previous Inspection not found")
+                else:
+                    page_info["Previous Inspection"] = table_data1_mapping["dateofthoroughexamination"]
+                if "jobnumber" not in table_data1_mapping:
+                    errors.append("Provider Identification not found")
                 else:
-                    page_errors[i+1] = "No text found on page. probably it's an image. So, the page is not processed."
-            except Exception as e:
-                page_errors[i+1] = "Error" + str(e) + " occurred while processing the page:"
-                print("Error", {e}, " occurred while processing the page:", i)
+                    page_info["Provider Identification"] = "LOFT-" + table_data1_mapping["jobnumber"]
+                if "duedateofnextthoroughexamination" not in table_data1_mapping:
+                    errors.append("Next Inspection Due Date not found")
+                else:
+                    page_info["Next Inspection Due Date"] = table_data1_mapping["duedateofnextthoroughexamination"]
+
+                try:
+                    if quantity > 1:
+                        identification_number_list = get_identification_number_list(identification_numbers,
+                                                                                    quantity)
+                    else:
+                        identification_number_list = list()
+                        identification_number_list.append(identification_numbers)
+                    if errors:
+                        errors.append("page no: "+str(page_number))
+                        page_info["Errors"] = str(errors)
+                        # print(identification_numbers, errors)
+                    for identification_number in identification_number_list:
+                        page_records[identification_number] = page_info
+                except Exception as e:
+                    errors.append(
+                        "Error in extracting identification numbers. So, appending the identification number as found in the page")
+                    errors.append("page no: " +str(page_number))
+                    print("Error in extracting identification numbers. So, appending the identification number as found in the page")
+                    page_info["Errors"] = str(errors)
+                    page_records[identification_numbers] = page_info
+                # print(identification_numbers, page_info)
+            else:
+                page_error = "No identification numbers are found in the page. So, the page is not processed."
+                print("No identification number found")
+        else:
+            page_error = "No text found on page. probably it's an image. So, the page is not processed."
+    except Exception as e:
+        page_error = "Error" + str(e) + " occurred while processing the page:"
+        print("Error", {e}, " occurred while processing the page:", page_number - 1)
+    return page_records, page_error
 
-        print(len(extraction_info.keys()), page_errors.keys())
-        excel_management.create_excel(extraction_info, "database/Sparrows.xlsx", "Sparrows", page_errors)
+
+def iter_sparrow_records(pdf_path, workers=None, snapshot_mode=None):
+    """Yields a page_engine.ExtractionEvent for each record and page error of a Sparrows PDF, page by page."""
+    return page_engine.iter_page_events(pdf_path, process_sparrow_page, workers, page_templates.TEMPLATES["Sparrows"],
+                                        snapshot_mode=snapshot_mode)
+
+
+def extract_sparrow_pdf(pdf_path, workers=None):
+    try:
+        print("<------------extracting sparrow pdf------------>")
+        with instrumentation.document(pdf_path, vendor="Sparrows"), document_profiler.profile_document(pdf_path):
+            extraction_info, page_errors = result_cache.cached_extraction(
+                pdf_path, "Sparrows", lambda: page_engine.collect_events(iter_sparrow_records(pdf_path, workers)))
+            print(len(extraction_info.keys()), page_errors.keys())
+            excel_management.create_excel(extraction_info, "database/Sparrows.xlsx", "Sparrows", page_errors)
     except Exception as e:
         print("An error occurred:", e)
 
@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import openpyxl
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+from batch_processing import find_pdfs, output_names, run_batch
+
+
+class TestBatchProcessing(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, "in", "nested"))
+        shutil.copyfile("resources/sparrows.pdf", os.path.join(self.directory, "in", "sparrows.pdf"))
+        shutil.copyfile("resources/sparrows.pdf", os.path.join(self.directory, "in", "nested", "Sparrows.pdf"))
+        with open(os.path.join(self.directory, "in", "notes.txt"), "w") as notes:
+            notes.write("not a pdf")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_inputs_are_expanded_once(self):
+        input_dir = os.path.join(self.directory, "in")
+        pdf_paths = find_pdfs([input_dir, os.path.join(input_dir, "*.pdf"), os.path.join(input_dir, "notes.txt"),
+                               "resources/centurion.pdf", os.path.join(self.directory, "missing*.pdf")])
+        self.assertEqual([os.path.join(input_dir, "nested", "Sparrows.pdf"), os.path.join(input_dir, "sparrows.pdf"),
+                          os.path.abspath("resources/centurion.pdf")], pdf_paths)
+
+    def test_workbook_names_do_not_collide(self):
+        names = output_names(["/a/sparrows.pdf", "/b/Sparrows.pdf", "/c/centurion.pdf"], "/out")
+        self.assertEqual(["/out/sparrows.xlsx", "/out/Sparrows-2.xlsx", "/out/centurion.xlsx"], list(names.values()))
+
+    def test_combined_workbook_keeps_input_order(self):
+        pdf_paths = find_pdfs([os.path.join(self.directory, "in")]) + [os.path.abspath("README.md")]
+        combined = os.path.join(self.directory, "out", "combined.xlsx")
+        summaries, elapsed = run_batch(pdf_paths, workers=2, combined=combined)
+
+        self.assertEqual(pdf_paths, [summary["pdf"] for summary in summaries])
+        self.assertEqual(["Sparrows", "Sparrows", None], [summary["vendor"] for summary in summaries])
+        self.assertEqual([60, 60], [summary["pages"] for summary in summaries[:2]])
+        self.assertIsNotNone(summaries[2]["error"])
+        self.assertGreater(elapsed, 0)
+
+        workbook = openpyxl.load_workbook(combined, read_only=True)
+        self.assertEqual("Sparrows", workbook["Extraction Data"]["B1"].value)
+        rows = list(workbook["Extraction Data"].iter_rows(min_row=3, values_only=True))
+        self.assertEqual(2 * summaries[0]["records"], len(rows))
+        error_labels = [row[0] for row in workbook["Errors"].iter_rows(min_row=2, values_only=True)]
+        self.assertTrue(error_labels[0].startswith("Sparrows.pdf page "))
+        self.assertTrue(error_labels[-1].startswith("sparrows.pdf page "))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+from catalog_cache import CatalogCache, CATALOG_BUCKET, CATALOG_KEY, ARTIFACT_KEY
+from local_s3 import FakeClock, LocalS3
+from manufacturer_catalog import CATALOG_PATH, build_artifact
+
+
+class TestCatalogCache(unittest.TestCase):
+    def setUp(self):
+        self.s3 = LocalS3()
+        with open(CATALOG_PATH, 'rb') as f:
+            self.workbook = f.read()
+        self.s3.put_object(Bucket=CATALOG_BUCKET, Key=CATALOG_KEY, Body=self.workbook)
+        self.clock = FakeClock()
+
+    def put_artifact(self):
+        artifact_path = os.path.join(current_directory, 'catalog_cache_test.json.gz')
+        try:
+            build_artifact(CATALOG_PATH, artifact_path)
+            with open(artifact_path, 'rb') as f:
+                self.s3.put_object(Bucket=CATALOG_BUCKET, Key=ARTIFACT_KEY, Body=f.read())
+        finally:
+            os.remove(artifact_path)
+
+    def test_downloads_once_per_invocation(self):
+        cache = CatalogCache(self.s3, clock=self.clock)
+        cache.start_invocation()
+        for _ in range(50):
+            self.assertEqual("TCB14", cache.get().find_model("CHAINBLOCK 1T 3M TIGER TCB14").keyword)
+        self.assertEqual(1, self.s3.count('head_object'))
+        self.assertEqual(1, cache.downloads)
+
+    def test_warm_invocation_revalidates_with_etag(self):
+        cache = CatalogCache(self.s3, clock=self.clock)
+        cache.start_invocation()
+        catalog = cache.get()
+        cache.start_invocation()
+        self.assertIs(catalog, cache.get())
+        cache.get()
+        self.assertEqual(2, self.s3.count('head_object'))
+        self.assertEqual(1, cache.downloads)
+        self.assertEqual(1, cache.not_modified)
+
+    def test_ttl_limits_revalidation(self):
+        cache = CatalogCache(self.s3, revalidate_seconds=60, clock=self.clock)
+        cache.get()
+        cache.start_invocation()
+        cache.get()
+        self.assertEqual(1, self.s3.count('head_object'))
+        self.clock.now = 61
+        cache.get()
+        self.assertEqual(2, self.s3.count('head_object'))
+
+    def test_changed_workbook_is_reloaded(self):
+        cache = CatalogCache(self.s3, clock=self.clock)
+        catalog = cache.get()
+        self.s3.put_object(Bucket=CATALOG_BUCKET, Key=CATALOG_KEY, Body=self.workbook + b'\0')
+        cache.start_invocation()
+        self.assertIsNot(catalog, cache.get())
+        self.assertEqual(2, cache.downloads)
+
+    def test_artifact_used_when_hash_matches(self):
+        self.put_artifact()
+        cache = CatalogCache(self.s3, clock=self.clock)
+        self.assertEqual("TCB14", cache.get().find_model("CHAINBLOCK 1T 3M TIGER TCB14").keyword)
+        self.assertEqual(1, cache.artifact_loads)
+        self.assertEqual(0, cache.downloads)
+
+    def test_stale_artifact_falls_back_to_workbook(self):
+        self.put_artifact()
+        self.s3.put_object(Bucket=CATALOG_BUCKET, Key=CATALOG_KEY, Body=self.workbook + b'\0')
+        cache = CatalogCache(self.s3, clock=self.clock)
+        cache.get()
+        self.assertEqual(0, cache.artifact_loads)
+        self.assertEqual(1, cache.downloads)
+
+    def test_failed_load_is_reported_for_the_invocation(self):
+        self.s3.delete_object(Bucket=CATALOG_BUCKET, Key=CATALOG_KEY)
+        cache = CatalogCache(self.s3, clock=self.clock)
+        cache.start_invocation()
+        with self.assertRaises(Exception):
+            cache.get()
+        self.assertTrue(cache.failed)
+        self.s3.put_object(Bucket=CATALOG_BUCKET, Key=CATALOG_KEY, Body=self.workbook)
+        cache.start_invocation()
+        self.assertFalse(cache.failed)
+        cache.get()
+        self.assertFalse(cache.failed)
+        self.assertEqual(cache.etag, self.s3.head_object(Bucket=CATALOG_BUCKET, Key=CATALOG_KEY)['ETag'])
+
+    def test_unreadable_artifact_falls_back_to_workbook(self):
+        # an artifact in the old pickle format is never unpickled
+        self.s3.put_object(Bucket=CATALOG_BUCKET, Key=ARTIFACT_KEY, Body=b'\x80\x04\x95\x00')
+        cache = CatalogCache(self.s3, clock=self.clock)
+        self.assertEqual("TCB14", cache.get().find_model("CHAINBLOCK 1T 3M TIGER TCB14").keyword)
+        self.assertEqual(0, cache.artifact_loads)
+        self.assertEqual(1, cache.downloads)
+
+
+if __name__ == '__main__':
+    unittest.main()
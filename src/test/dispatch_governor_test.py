@@ -0,0 +1,195 @@
+import unittest
+import sys
+import os
+import io
+import json
+import shutil
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from unittest import mock
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
+from dispatch_governor import (DispatchGovernor, FileStateStore, MemoryStateStore, S3StateStore, StateConflictError,
+                               parse_limits)
+from local_s3 import FakeClock, LocalS3
+
+
+class TestDispatchGovernor(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1_700_000_000.0)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def governor(self, store=None, **kwargs):
+        options = dict(limits={'sparrow_extraction': 2}, default_limit=5, rate=100.0, lease_seconds=60.0,
+                       clock=self.clock, sleep=self.clock.sleep)
+        options.update(kwargs)
+        return DispatchGovernor(MemoryStateStore() if store is None else store, **options)
+
+    def test_in_flight_extractions_are_capped_per_function(self):
+        governor = self.governor()
+        self.assertTrue(governor.acquire('sparrow_extraction', 0))
+        self.clock.now += 10
+        self.assertTrue(governor.acquire('sparrow_extraction', 0))
+        # the next slot is the first lease, 50 seconds from now
+        self.assertAlmostEqual(50.0, governor.try_acquire('sparrow_extraction', 'third'))
+        self.assertTrue(governor.acquire('centurion_extraction', 0))
+        # the whole timeout is waited before giving up
+        self.assertFalse(governor.acquire('sparrow_extraction', 30))
+        self.assertEqual([30.0], self.clock.sleeps)
+        self.assertTrue(governor.acquire('sparrow_extraction', 60))
+        self.assertEqual(2, len(self.clock.sleeps))
+        self.assertAlmostEqual(20.0, self.clock.sleeps[1])
+        self.assertEqual(2, governor.in_flight('sparrow_extraction'))
+
+    def test_dispatches_are_spaced_at_the_rate(self):
+        governor = self.governor(limits={}, default_limit=4, rate=2.0, lease_seconds=1.0)
+        start = self.clock.now
+        for _ in range(4):
+            self.assertTrue(governor.acquire('first_integrated', 0))
+        # the burst is spent, the rest go out two a second
+        for _ in range(10):
+            self.assertTrue(governor.acquire('first_integrated', 10))
+        self.assertAlmostEqual(5.0, self.clock.now - start)
+
+    def test_zero_limit_pauses_the_function(self):
+        governor = self.governor(limits={'sparrow_extraction': 0})
+        self.assertFalse(governor.acquire('sparrow_extraction', 120))
+        self.assertEqual(0, governor.in_flight('sparrow_extraction'))
+
+    def test_failed_dispatch_gives_its_slot_back(self):
+        governor = self.governor(rate=0.001)
+        first = governor.acquire('sparrow_extraction', 0)
+        governor.acquire('sparrow_extraction', 0)
+        governor.release('sparrow_extraction', first, return_token=True)
+        self.assertTrue(governor.acquire('sparrow_extraction', 0))
+        governor.release('centurion_extraction', first)
+
+    def test_finished_extraction_frees_its_slot(self):
+        governor = self.governor(rate=0.001)
+        leases = [governor.acquire('sparrow_extraction', 0) for _ in range(2)]
+        self.assertEqual(2, len(set(leases)))
+        # the extraction of the first lease finished; its slot is free but the rate still holds
+        governor.finished('sparrow_extraction', {'object_key': 'pack.pdf', 'lease_id': leases[0]})
+        governor.finished('sparrow_extraction', {'object_key': 'pack.pdf'})
+        self.assertEqual(1, governor.in_flight('sparrow_extraction'))
+        self.assertIsNone(governor.acquire('sparrow_extraction', 0))
+        self.clock.now += 1000
+        self.assertTrue(governor.acquire('sparrow_extraction', 0))
+        # a lease that cannot be released is left to expire
+        with mock.patch.object(governor.store, 'update', side_effect=StateConflictError('busy')):
+            governor.finished('sparrow_extraction', {'lease_id': leases[1]})
+
+    def test_file_state_is_shared(self):
+        path = os.path.join(self.directory, 'governor.json')
+        first = self.governor(FileStateStore(path))
+        second = self.governor(FileStateStore(path))
+        self.assertTrue(first.acquire('sparrow_extraction', 0))
+        self.assertTrue(second.acquire('sparrow_extraction', 0))
+        self.assertIsNone(first.acquire('sparrow_extraction', 0))
+        with open(path) as state_file:
+            self.assertEqual(2, len(json.load(state_file)['sparrow_extraction']['leases']))
+        # an unreadable file starts the state afresh
+        with open(path, 'w') as state_file:
+            state_file.write('{"sparrow_extr')
+        self.assertTrue(second.acquire('sparrow_extraction', 0))
+
+    def test_threads_never_exceed_the_limit(self):
+        governor = DispatchGovernor(FileStateStore(os.path.join(self.directory, 'governor.json')),
+                                    limits={'centurion_extraction': 3}, rate=1000.0)
+        granted = list()
+        threads = [threading.Thread(target=lambda: granted.append(governor.acquire('centurion_extraction', 0)))
+                   for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(3, sum(1 for lease in granted if lease))
+
+    def test_s3_state_is_shared_by_containers(self):
+        s3 = LocalS3()
+        first = self.governor(S3StateStore(lambda: s3, bucket='state-bucket', key='governor.json'))
+        second = self.governor(S3StateStore(lambda: s3, bucket='state-bucket', key='governor.json'))
+        lease = first.acquire('sparrow_extraction', 0)
+        self.assertTrue(second.acquire('sparrow_extraction', 0))
+        self.assertIsNone(first.acquire('sparrow_extraction', 0))
+        second.finished('sparrow_extraction', {'lease_id': lease})
+        self.assertEqual(1, first.in_flight('sparrow_extraction'))
+        state = json.loads(s3.objects[('state-bucket', 'governor.json')])
+        self.assertEqual(1, len(state['sparrow_extraction']['leases']))
+
+    def test_s3_state_updates_start_over_after_a_conflict(self):
+        s3 = LocalS3()
+        store = S3StateStore(lambda: s3, bucket='state-bucket', key='governor.json', attempts=3, sleep=lambda _: None)
+        governor = self.governor(store)
+        put_object = s3.put_object
+
+        def put_after_another_container(**kwargs):
+            # another container writes the state between every read and write of this one
+            put_object(Bucket='state-bucket', Key='governor.json', Body=json.dumps({'writes': s3.count('put_object')}))
+            return put_object(**kwargs)
+        with mock.patch.object(s3, 'put_object', put_after_another_container):
+            with self.assertRaises(StateConflictError):
+                store.update(lambda state: None)
+            # the governor keeps trying until its timeout, then does not dispatch
+            self.assertIsNone(governor.acquire('sparrow_extraction', 1))
+        self.assertEqual(0, governor.in_flight('sparrow_extraction'))
+        # one conflict is followed by a write of the state the other container left
+        conflicts = [True]
+
+        def put_once_after_another_container(**kwargs):
+            if conflicts:
+                put_object(Bucket='state-bucket', Key='governor.json', Body=json.dumps({'other': 1}))
+                conflicts.pop()
+            return put_object(**kwargs)
+        with mock.patch.object(s3, 'put_object', put_once_after_another_container):
+            self.assertTrue(governor.acquire('sparrow_extraction', 0))
+        self.assertEqual({'other', 'sparrow_extraction'},
+                         set(json.loads(s3.objects[('state-bucket', 'governor.json')])))
+
+    def test_threads_share_the_s3_state(self):
+        s3 = LocalS3()
+        governor = DispatchGovernor(S3StateStore(lambda: s3, bucket='state-bucket', key='governor.json'),
+                                    limits={'centurion_extraction': 3}, rate=1000.0)
+        granted = list()
+        threads = [threading.Thread(target=lambda: granted.append(governor.acquire('centurion_extraction', 0)))
+                   for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(3, sum(1 for lease in granted if lease))
+
+    def test_limits_from_the_environment(self):
+        self.assertEqual({'sparrow_extraction': 10, 'first_integrated': 4},
+                         parse_limits('sparrow_extraction=10, first_integrated=4,'))
+        self.assertEqual({}, parse_limits(''))
+
+
+class TestExtractionLeases(unittest.TestCase):
+    def test_extraction_functions_release_their_lease(self):
+        import importlib
+        from catalog_cache import CatalogCache
+        for module_name, function_name in (('lambda_sparrow_extraction', 'sparrow_extraction'),
+                                           ('lambda_centurion&hendrik_extraction', 'centurion_extraction'),
+                                           ('lambda_first_integrated', 'first_integrated')):
+            module = importlib.import_module(module_name)
+            s3 = LocalS3()
+            governor = DispatchGovernor(MemoryStateStore(), limits={}, default_limit=1, rate=0.001)
+            lease = governor.acquire(function_name, 0)
+            event = {'source_bucket': 'pdf-in-bucket', 'object_key': 'missing.pdf', 'lease_id': lease}
+            with mock.patch.multiple(module, s3=s3, catalog_cache=CatalogCache(s3), governor=governor), \
+                    redirect_stdout(io.StringIO()):
+                # the extraction fails, the lease is released all the same
+                module.lambda_handler(event, None)
+            self.assertEqual(0, governor.in_flight(function_name), module_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+import io
+import pstats
+import shutil
+import tempfile
+from unittest import mock
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+import document_profiler
+from document_profiler import profile_document
+from local_s3 import LocalS3
+
+
+def build_rows(count):
+    return [{"Id Number": f"SB-{i:05d}", "Item Description": "Shackle " * 4} for i in range(count)]
+
+
+class TestDocumentProfiler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def profile_files(self):
+        return sorted(os.path.join(root, name) for root, _, names in os.walk(self.directory) for name in names)
+
+    def test_unsampled_documents_are_not_profiled(self):
+        with profile_document("resources/sparrows.pdf", rate=0, destination=self.directory) as profiler:
+            build_rows(10)
+        self.assertIsNone(profiler)
+        with mock.patch.object(document_profiler.random, "random", return_value=0.2):
+            with profile_document("resources/sparrows.pdf", rate=0.1, destination=self.directory) as profiler:
+                build_rows(10)
+        self.assertIsNone(profiler)
+        self.assertEqual([], self.profile_files())
+
+    def test_sampled_document_writes_stats_and_allocations(self):
+        with mock.patch.object(document_profiler.random, "random", return_value=0.05):
+            with profile_document("/in/Sparrows pack.pdf", rate=0.1, destination=self.directory) as profiler:
+                build_rows(5000)
+                # a nested run is left to the outer profiler
+                with profile_document("inner.pdf", rate=1, destination=self.directory) as inner:
+                    build_rows(10)
+        self.assertIsNotNone(profiler)
+        self.assertIsNone(inner)
+
+        files = self.profile_files()
+        self.assertEqual(3, len(files))
+        self.assertTrue(all(os.path.dirname(path) == os.path.join(self.directory, "Sparrows_pack") for path in files))
+        stats_path = next(path for path in files if path.endswith(".pstats"))
+        functions = [function for _, _, function in pstats.Stats(stats_path, stream=io.StringIO()).stats]
+        self.assertIn("build_rows", functions)
+        with open(next(path for path in files if path.endswith("-allocations.txt"))) as allocations:
+            report = allocations.read()
+        self.assertTrue(report.startswith("Peak traced memory"))
+        self.assertIn("document_profiler_test.py", report)
+
+    def test_lambda_profiles_go_to_s3(self):
+        s3 = LocalS3()
+        with profile_document("incoming/centurion.pdf", rate=1, destination="s3://profile-bucket/profiles",
+                              s3_client=s3, trace_memory=False):
+            build_rows(10)
+        keys = sorted(key for _, key in s3.objects)
+        self.assertEqual(2, len(keys))
+        self.assertTrue(all(key.startswith("profiles/centurion/") for key in keys))
+        self.assertTrue(keys[0].endswith("-profile.txt") and keys[1].endswith(".pstats"))
+
+
+if __name__ == '__main__':
+    unittest.main()
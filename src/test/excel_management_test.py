@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+import tempfile
+import openpyxl
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+from excel_management import create_excel, column_mapping
+
+RECORDS = {
+    "SB-001": {"Item Description": "Chain Block 1T", "Manufacturer": "Tiger", "SWL Value": "1", "SWL Unit": "TE",
+               "Unknown Field": "not written"},
+    "SB-002": {"Id Number": "SB-002/A", "Errors": "['Model not found']"},
+    "SB-003": {},
+}
+PAGE_ERRORS = {4: "No recognized table found on page 4", 9: "Error occurred on page 9"}
+
+
+def sheet_values(sheet):
+    return [[cell.value for cell in row] for row in sheet.iter_rows()]
+
+
+class TestExcelManagement(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, extracted_data, page_errors, write_only):
+        filename = os.path.join(self.directory.name, name)
+        create_excel(extracted_data, filename, "Sparrows", page_errors, write_only=write_only)
+        return openpyxl.load_workbook(filename)
+
+    def test_write_only_matches_in_memory_writer(self):
+        in_memory = self.write("in_memory.xlsx", RECORDS, PAGE_ERRORS, write_only=False)
+        write_only = self.write("write_only.xlsx", RECORDS, PAGE_ERRORS, write_only=True)
+        self.assertEqual(in_memory.sheetnames, write_only.sheetnames)
+        for name in in_memory.sheetnames:
+            self.assertEqual(sheet_values(in_memory[name]), sheet_values(write_only[name]))
+        sheet = write_only["Extraction Data"]
+        self.assertEqual(["Rig-Ware import v2", "Sparrows", "CreateLocations=No"], sheet_values(sheet)[0][:3])
+        self.assertEqual("SB-002/A", sheet["A4"].value)
+        for header, column in column_mapping.items():
+            self.assertTrue(sheet[column + "2"].font.b)
+            self.assertEqual(in_memory["Extraction Data"].column_dimensions[column].width,
+                             sheet.column_dimensions[column].width)
+
+    def test_accepts_record_iterators(self):
+        from_dict = self.write("from_dict.xlsx", RECORDS, PAGE_ERRORS, write_only=True)
+        from_iterator = self.write("from_iterator.xlsx", iter(RECORDS.items()), iter(PAGE_ERRORS.items()),
+                                   write_only=True)
+        for name in from_dict.sheetnames:
+            self.assertEqual(sheet_values(from_dict[name]), sheet_values(from_iterator[name]))
+
+
+if __name__ == '__main__':
+    unittest.main()
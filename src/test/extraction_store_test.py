@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import json
+from io import BytesIO
+import openpyxl
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+from extraction_store import encode_extraction, put_extraction, StoredExtraction, EXTRACTION_BUCKET
+from local_s3 import LocalS3
+
+
+def pack_records():
+    # two packs whose records are shared by several id numbers, with a later page overwriting one id
+    first_pack = {"Item Description": "Shackle 4.75t", "Manufacturer": "Crosby", "SWL Value": "4.75"}
+    second_pack = {"Item Description": "Chain Block 1T", "Manufacturer": "Tiger", "SWL Value": "1"}
+    extracted_data = {f"SB-{i:03d}": first_pack for i in range(1, 6)}
+    extracted_data.update({f"CB-{i:03d}": second_pack for i in range(1, 4)})
+    extracted_data["SB-003"] = second_pack
+    return extracted_data
+
+
+class TestExtractionStore(unittest.TestCase):
+    def test_round_trip_keeps_rows_and_order(self):
+        extracted_data = pack_records()
+        page_errors = {4: "No recognized table found on page 4"}
+        stored = StoredExtraction(BytesIO(encode_extraction(extracted_data, page_errors, "Sparrows", "pack.xlsx")))
+        self.assertEqual(("Sparrows", "pack.xlsx"), (stored.client, stored.filename))
+        self.assertEqual({"4": "No recognized table found on page 4"}, stored.page_errors)
+        self.assertEqual(list(extracted_data.items()), list(stored.rows()))
+
+    def test_records_are_stored_once(self):
+        extracted_data = {f"SB-{i:05d}": {"Item Description": "Shackle " * 20} for i in range(2000)}
+        shared = dict(next(iter(extracted_data.values())))
+        extracted_data = {id_number: shared for id_number in extracted_data}
+        encoded = encode_extraction(extracted_data, {}, "Sparrows", "pack.xlsx")
+        legacy_payload = json.dumps({"extracted_data": extracted_data, "page_errors": {}})
+        self.assertLess(len(encoded) * 20, len(legacy_payload))
+
+    def test_excel_lambda_streams_the_stored_extraction(self):
+        import lambda_excel_management
+        s3 = LocalS3()
+        lambda_excel_management.s3 = s3
+        extracted_data = pack_records()
+        pointer = put_extraction(s3, extracted_data, {4: "page error"}, "Sparrows", "pack.xlsx")
+        self.assertLess(len(json.dumps(pointer)), 200)
+        lambda_excel_management.lambda_handler(pointer, None)
+
+        workbook_key = [key for bucket, key in s3.objects if bucket == 'excel-extraction-data' and key.endswith('.xlsx')]
+        workbook = openpyxl.load_workbook(BytesIO(s3.objects[('excel-extraction-data', workbook_key[0])]))
+        rows = [[cell.value for cell in row] for row in workbook["Extraction Data"].iter_rows(min_row=3)]
+        self.assertEqual(list(extracted_data), [row[0] for row in rows])
+        self.assertEqual("Tiger", rows[2][8])
+        self.assertEqual([["Page No", "Error"], ["4", "page error"]],
+                         [[cell.value for cell in row] for row in workbook["Errors"].iter_rows()])
+        # the intermediate object is removed once the workbook is written
+        self.assertNotIn((EXTRACTION_BUCKET, pointer['extraction_key']), s3.objects)
+
+    def test_uploads_of_the_same_name_do_not_collide(self):
+        s3 = LocalS3()
+        first = put_extraction(s3, pack_records(), {}, "Sparrows", "pack.xlsx")
+        second = put_extraction(s3, {"SB-001": {"Item Description": "Shackle"}}, {}, "Sparrows", "pack.xlsx")
+        self.assertNotEqual(first['extraction_key'], second['extraction_key'])
+        self.assertTrue(first['extraction_key'].endswith('/pack.xlsx.jsonl.gz'))
+        self.assertIn((EXTRACTION_BUCKET, first['extraction_key']), s3.objects)
+
+
+if __name__ == '__main__':
+    unittest.main()
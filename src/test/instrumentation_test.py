@@ -0,0 +1,122 @@
+import unittest
+import sys
+import os
+import io
+import json
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from unittest import mock
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
+import instrumentation
+import page_engine
+from local_s3 import LocalS3
+
+
+def read_text(page_content, page_number):
+    return ({f"page {page_number}": len(page_content.text)}, None)
+
+
+@instrumentation.timed("lookup")
+def lookup(value):
+    return value * 2
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.metrics_file = os.path.join(self.directory, "metrics", "stage_metrics.jsonl")
+        patcher = mock.patch.object(instrumentation, "METRICS_FILE", self.metrics_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # tests run outside Lambda even when the variable is set around them
+        environment = mock.patch.dict(os.environ)
+        environment.start()
+        self.addCleanup(environment.stop)
+        os.environ.pop("AWS_LAMBDA_FUNCTION_NAME", None)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def records(self):
+        with open(self.metrics_file) as metrics_file:
+            return [json.loads(line) for line in metrics_file]
+
+    def test_stages_outside_a_document_record_nothing(self):
+        with instrumentation.stage("pdf_open"):
+            self.assertEqual(4, lookup(2))
+        instrumentation.count("pages")
+        self.assertFalse(instrumentation.measuring())
+        self.assertFalse(os.path.exists(self.metrics_file))
+
+    def test_document_appends_one_json_line(self):
+        for name in ("a.pdf", "b.pdf"):
+            with instrumentation.document(name, vendor="Sparrows"):
+                with instrumentation.stage("pdf_open"):
+                    lookup(1)
+                lookup(2)
+                instrumentation.count("pages", 3)
+                # a nested document is part of the outer one
+                with instrumentation.document("inner.pdf"):
+                    instrumentation.count("pages")
+        first, second = self.records()
+        self.assertEqual(("a.pdf", "Sparrows", "b.pdf"), (first["document"], first["vendor"], second["document"]))
+        self.assertEqual({"pdf_open", "lookup"}, set(first["stages"]))
+        self.assertEqual(2, first["stages"]["lookup"]["calls"])
+        self.assertEqual({"pages": 4}, first["counters"])
+        self.assertGreater(first["peak_rss_mb"], 0)
+        self.assertGreaterEqual(first["seconds"], first["stages"]["pdf_open"]["seconds"])
+
+    def test_lambda_prints_embedded_metric_format(self):
+        os.environ["AWS_LAMBDA_FUNCTION_NAME"] = "sparrow_extraction"
+        output = io.StringIO()
+        with redirect_stdout(output):
+            with instrumentation.document("incoming/a.pdf", vendor="Sparrows"):
+                lookup(1)
+                instrumentation.count("records", 12)
+        self.assertFalse(os.path.exists(self.metrics_file))
+        record = json.loads(output.getvalue())
+        directive = record["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual((instrumentation.NAMESPACE, [["FunctionName"]]),
+                         (directive["Namespace"], directive["Dimensions"]))
+        units = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+        self.assertEqual({"DocumentTime": "Milliseconds", "lookupTime": "Milliseconds", "lookupCalls": "Count",
+                          "records": "Count", "PeakRss": "Megabytes"}, units)
+        # every declared metric has its value at the top level
+        self.assertTrue(all(name in record for name in units))
+        self.assertEqual(("sparrow_extraction", "incoming/a.pdf", "Sparrows", 12),
+                         (record["FunctionName"], record["document"], record["vendor"], record["records"]))
+
+    def test_worker_stages_are_merged(self):
+        with instrumentation.document("sparrows.pdf"):
+            page_engine.extract_pages("resources/sparrows.pdf", read_text, workers=2, snapshot_mode="off")
+        record = self.records()[0]
+        self.assertEqual(60, record["stages"]["page"]["calls"])
+        self.assertEqual(60, record["stages"]["text"]["calls"])
+        self.assertEqual({"pages": 60, "records": 60, "page_errors": 0}, record["counters"])
+        # each page range opens the PDF in its worker
+        self.assertEqual(len(page_engine.page_ranges(60, 2)), record["stages"]["pdf_open"]["calls"])
+
+    def test_excel_lambda_times_its_stages(self):
+        import lambda_excel_management
+        from extraction_store import put_extraction
+        s3 = LocalS3()
+        lambda_excel_management.s3 = s3
+        pointer = put_extraction(s3, {"SB-001": {"Item Description": "Shackle"}}, {}, "Sparrows", "pack.xlsx")
+        os.environ["AWS_LAMBDA_FUNCTION_NAME"] = "excel_management"
+        output = io.StringIO()
+        with redirect_stdout(output):
+            lambda_excel_management.lambda_handler(pointer, None)
+        record = json.loads(output.getvalue().strip().splitlines()[-1])
+        self.assertEqual("pack.xlsx", record["document"])
+        for stage in ("s3_get", "excel_build", "s3_put"):
+            self.assertEqual(1, record[f"{stage}Calls"])
+
+
+if __name__ == '__main__':
+    unittest.main()
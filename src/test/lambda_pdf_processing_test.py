@@ -0,0 +1,214 @@
+import unittest
+import sys
+import os
+import io
+import threading
+import time
+from contextlib import redirect_stdout
+from unittest import mock
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
+import pypdfium2 as pdfium
+import lambda_pdf_processing
+import retry_policy
+from dispatch_governor import DispatchGovernor, MemoryStateStore
+from local_s3 import FakeLambdaClient, LocalS3
+from s3_result_cache import S3ResultCache
+
+BUCKET = 'pdf-in-bucket'
+
+
+class SlowS3(LocalS3):
+    """LocalS3 that takes a few milliseconds per request and notes how many requests were in flight at once."""
+
+    def __init__(self, latency=0.005):
+        super().__init__()
+        self.latency = latency
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.lock = threading.Lock()
+
+    def slow(self, operation, *args, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            return operation(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def head_object(self, *args, **kwargs):
+        return self.slow(super().head_object, *args, **kwargs)
+
+    def get_object(self, *args, **kwargs):
+        return self.slow(super().get_object, *args, **kwargs)
+
+
+class FakeContext:
+    function_name = 'pdf_processing'
+
+    def __init__(self, remaining_seconds=900):
+        self.remaining_seconds = remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return int(self.remaining_seconds * 1000)
+
+
+def record(key, bucket=BUCKET):
+    return {'s3': {'bucket': {'name': bucket}, 'object': {'key': key}}}
+
+
+def blank_pdf():
+    document = pdfium.PdfDocument.new()
+    document.new_page(595, 842)
+    output = io.BytesIO()
+    document.save(output)
+    document.close()
+    return output.getvalue()
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.s3, self.lambda_client = SlowS3(), FakeLambdaClient()
+        self.governor = DispatchGovernor(MemoryStateStore(), limits={}, default_limit=10, rate=100.0)
+        for name, value in (('s3', self.s3), ('lambda_client', self.lambda_client),
+                            ('result_cache', S3ResultCache(self.s3)), ('governor', self.governor)):
+            patcher = mock.patch.object(lambda_pdf_processing, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # a policy of its own, so circuit breakers opened by one test stay closed in the next
+        self.invoke_policy = retry_policy.RetryPolicy(attempts=3, failure_threshold=5, sleep=lambda seconds: None)
+        patcher = mock.patch.object(retry_policy, 'INVOKE_POLICY', self.invoke_policy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for key, sample in (('sparrows.pdf', 'sparrows.pdf'), ('Centurion pack.pdf', 'centurion.pdf'),
+                            ('loft.pdf', 'CenturionLoft.pdf')):
+            with open(os.path.join('resources', sample), 'rb') as pdf_file:
+                self.s3.put_object(Bucket=BUCKET, Key=key, Body=pdf_file.read())
+        self.s3.put_object(Bucket=BUCKET, Key='blank.pdf', Body=blank_pdf())
+
+    def dispatch(self, event, context=None):
+        with redirect_stdout(io.StringIO()):
+            return lambda_pdf_processing.lambda_handler(event, context)
+
+    def test_every_record_is_dispatched(self):
+        event = {'Records': [record('sparrows.pdf'), record('Centurion+pack.pdf'), record('blank.pdf'),
+                             record('missing.pdf'), record('loft.pdf')]}
+        outcomes = self.dispatch(event)
+
+        self.assertEqual(['sparrows.pdf', 'Centurion pack.pdf', 'blank.pdf', 'missing.pdf', 'loft.pdf'],
+                         [outcome['key'] for outcome in outcomes])
+        self.assertEqual([('sparrow_extraction', 'dispatched'), ('centurion_extraction', 'dispatched'),
+                          (None, 'unclassified'), (None, 'error'), ('centurion_extraction', 'dispatched')],
+                         [(outcome['function'], outcome['status']) for outcome in outcomes])
+        self.assertIn('error', outcomes[3])
+        self.assertEqual({('sparrow_extraction', 'sparrows.pdf'), ('centurion_extraction', 'Centurion pack.pdf'),
+                          ('centurion_extraction', 'loft.pdf')},
+                         {(function, payload['object_key']) for function, payload in self.lambda_client.invocations})
+        # the unclassified PDF is archived, the dispatched ones are left for their extraction function
+        self.assertNotIn((BUCKET, 'blank.pdf'), self.s3.objects)
+        self.assertIn((BUCKET, 'sparrows.pdf'), self.s3.objects)
+        # the records' downloads overlap
+        self.assertGreater(self.s3.most_in_flight, 1)
+
+    def test_records_run_one_at_a_time_with_one_worker(self):
+        with mock.patch.object(lambda_pdf_processing, 'DISPATCH_WORKERS', 1):
+            outcomes = self.dispatch({'Records': [record('sparrows.pdf'), record('loft.pdf')]})
+        self.assertEqual(['dispatched', 'dispatched'], [outcome['status'] for outcome in outcomes])
+        self.assertEqual(1, self.s3.most_in_flight)
+
+    def test_failed_invocations_are_retried_per_record(self):
+        self.lambda_client.status_code = 500
+        outcomes = self.dispatch({'Records': [record('sparrows.pdf'), record('loft.pdf')]})
+        self.assertEqual(['failed', 'failed'], [outcome['status'] for outcome in outcomes])
+        # each record gets its own retries
+        self.assertEqual(2 * self.invoke_policy.attempts, len(self.lambda_client.invocations))
+        # the leases of the failed dispatches are given back
+        self.assertEqual(0, self.governor.in_flight('sparrow_extraction'))
+        self.assertFalse(any((BUCKET, key) in self.s3.objects for key in ('sparrows.pdf', 'loft.pdf')))
+
+    def test_throttled_function_fails_fast(self):
+        self.lambda_client.status_code = 429
+        self.invoke_policy.failure_threshold = 2
+        with mock.patch.object(lambda_pdf_processing, 'DISPATCH_WORKERS', 1):
+            outcomes = self.dispatch({'Records': [record('sparrows.pdf'), record('loft.pdf'),
+                                                  record('Centurion+pack.pdf')]})
+        self.assertEqual(['failed', 'failed', 'failed'], [outcome['status'] for outcome in outcomes])
+        # each function's circuit opens on its second failed invoke, so the third record is not sent at all
+        self.assertEqual([('sparrow_extraction', 2), ('centurion_extraction', 2)],
+                         [(function, sum(1 for name, _ in self.lambda_client.invocations if name == function))
+                          for function in ('sparrow_extraction', 'centurion_extraction')])
+
+    def test_records_past_the_limit_are_deferred(self):
+        self.governor.limits = {'centurion_extraction': 1}
+        event = {'Records': [record('loft.pdf'), record('Centurion+pack.pdf'), record('sparrows.pdf')]}
+        # 10 seconds left leave no time to wait for the slot
+        with mock.patch.object(lambda_pdf_processing, 'DISPATCH_WORKERS', 1):
+            outcomes = self.dispatch(event, FakeContext(remaining_seconds=10))
+        self.assertEqual(['dispatched', 'deferred', 'dispatched'], [outcome['status'] for outcome in outcomes])
+        self.assertEqual(['centurion_extraction', 'pdf_processing', 'sparrow_extraction'],
+                         [function for function, _ in self.lambda_client.invocations])
+        deferred_event = self.lambda_client.invocations[1][1]
+        deferred_record = dict(deferred_event['Records'][0])
+        self.assertAlmostEqual(time.time(), deferred_record.pop('deferred_at'), delta=60)
+        self.assertEqual(dict(record('Centurion+pack.pdf'), deferrals=1), deferred_record)
+        # the PDF waits in its bucket; deferred again it keeps its first deferral time
+        self.assertIn((BUCKET, 'Centurion pack.pdf'), self.s3.objects)
+        self.assertEqual('deferred', self.dispatch(deferred_event, FakeContext(remaining_seconds=10))[0]['status'])
+        redeferred_record = self.lambda_client.invocations[-1][1]['Records'][0]
+        self.assertEqual((2, deferred_event['Records'][0]['deferred_at']),
+                         (redeferred_record['deferrals'], redeferred_record['deferred_at']))
+        # it goes out, under a lease of its own, when the first extraction finishes and releases its lease
+        first_payload = self.lambda_client.invocations[0][1]
+        self.governor.finished('centurion_extraction', first_payload)
+        self.assertEqual('dispatched', self.dispatch(deferred_event, FakeContext(remaining_seconds=10))[0]['status'])
+        self.assertEqual(1, self.governor.in_flight('centurion_extraction'))
+        self.assertNotEqual(first_payload['lease_id'], self.lambda_client.invocations[-1][1]['lease_id'])
+
+    def test_records_are_never_dispatched_without_room(self):
+        self.governor.limits = {'centurion_extraction': 0}
+        # a record deferred for longer than DEFER_SECONDS is given up on
+        expired = dict(record('loft.pdf'), deferrals=30,
+                       deferred_at=time.time() - lambda_pdf_processing.DEFER_SECONDS - 1)
+        self.assertEqual('expired', self.dispatch({'Records': [expired]}, FakeContext(10))[0]['status'])
+        # without a context the record cannot be deferred
+        with mock.patch.object(lambda_pdf_processing, 'GOVERNOR_WAIT_SECONDS', 0.0):
+            self.assertEqual('failed', self.dispatch({'Records': [record('Centurion+pack.pdf')]})[0]['status'])
+        self.assertEqual([], self.lambda_client.invocations)
+        self.assertFalse(any((BUCKET, key) in self.s3.objects for key in ('loft.pdf', 'Centurion pack.pdf')))
+
+    def test_wait_doubles_with_each_deferral(self):
+        wait = lambda_pdf_processing.governor_wait_seconds
+        self.assertEqual([30.0, 60.0, 240.0, 300.0, 300.0],
+                         [wait(dict(record('a.pdf'), deferrals=n), FakeContext()) for n in (0, 1, 3, 4, 1000)])
+        # the invocation keeps WAIT_MARGIN_SECONDS for itself
+        self.assertEqual(90.0, wait(dict(record('a.pdf'), deferrals=4), FakeContext(remaining_seconds=100)))
+        self.assertEqual(0.0, wait(record('a.pdf'), FakeContext(remaining_seconds=5)))
+
+    def test_overwritten_pdf_is_classified_again(self):
+        get_object = self.s3.get_object
+        with open(os.path.join('resources', 'centurion.pdf'), 'rb') as pdf_file:
+            replacement = pdf_file.read()
+
+        def overwrite_after_first_get(*args, **kwargs):
+            response = get_object(*args, **kwargs)
+            if self.s3.count('get_object') == 1:
+                self.s3.put_object(Bucket=BUCKET, Key='sparrows.pdf', Body=replacement)
+            return response
+        with mock.patch.object(self.s3, 'get_object', overwrite_after_first_get):
+            outcome = self.dispatch({'Records': [record('sparrows.pdf')]})[0]
+        self.assertEqual(('centurion_extraction', 'dispatched'), (outcome['function'], outcome['status']))
+
+    def test_event_without_records(self):
+        self.assertEqual([], self.dispatch({}))
+        self.assertEqual([], self.dispatch({'Records': []}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Cold start of one module in lambda_functions/, run in a fresh interpreter by lambda_startup_test.
+
+Times the import of the module and, for a Lambda handler, its first invocation, and prints the times as JSON. The
+clients a handler creates on first use are created for real, as they would be in Lambda, and then swapped for
+LocalS3 and a fake Lambda client so the invocation stays offline. The PDFs and catalog artifact the handlers read
+are prepared by the test in the fixture directory.
+
+    python src/test/lambda_startup.py <module> <fixture directory>
+"""
+import importlib
+import io
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
+os.environ['PDF_METRICS'] = 'off'
+
+SOURCE_BUCKET = 'pdf-in-bucket'
+# the sample whose first pages each extraction function is invoked with
+EXTRACTORS = {
+    'lambda_sparrow_extraction': 'sparrows.pdf',
+    'lambda_centurion&hendrik_extraction': 'centurion.pdf',
+    # resources/ has no First Integrated report, so only the import of its function is timed
+    'lambda_first_integrated': None,
+}
+
+
+def put_file(s3, bucket, key, path):
+    with open(path, 'rb') as f:
+        s3.put_object(Bucket=bucket, Key=key, Body=f.read())
+
+
+def prepare(module, fixtures, s3, lambda_client):
+    """Points the module at the stand-ins and returns the event of its first invocation."""
+    module.s3 = s3
+    if hasattr(module, 'lambda_client'):
+        module.lambda_client = lambda_client
+    if getattr(module, 'result_cache', None) is not None:
+        from s3_result_cache import S3ResultCache
+        module.result_cache = S3ResultCache(s3)
+    if module.__name__ == 'lambda_pdf_processing':
+        put_file(s3, SOURCE_BUCKET, 'incoming.pdf', os.path.join(fixtures, 'sparrows.pdf'))
+        return {'Records': [{'s3': {'bucket': {'name': SOURCE_BUCKET}, 'object': {'key': 'incoming.pdf'}}}]}
+    if module.__name__ == 'lambda_excel_management':
+        from extraction_store import put_extraction
+        return put_extraction(s3, {"SB-001": {"Item Description": "Shackle"}}, {}, "Sparrows", "incoming.xlsx")
+    from catalog_cache import CatalogCache, CATALOG_BUCKET, CATALOG_KEY, ARTIFACT_KEY
+    put_file(s3, CATALOG_BUCKET, CATALOG_KEY, os.path.join(fixtures, 'catalog.xlsx'))
+    put_file(s3, CATALOG_BUCKET, ARTIFACT_KEY, os.path.join(fixtures, 'catalog.json.gz'))
+    module.catalog_cache = CatalogCache(s3)
+    put_file(s3, SOURCE_BUCKET, 'incoming.pdf', os.path.join(fixtures, EXTRACTORS[module.__name__]))
+    return {'source_bucket': SOURCE_BUCKET, 'object_key': 'incoming.pdf'}
+
+
+def handled(module, s3, lambda_client):
+    """Whether the invocation got as far as handing its result on; the handlers print their errors and return."""
+    if module.__name__ == 'lambda_excel_management':
+        return any(bucket == 'excel-extraction-data' for bucket, _ in s3.objects)
+    return bool(lambda_client.invocations)
+
+
+def main(module_name, fixtures):
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    timings = {'module': module_name, 'import_seconds': time.perf_counter() - start}
+    if not hasattr(module, 'lambda_handler') or EXTRACTORS.get(module_name, '') is None:
+        print(json.dumps(timings))
+        return 0
+
+    # clients the module leaves to its first invocation are part of that invocation's latency
+    start = time.perf_counter()
+    for accessor in ('get_s3', 'get_lambda_client'):
+        if hasattr(module, accessor):
+            getattr(module, accessor)()
+    client_seconds = time.perf_counter() - start
+
+    from local_s3 import FakeLambdaClient, LocalS3
+    s3, lambda_client = LocalS3(), FakeLambdaClient()
+    event = prepare(module, fixtures, s3, lambda_client)
+    output = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        module.lambda_handler(event, None)
+    timings['first_invocation_seconds'] = client_seconds + time.perf_counter() - start
+    timings['handled'] = handled(module, s3, lambda_client)
+    timings['output'] = output.getvalue()[-2000:]
+    print(json.dumps(timings))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1], sys.argv[2]))
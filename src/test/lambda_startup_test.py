@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import json
+import shutil
+import subprocess
+import tempfile
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+import pypdfium2 as pdfium
+from manufacturer_catalog import CATALOG_PATH, build_artifact
+
+LAMBDA_DIRECTORY = os.path.join(current_directory, 'lambda_functions')
+STARTUP_SCRIPT = os.path.join(current_directory, 'src', 'test', 'lambda_startup.py')
+# seconds each module of lambda_functions/ may take to import, and for a handler to import and serve its first
+# invocation, in a fresh interpreter; a new module needs an entry. The dispatcher's import budget is the one that
+# catches boto3 or a PDF library moving back to module level
+BUDGETS = {
+    'catalog_cache': (0.5, None),
+    'dispatch_governor': (0.3, None),
+    'document_profiler': (0.3, None),
+    'extraction_store': (0.3, None),
+    'instrumentation': (0.3, None),
+    'page_content': (0.3, None),
+    'pdf_archive': (0.3, None),
+    'retry_policy': (0.3, None),
+    'page_router': (0.3, None),
+    'page_templates': (0.3, None),
+    's3_range_file': (0.3, None),
+    's3_result_cache': (0.3, None),
+    'lambda_pdf_processing': (0.1, 1.5),
+    'lambda_excel_management': (1.5, 2.0),
+    'lambda_sparrow_extraction': (1.5, 3.0),
+    'lambda_centurion&hendrik_extraction': (1.5, 3.0),
+    'lambda_first_integrated': (1.5, None),
+}
+# slower machines can scale every budget, e.g. LAMBDA_STARTUP_BUDGET_SCALE=2
+SCALE = float(os.environ.get('LAMBDA_STARTUP_BUDGET_SCALE', '1'))
+
+
+def lambda_modules():
+    return sorted(name[:-len('.py')] for name in os.listdir(LAMBDA_DIRECTORY) if name.endswith('.py'))
+
+
+class TestLambdaStartup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fixtures = tempfile.mkdtemp()
+        for sample in ('sparrows.pdf', 'centurion.pdf'):
+            source = pdfium.PdfDocument(os.path.join(current_directory, 'resources', sample))
+            document = pdfium.PdfDocument.new()
+            document.import_pages(source, [0, 1, 2])
+            document.save(os.path.join(cls.fixtures, sample))
+            document.close()
+            source.close()
+        shutil.copyfile(CATALOG_PATH, os.path.join(cls.fixtures, 'catalog.xlsx'))
+        build_artifact(CATALOG_PATH, os.path.join(cls.fixtures, 'catalog.json.gz'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.fixtures)
+
+    def cold_start(self, module):
+        output = subprocess.run([sys.executable, STARTUP_SCRIPT, module, self.fixtures], capture_output=True,
+                                text=True, cwd=current_directory)
+        self.assertEqual(0, output.returncode, output.stderr)
+        return json.loads(output.stdout.strip().splitlines()[-1])
+
+    def test_every_module_has_a_budget(self):
+        self.assertEqual(sorted(BUDGETS), lambda_modules())
+
+    def test_startup_within_budget(self):
+        for module in lambda_modules():
+            import_budget, startup_budget = BUDGETS[module]
+            with self.subTest(module=module):
+                timings = self.cold_start(module)
+                self.assertLessEqual(timings['import_seconds'], import_budget * SCALE)
+                if startup_budget is not None:
+                    self.assertTrue(timings['handled'], timings['output'])
+                    self.assertLessEqual(timings['import_seconds'] + timings['first_invocation_seconds'],
+                                         startup_budget * SCALE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+from botocore.exceptions import ClientError
+
+
+class FakeClock:
+    """A clock for the clock and sleep parameters; sleeping moves it on at once and notes how long for."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.sleeps = list()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeLambdaClient:
+    """Notes each invoke as (function name, payload) and answers with status_code."""
+
+    def __init__(self, status_code=202):
+        self.invocations = list()
+        self.status_code = status_code
+        self.lock = threading.Lock()
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        with self.lock:
+            self.invocations.append((FunctionName, json.loads(Payload)))
+        return {'StatusCode': self.status_code}
+
+
+class LocalS3:
+    """In-memory stand-in for the parts of the boto3 S3 client the Lambda functions use."""
+
+    def __init__(self, clock=time.time):
+        self.objects = dict()
+        self.modified = dict()
+        self.clock = clock
+        self.calls = list()
+        self.bytes_sent = 0
+        self.uploads = dict()
+
+    def put_object(self, Bucket, Key, Body=b'', IfMatch=None, IfNoneMatch=None, **kwargs):
+        self.calls.append(('put_object', Bucket, Key))
+        if IfMatch is not None:
+            # like S3, a conditional write to a missing object is a 404
+            self._content(Bucket, Key)
+            self._check_match(self._etag(Bucket, Key), IfMatch, 'PutObject')
+        if IfNoneMatch == '*' and (Bucket, Key) in self.objects:
+            self._precondition_failed('PutObject')
+        if isinstance(Body, str):
+            Body = Body.encode()
+        elif hasattr(Body, 'read'):
+            Body = Body.read()
+        self.objects[(Bucket, Key)] = bytes(Body)
+        self.modified[(Bucket, Key)] = self.clock()
+        return {'ETag': self._etag(Bucket, Key)}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, IfMatch=None, Range=None, **kwargs):
+        self.calls.append(('get_object', Bucket, Key))
+        content = self._content(Bucket, Key)
+        etag = self._etag(Bucket, Key)
+        self._check_match(etag, IfMatch, 'GetObject')
+        self._check_not_modified(etag, IfNoneMatch, 'GetObject')
+        response = {'ETag': etag, 'ContentLength': len(content)}
+        if Range is not None:
+            start, end = Range.replace('bytes=', '').split('-')
+            start, end = int(start), min(int(end), len(content) - 1)
+            content = content[start:end + 1]
+            response['ContentRange'] = f"bytes {start}-{end}/{len(self._content(Bucket, Key))}"
+            response['ContentLength'] = len(content)
+        self.bytes_sent += len(content)
+        response['Body'] = BytesIO(content)
+        return response
+
+    def head_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self.calls.append(('head_object', Bucket, Key))
+        content = self._content(Bucket, Key)
+        self._check_not_modified(self._etag(Bucket, Key), IfNoneMatch, 'HeadObject')
+        return {'ETag': self._etag(Bucket, Key), 'ContentLength': len(content),
+                'LastModified': self._last_modified(Bucket, Key)}
+
+    def list_objects(self, Bucket, Prefix='', **kwargs):
+        self.calls.append(('list_objects', Bucket, Prefix))
+        contents = [{'Key': key, 'Size': len(body), 'LastModified': self._last_modified(bucket, key)}
+                    for (bucket, key), body in sorted(self.objects.items())
+                    if bucket == Bucket and key.startswith(Prefix)]
+        return {'Contents': contents} if contents else {}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self.calls.append(('copy_object', Bucket, Key))
+        content = self._content(CopySource['Bucket'], CopySource['Key'])
+        self.objects[(Bucket, Key)] = content
+        self.modified[(Bucket, Key)] = self.clock()
+        return {'CopyObjectResult': {'ETag': self._etag(Bucket, Key)}}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.calls.append(('create_multipart_upload', Bucket, Key))
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = dict()
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange, **kwargs):
+        self.calls.append(('upload_part_copy', Bucket, Key))
+        content = self._content(CopySource['Bucket'], CopySource['Key'])
+        start, end = CopySourceRange.replace('bytes=', '').split('-')
+        part = content[int(start):int(end) + 1]
+        self.uploads[UploadId][PartNumber] = part
+        return {'CopyPartResult': {'ETag': '"' + hashlib.md5(part).hexdigest() + '"'}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self.calls.append(('complete_multipart_upload', Bucket, Key))
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+        self.modified[(Bucket, Key)] = self.clock()
+        return {'ETag': self._etag(Bucket, Key)}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self.calls.append(('abort_multipart_upload', Bucket, Key))
+        self.uploads.pop(UploadId, None)
+        return {}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self.calls.append(('delete_object', Bucket, Key))
+        self.objects.pop((Bucket, Key), None)
+        self.modified.pop((Bucket, Key), None)
+        return {}
+
+    def count(self, operation):
+        return sum(1 for call in self.calls if call[0] == operation)
+
+    def _check_match(self, etag, if_match, operation):
+        if if_match is not None and if_match != etag:
+            self._precondition_failed(operation)
+
+    def _precondition_failed(self, operation):
+        raise ClientError({'Error': {'Code': 'PreconditionFailed', 'Message': 'Precondition Failed'},
+                           'ResponseMetadata': {'HTTPStatusCode': 412}}, operation)
+
+    def _check_not_modified(self, etag, if_none_match, operation):
+        if if_none_match is not None and if_none_match == etag:
+            raise ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'},
+                               'ResponseMetadata': {'HTTPStatusCode': 304}}, operation)
+
+    def _content(self, bucket, key):
+        if (bucket, key) not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'Not Found'},
+                               'ResponseMetadata': {'HTTPStatusCode': 404}}, 'GetObject')
+        return self.objects[(bucket, key)]
+
+    def _last_modified(self, bucket, key):
+        return datetime.fromtimestamp(self.modified[(bucket, key)], timezone.utc)
+
+    def _etag(self, bucket, key):
+        return '"' + hashlib.md5(self.objects[(bucket, key)]).hexdigest() + '"'
@@ -0,0 +1,68 @@
+import unittest
+import sys
+import os
+import gzip
+import json
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+import manufacturer_catalog
+from manufacturer_catalog import PhraseIndex, get_catalog, build_artifact, load_catalog, CATALOG_PATH
+
+
+class TestManufacturerCatalog(unittest.TestCase):
+    def test_first_match_follows_sheet_order(self):
+        index = PhraseIndex()
+        index.add("Tiger", "Tiger")
+        index.add("TCB14", "Tiger")
+        index.add("Tiger", "Duplicate Tiger")
+        entry = index.first_match("chain block tcb14 tiger".split())
+        self.assertEqual("Tiger", entry.keyword)
+        self.assertEqual("Tiger", entry.value)
+
+    def test_multi_word_keyword(self):
+        index = PhraseIndex()
+        index.add("Web", "Web")
+        index.add("Aberdeen Web Lift", "Aberdeen Web Lift")
+        self.assertEqual("Web", index.first_match("aberdeen web lift sling".split()).keyword)
+        index = PhraseIndex()
+        index.add("Aberdeen Web Lift", "Aberdeen Web Lift")
+        self.assertEqual("Aberdeen Web Lift", index.first_match("aberdeen web lift sling".split()).value)
+        self.assertIsNone(index.first_match("aberdeen lift web sling".split()))
+
+    def test_substring_match(self):
+        index = PhraseIndex()
+        index.add("TCB14", "Tiger")
+        self.assertEqual("TCB14", index.first_substring_match("CHAINBLOCK TIGER-TCB14").keyword)
+        self.assertIsNone(index.first_substring_match("CHAINBLOCK TIGER"))
+
+    def test_catalog_loaded_once(self):
+        manufacturer_catalog.clear_cache()
+        catalog = get_catalog()
+        self.assertIs(catalog, get_catalog())
+        self.assertEqual("TCB14", catalog.find_model("CHAINBLOCK 1T 3M TIGER TCB14").keyword)
+
+    def test_artifact_used_until_workbook_changes(self):
+        artifact_path = os.path.join(current_directory, 'manufacturer_catalog_test.json.gz')
+        workbook_path = os.path.join(current_directory, 'manufacturer_catalog_test.xlsx')
+        try:
+            with open(CATALOG_PATH, 'rb') as source, open(workbook_path, 'wb') as target:
+                target.write(source.read())
+            artifact = build_artifact(workbook_path, artifact_path)
+            self.assertEqual(load_catalog(workbook_path, artifact_path + ".missing").to_rows(),
+                             (artifact["manufacturers"], artifact["models"]))
+            # mark the artifact so the test can tell which source was loaded
+            artifact["models"] = [("MARKER", "Artifact")]
+            with gzip.open(artifact_path, 'wt') as f:
+                json.dump(artifact, f)
+            self.assertEqual([("MARKER", "Artifact")], load_catalog(workbook_path, artifact_path).to_rows()[1])
+            with open(workbook_path, 'ab') as target:
+                target.write(b'\0')
+            self.assertEqual(161, len(load_catalog(workbook_path, artifact_path).models))
+        finally:
+            for path in (artifact_path, workbook_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import sys
+import os
+from collections import Counter
+import pdfplumber
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+from page_content import PageContent
+from centurion_extraction import process_centurion_page
+from sparrow_extraction import process_sparrow_page
+
+
+def count_extractions(page, calls):
+    # replaces the page's extract methods with wrappers that count how often pdfplumber really ran them
+    for name in ("text", "tables"):
+        def counted(*args, _extract=getattr(page, f"extract_{name}"), _name=name, **kwargs):
+            calls[_name] += 1
+            return _extract(*args, **kwargs)
+        setattr(page, f"extract_{name}", counted)
+
+
+class TestPageContent(unittest.TestCase):
+    def assert_single_extraction(self, pdf_path, page_processor, page_limit=6):
+        with pdfplumber.open(pdf_path) as pdf_doc:
+            for page in pdf_doc.pages[:page_limit]:
+                calls = Counter()
+                count_extractions(page, calls)
+                page_content = PageContent(page)
+                page_processor(page_content, page.page_number)
+                self.assertLessEqual(max(calls.values(), default=0), 1)
+                self.assertEqual(calls, page_content.extraction_counts)
+
+    def test_content_is_memoized(self):
+        with pdfplumber.open("resources/centurion.pdf") as pdf_doc:
+            page = pdf_doc.pages[0]
+            calls = Counter()
+            count_extractions(page, calls)
+            page_content = PageContent(page)
+            self.assertIs(page_content.text, page_content.text)
+            self.assertIs(page_content.tables, page_content.tables)
+            self.assertEqual(Counter(text=1, tables=1), calls)
+
+    def test_centurion_extracts_each_page_once(self):
+        self.assert_single_extraction("resources/centurion.pdf", process_centurion_page)
+
+    def test_sparrow_extracts_each_page_once(self):
+        self.assert_single_extraction("resources/sparrows.pdf", process_sparrow_page)
+
+    def test_centurion_loft_extracts_each_page_once(self):
+        self.assert_single_extraction("resources/CenturionLoft.pdf", process_centurion_page)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import itertools
+import unittest
+import sys
+import os
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+from page_engine import extract_pages, page_ranges, iter_page_events, iter_page_results, collect_events, RECORD, \
+    PAGE_ERROR
+from sparrow_extraction import iter_sparrow_records, process_sparrow_page
+
+
+def page_size_processor(page_content, page_number):
+    # every page overwrites "last page" and every third page shares a key, like repeated id numbers in a pack
+    page_records = {f"group {page_number % 3}": {"page": page_number}, "last page": {"page": page_number}}
+    page_error = f"odd page {page_number}" if page_number % 2 else None
+    return page_records, page_error
+
+
+class TestPageEngine(unittest.TestCase):
+    def test_page_ranges_cover_every_page_once(self):
+        for page_count in (0, 1, 7, 60, 135):
+            for workers in (1, 2, 3, 8):
+                ranges = page_ranges(page_count, workers)
+                covered = [page for start, stop in ranges for page in range(start, stop)]
+                self.assertEqual(list(range(page_count)), covered)
+
+    def test_parallel_merge_matches_serial(self):
+        pdf_path = "resources/sparrows.pdf"
+        serial_info, serial_errors = extract_pages(pdf_path, page_size_processor, workers=1)
+        parallel_info, parallel_errors = extract_pages(pdf_path, page_size_processor, workers=3)
+        self.assertEqual(list(serial_info.items()), list(parallel_info.items()))
+        self.assertEqual(list(serial_errors.items()), list(parallel_errors.items()))
+        self.assertEqual({"page": 60}, parallel_info["last page"])
+
+    def test_events_follow_page_order(self):
+        events = list(iter_page_events("resources/sparrows.pdf", page_size_processor))
+        self.assertEqual((RECORD, "group 1", {"page": 1}), tuple(events[0]))
+        self.assertEqual((RECORD, "last page", {"page": 1}), tuple(events[1]))
+        self.assertEqual((PAGE_ERROR, 1, "odd page 1"), tuple(events[2]))
+        self.assertEqual(extract_pages("resources/sparrows.pdf", page_size_processor), collect_events(events))
+
+    def test_records_stream_before_the_document_is_parsed(self):
+        parsed_pages = list()
+
+        def counting_processor(page_content, page_number):
+            parsed_pages.append(page_number)
+            return process_sparrow_page(page_content, page_number)
+
+        events = iter_page_events("resources/sparrows.pdf", counting_processor)
+        self.assertEqual(RECORD, next(events).kind)
+        self.assertEqual([1], parsed_pages)
+        events.close()
+        first_events = list(itertools.islice(iter_sparrow_records("resources/sparrows.pdf"), 3))
+        self.assertEqual([RECORD] * 3, [event.kind for event in first_events])
+
+    def test_pages_are_released_once_parsed(self):
+        pages = list()
+
+        def keeping_processor(page_content, page_number):
+            pages.append(page_content.page)
+            return process_sparrow_page(page_content, page_number)
+
+        results = iter_page_results("resources/sparrows.pdf", keeping_processor, workers=1, snapshot_mode="off")
+        for page_number, page_records, _ in itertools.islice(results, 3):
+            self.assertTrue(page_records)
+            self.assertFalse(hasattr(pages[-1], "_objects") or hasattr(pages[-1], "_layout"))
+            self.assertEqual(0, pages[-1].get_textmap.cache_info().currsize)
+        # a caller that stops early still closes the document
+        results.close()
+        self.assertTrue(pages[0].pdf.stream.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
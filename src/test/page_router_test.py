@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import io
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+import page_router
+from page_engine import extract_pages
+from centurion_extraction import process_centurion_page
+from first_integrated import process_first_integrated_page
+
+
+class TestPageRouter(unittest.TestCase):
+    def test_centurion_routes_match_extracted_text(self):
+        routes = list(page_router.iter_page_routes("resources/centurion.pdf", page_router.route_centurion_page))
+        with pdfplumber.open("resources/centurion.pdf") as pdf_doc:
+            expected = [page_router.route_centurion_text(page.extract_text()) for page in pdf_doc.pages]
+        self.assertEqual(expected, routes)
+        self.assertEqual(["Centurion"] * 48 + ["Hendrik"] * 4, routes)
+
+    def test_routed_pages_skip_extraction(self):
+        extraction_counts = dict()
+
+        def counting_processor(page_content, page_number):
+            result = process_centurion_page(page_content, page_number)
+            extraction_counts[page_number] = page_content.extraction_counts
+            return result
+
+        routed = extract_pages("resources/centurion.pdf", counting_processor, router=page_router.route_centurion_page)
+        unrouted = extract_pages("resources/centurion.pdf", process_centurion_page)
+        self.assertEqual(list(unrouted[0].items()), list(routed[0].items()))
+        # Hendrik pages are not parsed by this extractor, so nothing is extracted from them
+        self.assertEqual([49, 50, 51, 52], [number for number, counts in extraction_counts.items() if not counts])
+        self.assertFalse(any(counts["text"] for counts in extraction_counts.values()))
+
+    def test_pages_without_rulings_have_no_tables(self):
+        routes = list(page_router.iter_page_routes("resources/sparrows.pdf", page_router.route_first_integrated_page))
+        with pdfplumber.open("resources/sparrows.pdf") as pdf_doc:
+            without_tables = [i for i, page in enumerate(pdf_doc.pages) if not page.find_tables()]
+        self.assertEqual(without_tables, [i for i, route in enumerate(routes) if route == page_router.NO_TABLES])
+        routed = extract_pages("resources/sparrows.pdf", process_first_integrated_page,
+                               router=page_router.route_first_integrated_page)
+        unrouted = extract_pages("resources/sparrows.pdf", process_first_integrated_page)
+        self.assertEqual(list(unrouted[0].items()), list(routed[0].items()))
+        self.assertEqual(list(unrouted[1].items()), list(routed[1].items()))
+        for i in without_tables:
+            self.assertIn("No tables found", routed[1][i + 1])
+
+    def test_rulings_in_nested_forms_are_counted(self):
+        # a ruling on the first page, wrapped in one more form XObject on each following page
+        document = pdfium.PdfDocument.new()
+        page = document.new_page(200, 200)
+        ruling = pdfium_c.FPDFPageObj_CreateNewRect(10, 10, 100, 1)
+        pdfium_c.FPDFPath_SetDrawMode(ruling, pdfium_c.FPDF_FILLMODE_NONE, True)
+        pdfium_c.FPDFPage_InsertObject(page, ruling)
+        page.gen_content()
+        for _ in range(4):
+            form = document.page_as_xobject(len(document) - 1, document)
+            page = document.new_page(200, 200)
+            page.insert_obj(form.as_pageobject())
+            page.gen_content()
+        output = io.BytesIO()
+        document.save(output)
+        document.close()
+        routes = list(page_router.iter_page_routes(output.getvalue(), page_router.route_first_integrated_page))
+        self.assertEqual(["First Integrated"] * 5, routes)
+
+    def test_pages_with_rulings_reach_the_table_finder(self):
+        routes = list(page_router.iter_page_routes("resources/centurion.pdf", page_router.route_first_integrated_page))
+        self.assertEqual({"First Integrated"}, set(routes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+import page_engine
+import page_router
+from page_snapshots import OFF, RECORD, REPLAY, open_snapshots, settings_key
+from page_templates import TEMPLATES
+from centurion_extraction import process_centurion_page
+from sparrow_extraction import process_sparrow_page
+
+
+def run_pages(pdf_path, page_processor, snapshots, stop, template=None, router=None):
+    extraction_counts = list()
+
+    def counting_processor(page_content, page_number):
+        result = page_processor(page_content, page_number)
+        extraction_counts.append(sum(page_content.extraction_counts.values()))
+        return result
+    results = list(page_engine.iter_page_range(pdf_path, counting_processor, 0, stop, template, router, snapshots))
+    return results, extraction_counts
+
+
+class TestPageSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replay_matches_parsing_without_extracting(self):
+        template = TEMPLATES["Sparrows"]
+        recorded = open_snapshots("resources/sparrows.pdf", template, mode=RECORD, directory=self.directory)
+        live_results, live_counts = run_pages("resources/sparrows.pdf", process_sparrow_page, recorded, 5, template)
+        self.assertTrue(all(live_counts))
+
+        replayed = open_snapshots("resources/sparrows.pdf", template, mode=REPLAY, directory=self.directory)
+        replay_results, replay_counts = run_pages("resources/sparrows.pdf", process_sparrow_page, replayed, 5,
+                                                  template)
+        self.assertEqual(live_results, replay_results)
+        self.assertEqual([0] * 5, replay_counts)
+
+    def test_replayed_routes_skip_fingerprinting(self):
+        template, router = TEMPLATES["Centurion"], page_router.route_centurion_page
+        recorded = open_snapshots("resources/centurion.pdf", template, router, RECORD, self.directory)
+        live_results, _ = run_pages("resources/centurion.pdf", process_centurion_page, recorded, 4, template, router)
+
+        replayed = open_snapshots("resources/centurion.pdf", template, router, REPLAY, self.directory)
+        with mock.patch.object(page_engine.page_router, "iter_page_routes", side_effect=AssertionError):
+            replay_results, replay_counts = run_pages("resources/centurion.pdf", process_centurion_page, replayed, 4,
+                                                      template, router)
+        self.assertEqual(live_results, replay_results)
+        self.assertEqual([0] * 4, replay_counts)
+
+    def test_missing_pages_are_parsed_and_recorded(self):
+        replayed = open_snapshots("resources/sparrows.pdf", mode=REPLAY, directory=self.directory)
+        run_pages("resources/sparrows.pdf", process_sparrow_page, replayed, 2)
+        _, replay_counts = run_pages("resources/sparrows.pdf", process_sparrow_page, replayed, 3)
+        self.assertEqual(0, replay_counts[0])
+        self.assertEqual(0, replay_counts[1])
+        self.assertGreater(replay_counts[2], 0)
+
+    def test_parser_edits_do_not_reach_the_snapshot(self):
+        def destructive_processor(page_content, page_number):
+            page_content.tables[0].clear()
+            return dict(), None
+        snapshots = open_snapshots("resources/sparrows.pdf", mode=RECORD, directory=self.directory)
+        run_pages("resources/sparrows.pdf", destructive_processor, snapshots, 1)
+        replayed = open_snapshots("resources/sparrows.pdf", mode=REPLAY, directory=self.directory)
+        self.assertTrue(replayed.load(0)["tables"][0])
+
+    def test_keys_and_modes(self):
+        self.assertNotEqual(settings_key(), settings_key(TEMPLATES["Sparrows"]))
+        self.assertNotEqual(settings_key(TEMPLATES["Centurion"]),
+                            settings_key(TEMPLATES["Centurion"], page_router.route_centurion_page))
+        self.assertIsNone(open_snapshots("resources/sparrows.pdf", mode=OFF, directory=self.directory))
+        with self.assertRaises(ValueError):
+            open_snapshots("resources/sparrows.pdf", mode="replay-all", directory=self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+import pdfplumber
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+from page_content import PageContent
+from page_templates import TEMPLATES
+from centurion_extraction import process_centurion_page
+from sparrow_extraction import process_sparrow_page
+
+
+class TestPageTemplates(unittest.TestCase):
+    def assert_same_records(self, pdf_path, page_processor, template, page_indexes, cropped):
+        with pdfplumber.open(pdf_path) as pdf_doc:
+            for i in page_indexes:
+                page = pdf_doc.pages[i]
+                full_records, _ = page_processor(PageContent(page), i + 1)
+                page_content = PageContent(page, template)
+                crop_records, _ = page_processor(page_content, i + 1)
+                self.assertEqual(list(full_records.items()), list(crop_records.items()))
+                self.assertEqual(cropped, "tables" not in page_content.extraction_counts)
+
+    def test_sparrow_pages_use_crop_region(self):
+        self.assert_same_records("resources/sparrows.pdf", process_sparrow_page, TEMPLATES["Sparrows"], (0, 1, 20), True)
+
+    def test_sparrow_table_wider_than_region_falls_back(self):
+        # on these pages the first table runs past the crop region and loses a column ruling
+        self.assert_same_records("resources/sparrows.pdf", process_sparrow_page, TEMPLATES["Sparrows"], (42, 43), False)
+
+    def test_centurion_pages_use_crop_region(self):
+        self.assert_same_records("resources/centurion.pdf", process_centurion_page, TEMPLATES["Centurion"], (0, 30), True)
+
+    def test_hendrik_portrait_pages_fall_back(self):
+        with pdfplumber.open("resources/centurion.pdf") as pdf_doc:
+            page = pdf_doc.pages[48]
+            page_content = PageContent(page, TEMPLATES["Centurion"])
+            self.assertFalse(TEMPLATES["Centurion"].matches(page))
+            self.assertEqual(page.extract_tables(), page_content.tables)
+            self.assertEqual(1, page_content.extraction_counts["tables"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import sys
+import os
+import io
+from contextlib import redirect_stdout
+from unittest import mock
+from botocore.exceptions import ClientError
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+import pdf_archive
+from pdf_archive import archive_key, archive_pdf
+from local_s3 import LocalS3
+
+SOURCE_BUCKET = 'pdf-in-bucket'
+
+
+class FailingPartS3(LocalS3):
+    def upload_part_copy(self, PartNumber, **kwargs):
+        if PartNumber == 2:
+            raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'part failed'}}, 'UploadPartCopy')
+        return super().upload_part_copy(PartNumber=PartNumber, **kwargs)
+
+
+class TestPdfArchive(unittest.TestCase):
+    def setUp(self):
+        with open("resources/centurion.pdf", "rb") as pdf_file:
+            self.content = pdf_file.read()
+
+    def put_pdf(self, s3, key='incoming/centurion.pdf'):
+        s3.put_object(Bucket=SOURCE_BUCKET, Key=key, Body=self.content)
+        s3.calls.clear()
+
+    def archive(self, s3, *args, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return archive_pdf(s3, SOURCE_BUCKET, *args, **kwargs)
+
+    def test_pdf_is_copied_by_s3_then_deleted(self):
+        s3 = LocalS3()
+        self.put_pdf(s3)
+        timings = self.archive(s3, 'incoming/centurion.pdf', 'Success', len(self.content))
+        target_key = archive_key('incoming/centurion.pdf', 'Success')
+        self.assertEqual(self.content, s3.objects[('pdf-out-bucket', target_key)])
+        self.assertNotIn((SOURCE_BUCKET, 'incoming/centurion.pdf'), s3.objects)
+        # no folder listing or marker, and the bytes are not uploaded again
+        self.assertEqual(['copy_object', 'delete_object'], [call[0] for call in s3.calls])
+        self.assertEqual(1, timings['parts'])
+        self.assertGreaterEqual(timings['copy_seconds'], 0)
+        self.assertRegex(target_key, r'^Success/\d{4}-\d{2}-\d{2}/incoming/centurion\.pdf$')
+
+    def test_large_pdf_is_copied_in_parts(self):
+        s3 = LocalS3()
+        self.put_pdf(s3)
+        part_size = len(self.content) // 3 + 1
+        with mock.patch.object(pdf_archive, 'MULTIPART_THRESHOLD', part_size), \
+                mock.patch.object(pdf_archive, 'PART_SIZE', part_size):
+            timings = self.archive(s3, 'incoming/centurion.pdf', 'Failure', len(self.content))
+        self.assertEqual(3, timings['parts'])
+        self.assertEqual(3, s3.count('upload_part_copy'))
+        self.assertEqual(self.content, s3.objects[('pdf-out-bucket', archive_key('incoming/centurion.pdf', 'Failure'))])
+        self.assertEqual(0, s3.count('put_object'))
+        # without the size there is nothing to split on, and one CopyObject moves the PDF
+        self.put_pdf(s3, 'again.pdf')
+        with mock.patch.object(pdf_archive, 'MULTIPART_THRESHOLD', part_size):
+            self.assertEqual(1, self.archive(s3, 'again.pdf')['parts'])
+
+    def test_pdf_stays_when_the_copy_fails(self):
+        s3 = FailingPartS3()
+        self.put_pdf(s3)
+        with mock.patch.object(pdf_archive, 'MULTIPART_THRESHOLD', 1000), \
+                mock.patch.object(pdf_archive, 'PART_SIZE', len(self.content) // 4):
+            with self.assertRaises(ClientError):
+                self.archive(s3, 'incoming/centurion.pdf', 'Success', len(self.content))
+        self.assertEqual(1, s3.count('abort_multipart_upload'))
+        self.assertEqual(0, s3.count('delete_object'))
+        self.assertIn((SOURCE_BUCKET, 'incoming/centurion.pdf'), s3.objects)
+        with self.assertRaises(ClientError):
+            self.archive(s3, 'missing.pdf', 'Failure')
+        self.assertEqual(0, s3.count('delete_object'))
+
+
+if __name__ == '__main__':
+    unittest.main()
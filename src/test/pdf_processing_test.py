@@ -0,0 +1,30 @@
+import unittest
+import sys
+import os
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+from pdf_processing import KEYWORDS, classify_text, first_page_text, pdf_to_text, search_keyword
+
+
+class TestPdfProcessing(unittest.TestCase):
+    def test_classification_matches_pdfplumber_path(self):
+        for pdf_name, vendor in (("sparrows.pdf", "Sparrows"), ("centurion.pdf", "Centurion"),
+                                 ("CenturionLoft.pdf", "Centurion")):
+            pdf_path = os.path.join("resources", pdf_name)
+            self.assertEqual(vendor, search_keyword(pdf_to_text(pdf_path), KEYWORDS))
+            self.assertEqual((vendor, 1.0), classify_text(first_page_text(pdf_path), KEYWORDS))
+
+    def test_first_page_text_is_capped(self):
+        self.assertEqual(100, len(first_page_text("resources/sparrows.pdf", char_limit=100)))
+        with open("resources/sparrows.pdf", "rb") as pdf_file:
+            self.assertEqual(first_page_text("resources/sparrows.pdf"), first_page_text(pdf_file.read()))
+
+    def test_confidence_is_share_of_vendor_mentions(self):
+        text = "Sparrows Offshore report, equipment supplied by Centurion, Sparrows Group"
+        self.assertEqual(("Sparrows", 2 / 3), classify_text(text, KEYWORDS))
+        self.assertEqual((None, 0.0), classify_text("Certificate of conformity", KEYWORDS))
+
+
+if __name__ == '__main__':
+    unittest.main()
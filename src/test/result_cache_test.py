@@ -0,0 +1,247 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'src'))
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
+import manufacturer_catalog
+from result_cache import LocalResultCache, cached_extraction
+from local_s3 import FakeClock, FakeLambdaClient, LocalS3
+from extraction_store import open_extraction
+import s3_result_cache
+
+DAY = 24 * 3600
+
+
+class TestLocalResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock(1_700_000_000.0)
+        self.cache = LocalResultCache(self.directory, max_bytes=10 ** 6, max_age_seconds=DAY, clock=self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_identical_pdfs_are_extracted_once(self):
+        calls = list()
+        result = ({"SB-001": {"Item Description": "Shackle"}}, {2: "No recognized table found"})
+
+        def extract():
+            calls.append(1)
+            return result
+        copy_path = os.path.join(self.directory, "renamed.pdf")
+        shutil.copyfile("resources/sparrows.pdf", copy_path)
+        self.assertEqual(result, cached_extraction("resources/sparrows.pdf", "Sparrows", extract, self.cache))
+        self.assertEqual(result, cached_extraction(copy_path, "Sparrows", extract, self.cache))
+        self.assertEqual(1, len(calls))
+        # another vendor's parser keeps its own entry
+        cached_extraction(copy_path, "Centurion", extract, self.cache)
+        self.assertEqual(2, len(calls))
+
+    def test_edited_catalog_is_a_miss(self):
+        calls = list()
+
+        def extract():
+            calls.append(1)
+            return {"SB-001": {"Manufacturer": "Tiger"}}, {}
+        cached_extraction("resources/sparrows.pdf", "Sparrows", extract, self.cache)
+        with mock.patch.object(manufacturer_catalog, 'source_digest', return_value="f" * 64):
+            cached_extraction("resources/sparrows.pdf", "Sparrows", extract, self.cache)
+        self.assertEqual(2, len(calls))
+
+    def test_result_without_the_catalog_is_not_stored(self):
+        calls = list()
+
+        def extract():
+            calls.append(1)
+            return {"SB-001": {"Errors": "['Manufacturer not found']"}}, {}
+        with mock.patch.object(manufacturer_catalog, 'get_catalog', side_effect=OSError("catalog unavailable")):
+            cached_extraction("resources/sparrows.pdf", "Sparrows", extract, self.cache)
+        self.assertEqual([], os.listdir(self.directory))
+        cached_extraction("resources/sparrows.pdf", "Sparrows", extract, self.cache)
+        self.assertEqual(2, len(calls))
+
+    def test_concurrent_puts_of_one_key(self):
+        errors = list()
+
+        def put(cache):
+            try:
+                cache.put("key", ({"SB-001": {}}, {}))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=put, args=(LocalResultCache(self.directory, clock=self.clock),))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(["key.pickle"], os.listdir(self.directory))
+        self.assertEqual(({"SB-001": {}}, {}), self.cache.get("key"))
+
+    def test_shared_records_stay_shared(self):
+        record = {"Item Description": "Shackle"}
+        self.cache.put("key", ({"SB-001": record, "SB-002": record}, {}))
+        extraction_info, _ = self.cache.get("key")
+        self.assertIs(extraction_info["SB-001"], extraction_info["SB-002"])
+
+    def test_expired_entries_are_misses(self):
+        self.cache.put("key", ({}, {}))
+        self.clock.now += 2 * DAY
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        payload = ({"SB-001": "x" * 3000}, {})
+        for key in ("first", "second", "third"):
+            self.cache.put(key, payload)
+            self.clock.now += 1
+        self.cache.get("first")
+        self.clock.now += 1
+        self.cache.max_bytes = 2 * os.path.getsize(self.cache.path("first")) + 1
+        self.cache.put("fourth", payload)
+        self.assertEqual(["first.pickle", "fourth.pickle"], sorted(os.listdir(self.directory)))
+
+
+class TestS3ResultCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1_700_000_000.0)
+        self.s3 = LocalS3(clock=self.clock)
+        self.cache = s3_result_cache.S3ResultCache(self.s3, max_bytes=10 ** 6, max_age_seconds=DAY,
+                                                   refresh_seconds=3600, clock=self.clock)
+        self.catalog_etag = self.s3.put_object(Bucket=s3_result_cache.CATALOG_BUCKET, Key=s3_result_cache.CATALOG_KEY,
+                                               Body=b'catalog')['ETag']
+
+    def test_store_and_lookup(self):
+        self.assertIsNone(self.cache.lookup('"abc"', 'sparrow_extraction'))
+        pointer = self.cache.store('"abc"', 'sparrow_extraction', self.catalog_etag, {"SB-001": {"Model": "G209"}}, {},
+                                   "Sparrows", "pack.xlsx")
+        # storing never lists the prefix
+        self.assertEqual(0, self.s3.count('list_objects'))
+        hit = self.cache.lookup('"abc"', 'sparrow_extraction', filename='again.xlsx')
+        self.assertIsNone(self.cache.lookup('"abc"', 'centurion_extraction'))
+        # a hit is a copy of its own, which excel_management deletes once the workbook is built
+        self.assertNotIn('keep_extraction', hit)
+        self.assertTrue(hit['extraction_key'].startswith('extraction-results/'))
+        self.assertTrue(hit['extraction_key'].endswith('/again.xlsx.jsonl.gz'))
+        self.assertNotEqual(hit['extraction_key'], self.cache.lookup('"abc"', 'sparrow_extraction')['extraction_key'])
+        for stored in (pointer, hit):
+            extraction = open_extraction(self.s3, stored['extraction_bucket'], stored['extraction_key'])
+            self.assertEqual([("SB-001", {"Model": "G209"})], list(extraction.rows()))
+
+    def test_version_and_age(self):
+        self.cache.store('"abc"', 'sparrow_extraction', self.catalog_etag, {}, {}, "Sparrows", "pack.xlsx")
+        versions = dict(s3_result_cache.EXTRACTOR_VERSIONS)
+        try:
+            s3_result_cache.EXTRACTOR_VERSIONS['sparrow_extraction'] += 1
+            self.assertIsNone(self.cache.lookup('"abc"', 'sparrow_extraction'))
+        finally:
+            s3_result_cache.EXTRACTOR_VERSIONS.update(versions)
+        self.clock.now += 2 * DAY
+        self.assertIsNone(self.cache.lookup('"abc"', 'sparrow_extraction'))
+
+    def test_edited_catalog_is_a_miss(self):
+        self.cache.store('"abc"', 'sparrow_extraction', self.catalog_etag, {}, {}, "Sparrows", "pack.xlsx")
+        self.assertIsNotNone(self.cache.lookup('"abc"', 'sparrow_extraction'))
+        self.s3.put_object(Bucket=s3_result_cache.CATALOG_BUCKET, Key=s3_result_cache.CATALOG_KEY, Body=b'edited')
+        self.assertIsNone(self.cache.lookup('"abc"', 'sparrow_extraction'))
+        self.assertIsNotNone(self.cache.lookup('"abc"', 'sparrow_extraction', self.catalog_etag))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        extracted_data = {f"SB-{i:04d}": {"Item Description": f"Shackle {i}"} for i in range(200)}
+        for etag in ('"a"', '"b"', '"c"'):
+            self.cache.store(etag, 'sparrow_extraction', self.catalog_etag, extracted_data, {}, "Sparrows", "pack.xlsx")
+            self.clock.now += 1
+        # a hit renews the entry once it is older than refresh_seconds
+        self.assertIsNotNone(self.cache.lookup('"a"', 'sparrow_extraction'))
+        self.assertEqual(0, sum(1 for call in self.s3.calls if call[0] == 'copy_object' and 'result-cache/' in call[2]))
+        self.clock.now += 2 * 3600
+        self.assertIsNotNone(self.cache.lookup('"a"', 'sparrow_extraction'))
+        entry_size = len(self.s3.objects[(self.cache.bucket, self.cache.key_for('"a"', 'sparrow_extraction',
+                                                                                  self.catalog_etag))])
+        self.cache.max_bytes = 2 * entry_size
+        self.cache.evict()
+        self.assertIsNone(self.cache.lookup('"b"', 'sparrow_extraction'))
+        self.assertIsNotNone(self.cache.lookup('"a"', 'sparrow_extraction'))
+        self.assertIsNotNone(self.cache.lookup('"c"', 'sparrow_extraction'))
+        # the copies handed out are not part of the cache
+        self.assertTrue(all(key.startswith(('result-cache/', 'extraction-results/', s3_result_cache.CATALOG_KEY))
+                            for _, key in self.s3.objects))
+
+    def test_sweeps_are_occasional(self):
+        self.cache.store('"abc"', 'sparrow_extraction', self.catalog_etag, {}, {}, "Sparrows", "pack.xlsx")
+        self.cache.sweep_probability = 0.0
+        self.cache.sweep_sometimes()
+        self.assertEqual(0, self.s3.count('list_objects'))
+        self.cache.sweep_probability, self.cache.max_bytes = 1.0, 0
+        self.cache.sweep_sometimes()
+        self.assertEqual(1, self.s3.count('list_objects'))
+        self.assertIsNone(self.cache.lookup('"abc"', 'sparrow_extraction'))
+
+
+class TestDispatcherCacheHit(unittest.TestCase):
+    def test_cached_pdf_goes_straight_to_excel_management(self):
+        import lambda_pdf_processing
+        s3, lambda_client = LocalS3(), FakeLambdaClient()
+        lambda_pdf_processing.s3 = s3
+        lambda_pdf_processing.lambda_client = lambda_client
+        lambda_pdf_processing.result_cache = s3_result_cache.S3ResultCache(s3)
+        with open("resources/sparrows.pdf", "rb") as pdf_file:
+            etag = s3.put_object(Bucket='pdf-in-bucket', Key='again.pdf', Body=pdf_file.read())['ETag']
+        catalog_etag = s3.put_object(Bucket=s3_result_cache.CATALOG_BUCKET, Key=s3_result_cache.CATALOG_KEY,
+                                     Body=b'catalog')['ETag']
+        lambda_pdf_processing.result_cache.store(etag, 'sparrow_extraction', catalog_etag, {"SB-001": {}}, {},
+                                                 "Sparrows", "first.xlsx")
+        event = {'Records': [{'s3': {'bucket': {'name': 'pdf-in-bucket'}, 'object': {'key': 'again.pdf'}}}]}
+        lambda_pdf_processing.lambda_handler(event, None)
+
+        self.assertEqual(1, len(lambda_client.invocations))
+        function_name, payload = lambda_client.invocations[0]
+        self.assertEqual('excel_management', function_name)
+        self.assertEqual('again.xlsx', payload['filename'])
+        self.assertNotIn('keep_extraction', payload)
+        self.assertNotIn(('pdf-in-bucket', 'again.pdf'), s3.objects)
+        self.assertTrue(any(bucket == 'pdf-out-bucket' and key.startswith('Success/') and key.endswith('again.pdf')
+                            for bucket, key in s3.objects))
+
+        # excel_management takes the client from the cached entry and deletes its copy, the entry is kept for the
+        # next upload
+        import lambda_excel_management
+        lambda_excel_management.s3 = s3
+        lambda_excel_management.lambda_handler(payload, None)
+        self.assertTrue(any(bucket == 'excel-extraction-data' and key.endswith('/again.xlsx')
+                            for bucket, key in s3.objects))
+        self.assertNotIn((payload['extraction_bucket'], payload['extraction_key']), s3.objects)
+        self.assertIn((s3_result_cache.RESULT_CACHE_BUCKET,
+                       lambda_pdf_processing.result_cache.key_for(etag, 'sparrow_extraction', catalog_etag)),
+                      s3.objects)
+
+
+class TestExtractionFunctionCaching(unittest.TestCase):
+    def test_result_without_the_catalog_is_not_cached(self):
+        import lambda_sparrow_extraction
+        from catalog_cache import CatalogCache
+        s3, lambda_client = LocalS3(), FakeLambdaClient()
+        catalog_cache = CatalogCache(s3)
+        with mock.patch.multiple(lambda_sparrow_extraction, s3=s3, lambda_client=lambda_client,
+                                 catalog_cache=catalog_cache, result_cache=s3_result_cache.S3ResultCache(s3)):
+            for catalog_failed in (True, False):
+                catalog_cache.etag, catalog_cache.failed = '"catalog"', catalog_failed
+                s3.put_object(Bucket='pdf-in-bucket', Key='pack.pdf', Body=b'%PDF')
+                lambda_sparrow_extraction.invoke_excel_management_lambda(
+                    'pdf-in-bucket', 'pack.pdf', b'%PDF', {"SB-001": {}}, "Sparrows", "pack.xlsx", {}, '"abc"')
+        keys = [payload['extraction_key'] for _, payload in lambda_client.invocations]
+        self.assertTrue(keys[0].startswith('extraction-results/'))
+        self.assertEqual(s3_result_cache.S3ResultCache(s3).key_for('"abc"', 'sparrow_extraction', '"catalog"'),
+                         keys[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
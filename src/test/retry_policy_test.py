@@ -0,0 +1,131 @@
+import unittest
+import sys
+import os
+import io
+from contextlib import redirect_stdout
+from botocore.exceptions import ClientError, EndpointConnectionError
+from botocore.stub import Stubber
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
+import retry_policy
+from retry_policy import CircuitOpenError, RetryPolicy, RetryingClient
+from local_s3 import FakeClock
+
+
+def client_error(code, status_code=400):
+    return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status_code}},
+                       'Invoke')
+
+
+class Downstream:
+    """Fails with each of the given errors, or returns each of the given responses, in turn."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else {'StatusCode': 202}
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sleeps = list()
+
+    def policy(self, **kwargs):
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.clock.sleep(seconds)
+        options = dict(attempts=4, base_delay=0.2, max_delay=1.0, budget_seconds=30.0, failure_threshold=100,
+                       reset_seconds=30.0, sleep=sleep, random=lambda: 1.0, clock=self.clock)
+        options.update(kwargs)
+        return RetryPolicy(**options)
+
+    def call(self, policy, downstream, name='lambda:excel_management'):
+        with redirect_stdout(io.StringIO()):
+            return policy.call(name, downstream)
+
+    def test_throttled_calls_back_off_exponentially(self):
+        downstream = Downstream(client_error('TooManyRequestsException', 429), client_error('SlowDown', 503),
+                                EndpointConnectionError(endpoint_url='https://lambda'))
+        self.assertEqual({'StatusCode': 202}, self.call(self.policy(), downstream))
+        self.assertEqual(4, downstream.calls)
+        # full jitter draws from [0, base_delay * 2 ** retry], capped at max_delay
+        self.assertEqual([0.2, 0.4, 0.8], self.sleeps)
+        self.sleeps.clear()
+        self.call(self.policy(random=lambda: 0.5), Downstream(*[client_error('Throttling')] * 3))
+        self.assertEqual([0.1, 0.2, 0.4], self.sleeps)
+
+    def test_answers_are_not_retried(self):
+        downstream = Downstream(client_error('NoSuchKey', 404))
+        with self.assertRaises(ClientError):
+            self.call(self.policy(), downstream)
+        self.assertEqual((1, []), (downstream.calls, self.sleeps))
+
+    def test_retries_end_with_the_attempts_or_the_budget(self):
+        downstream = Downstream(*[{'StatusCode': 500}] * 10)
+        self.assertEqual({'StatusCode': 500}, self.call(self.policy(), downstream))
+        self.assertEqual(4, downstream.calls)
+        downstream = Downstream(*[client_error('ServiceException', 500)] * 10)
+        with self.assertRaises(ClientError):
+            self.call(self.policy(budget_seconds=0.5), downstream)
+        # the second retry would sleep past the budget
+        self.assertEqual(2, downstream.calls)
+
+    def test_circuit_opens_on_a_throttling_downstream(self):
+        policy = self.policy(attempts=3, failure_threshold=2)
+        throttled = Downstream(*[client_error('TooManyRequestsException', 429)] * 10)
+        with self.assertRaises(CircuitOpenError):
+            self.call(policy, throttled)
+        self.assertEqual(2, throttled.calls)
+        # later calls fail fast, other functions are not affected
+        with self.assertRaises(CircuitOpenError):
+            self.call(policy, throttled)
+        self.assertEqual(2, throttled.calls)
+        self.assertEqual({'StatusCode': 202}, self.call(policy, Downstream(), 'lambda:sparrow_extraction'))
+        # after reset_seconds one trial call goes through, and a success closes the circuit
+        self.clock.now += 30
+        recovered = Downstream()
+        self.call(policy, recovered)
+        self.assertFalse(policy.breaker('lambda:excel_management').is_open)
+        self.assertEqual(1, recovered.calls)
+
+    def test_invoke_through_a_stubbed_client(self):
+        lambda_client = retry_policy.client('lambda')
+        policy = self.policy()
+        with Stubber(lambda_client) as stubber:
+            for _ in range(2):
+                stubber.add_client_error('invoke', service_error_code='TooManyRequestsException',
+                                         http_status_code=429)
+            stubber.add_response('invoke', {'StatusCode': 202}, {'FunctionName': 'excel_management',
+                                                                 'InvocationType': 'Event', 'Payload': '{"a": 1}'})
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(202, retry_policy.invoke_async(lambda_client, 'excel_management', {"a": 1}, policy))
+            stubber.assert_no_pending_responses()
+        self.assertEqual(2, len(self.sleeps))
+
+    def test_retrying_client_retries_each_operation(self):
+        s3 = retry_policy.client('s3')
+        policy = self.policy(failure_threshold=2)
+        retrying = RetryingClient(s3, policy, 'Bucket')
+        with Stubber(s3) as stubber:
+            stubber.add_client_error('head_object', service_error_code='SlowDown', http_status_code=503)
+            stubber.add_response('head_object', {'ContentLength': 3, 'ETag': '"abc"'},
+                                 {'Bucket': 'pdf-in-bucket', 'Key': 'a.pdf'})
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(3, retrying.head_object(Bucket='pdf-in-bucket', Key='a.pdf')['ContentLength'])
+        self.assertEqual(1, len(self.sleeps))
+        self.assertIs(s3.meta, retrying.meta)
+        self.assertEqual(0, policy.breaker('s3:pdf-in-bucket').failures)
+
+
+if __name__ == '__main__':
+    unittest.main()
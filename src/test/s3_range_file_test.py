@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import pdfplumber
+
+current_directory = os.getcwd()
+sys.path.append(os.path.join(current_directory, 'lambda_functions'))
+sys.path.append(os.path.join(current_directory, 'src'))
+sys.path.append(os.path.join(current_directory, 'src', 'test'))
+from s3_range_file import ObjectChangedError, S3RangeFile
+from local_s3 import LocalS3
+from pdf_processing import first_page_text
+
+BUCKET = 'pdf-in-bucket'
+KEY = 'sparrows.pdf'
+
+
+class TestS3RangeFile(unittest.TestCase):
+    def setUp(self):
+        with open("resources/sparrows.pdf", "rb") as pdf_file:
+            self.content = pdf_file.read()
+        self.s3 = LocalS3()
+        self.s3.put_object(Bucket=BUCKET, Key=KEY, Body=self.content)
+
+    def test_reads_match_the_object(self):
+        range_file = S3RangeFile(self.s3, BUCKET, KEY, block_size=1000, cache_blocks=4)
+        for offset, size in ((0, 10), (999, 2), (123456, 5000), (len(self.content) - 7, 100), (len(self.content), 5)):
+            range_file.seek(offset)
+            self.assertEqual(self.content[offset:offset + size], range_file.read(size))
+        range_file.seek(-20, os.SEEK_END)
+        self.assertEqual(self.content[-20:], range_file.read())
+        self.assertLessEqual(len(range_file._blocks), 4)
+
+    def test_cached_blocks_are_not_fetched_again(self):
+        range_file = S3RangeFile(self.s3, BUCKET, KEY, block_size=1000)
+        range_file.read(2500)
+        self.assertEqual(2, range_file.requests)
+        self.assertEqual(3000, range_file.bytes_transferred)
+        range_file.seek(500)
+        range_file.read(2000)
+        self.assertEqual(2, range_file.requests)
+        self.assertEqual(3000, self.s3.bytes_sent)
+
+    def test_prefetched_blocks_are_read_from_the_cache(self):
+        range_file = S3RangeFile(self.s3, BUCKET, KEY, block_size=1000)
+        range_file.prefetch(0, 1500)
+        range_file.prefetch(len(self.content) - 10, len(self.content) + 10)
+        self.assertEqual((3, 0), (range_file.requests, range_file.tell()))
+        self.assertEqual(self.content[:1200], range_file.read(1200))
+        range_file.seek(-10, os.SEEK_END)
+        self.assertEqual(self.content[-10:], range_file.read())
+        self.assertEqual(3, range_file.requests)
+
+    def test_overwritten_object_is_reopened(self):
+        range_file = S3RangeFile(self.s3, BUCKET, KEY, block_size=1000)
+        self.assertEqual(self.content[:10], range_file.read(10))
+        with open("resources/centurion.pdf", "rb") as pdf_file:
+            replacement = pdf_file.read()
+        etag = self.s3.put_object(Bucket=BUCKET, Key=KEY, Body=replacement)['ETag']
+        range_file.seek(5000)
+        with self.assertRaises(ObjectChangedError):
+            range_file.read(10)
+        # no block of the new object is mixed with the old ones
+        self.assertEqual((etag, len(replacement), 0), (range_file.etag, range_file.size, range_file.tell()))
+        self.assertEqual({}, dict(range_file._blocks))
+        range_file.seek(5000)
+        self.assertEqual(replacement[5000:5010], range_file.read(10))
+
+    def test_classifier_fetches_a_fraction_of_the_pdf(self):
+        range_file = S3RangeFile(self.s3, BUCKET, KEY)
+        self.assertEqual(first_page_text(self.content), first_page_text(range_file))
+        self.assertLess(range_file.bytes_transferred, len(self.content) / 4)
+        self.assertEqual(range_file.bytes_transferred, self.s3.bytes_sent)
+
+    def test_pdfplumber_opens_range_file(self):
+        with pdfplumber.open(S3RangeFile(self.s3, BUCKET, KEY)) as pdf_doc:
+            self.assertEqual(60, len(pdf_doc.pages))
+            with pdfplumber.open("resources/sparrows.pdf") as local_doc:
+                self.assertEqual(local_doc.pages[0].extract_text(), pdf_doc.pages[0].extract_text())
+
+
+if __name__ == '__main__':
+    unittest.main()